@@ -2,15 +2,21 @@
 Assembler related stuff: Assembler, Scope
 '''
 
+from collections import namedtuple
 from enum import Enum
 import logging
 import os
+import re
 
 from instructions.operands import get_operand_opcode
 from utils import utils
 from utils.errors import AldebaranError
-from utils.executable import Executable
+from utils.executable import Executable, create_sections
+from .build_cache import get_toolchain_hash
+from .linker import link
 from .macros import MACRO_SET, MacroError, VariableError, ScopeError
+from .optimizer import Optimizer
+from .object_file import ObjectFile, ExternalReference, CorruptObjectFileError
 from .tokenizer import Tokenizer, Token, TokenType, Reference, ARGUMENT_TYPES, LABEL_REFERENCE_TYPES
 
 
@@ -20,9 +26,16 @@ logger = logging.getLogger(__name__)
 class Assembler:
     '''
     Assembler: convert source code to opcode
+
+    Tokenized lines and the opcode of lines are cached. A line's opcode is cached by its content
+    and the relative addresses of the labels it references, so lines are re-encoded only if they change
+    or a label they reference moves relative to them. Lines depending on variables or scopes are never cached.
+
+    In incremental mode the caches are kept between `assemble_code` calls, so re-assembling after a small edit
+    re-encodes only the affected lines.
     '''
 
-    def __init__(self, instruction_set, registers):
+    def __init__(self, instruction_set, registers, incremental=False, optimize=False):
         self.instruction_names = [
             inst.__name__
             for opcode, inst in instruction_set
@@ -41,54 +54,211 @@ class Assembler:
             'word_registers': self.word_registers,
             'byte_registers': self.byte_registers,
         })
+        self.toolchain_hash = get_toolchain_hash(instruction_set, registers, MACRO_SET, optimize)
+        self.incremental = incremental
+        if optimize:
+            self.optimizer = Optimizer(self.instruction_names)
+        else:
+            self.optimizer = None
+        self._reset_cache()
         self._reset_state()
 
-    def assemble_file(self, filename):
+    def assemble_file(self, filename, build_cache=None, write_listing=False, executable_version=1, compress=False):
         '''
-        Assemble source code file and write to executable file
+        Assemble source code file, link it with its imported modules and write to executable file,
+        return AssembledFile
+
+        If a build cache is given, unchanged source code (of the file or any module) is not assembled again.
+        If `write_listing` is set, the listing is written next to the executable file (with .lst extension).
+        Executable version 2 stores code, data and zero-filled (BSS) sections, optionally compressed.
         '''
         logger.info('Assembling %s...', filename)
-        source_code = ''
+        object_file, listing, source_code, cached = self._get_object_file(filename, build_cache)
+        modules = [(filename, object_file)]
+        listings = [listing]
+        module_filenames = {os.path.abspath(filename)}
+        idx = 0
+        while idx < len(modules):
+            module_name, module_object_file = modules[idx]
+            idx += 1
+            for import_filename in module_object_file.imports:
+                import_filename = os.path.join(os.path.dirname(module_name), import_filename)
+                if os.path.abspath(import_filename) in module_filenames:
+                    continue
+                module_filenames.add(os.path.abspath(import_filename))
+                logger.info('Importing %s...', import_filename)
+                import_object_file, import_listing, _, _ = self._get_object_file(import_filename, build_cache)
+                modules.append((import_filename, import_object_file))
+                listings.append(import_listing)
+        opcode = link(modules)
+        if executable_version == 2:
+            data_ranges = []
+            module_address = 0
+            for module_name, module_object_file in modules:
+                data_ranges += [
+                    (module_address + address, length)
+                    for address, length in module_object_file.data_ranges
+                ]
+                module_address += len(module_object_file.opcode)
+            executable = Executable.from_sections(create_sections(opcode, data_ranges), compress).to_bytes()
+        else:
+            executable = Executable(1, opcode).to_bytes()
+        binary_filename = os.path.splitext(filename)[0]
+        with open(binary_filename, 'wb') as output_file:
+            output_file.write(executable)
+        if write_listing:
+            with open(binary_filename + '.lst', 'wt') as listing_file:
+                module_address = 0
+                for (module_name, module_object_file), module_listing in zip(modules, listings):
+                    if module_address:
+                        listing_file.write('\n# {} @ {}\n'.format(module_name, utils.word_to_str(module_address)))
+                    listing_file.write(module_listing + '\n')
+                    module_address += len(module_object_file.opcode)
+        logger.info('Assembled %s (%d bytes%s).', binary_filename, len(executable), ', cached' if cached else '')
+        return AssembledFile(
+            filename=binary_filename,
+            size=len(executable),
+            lines=source_code.count('\n') + 1,
+            cached=cached,
+        )
+
+    def _get_object_file(self, filename, build_cache):
+        '''
+        Return object file, listing, source code of file and whether it came from the build cache
+        '''
         with open(filename, 'rt') as input_file:
             source_code = input_file.read()
-        opcode = self.assemble_code(source_code)
-        binary_filename = os.path.splitext(filename)[0]
-        exe = Executable(1, opcode)
-        exe.save_to_file(binary_filename)
-        logger.info('Assembled %s (%d bytes).', binary_filename, exe.length)
+        if build_cache is not None:
+            cache_key = build_cache.get_key(source_code, self.toolchain_hash)
+            cached = build_cache.get(cache_key)
+            if cached is not None:
+                object_file_content, listing = cached
+                try:
+                    return ObjectFile.from_bytes(object_file_content), listing, source_code, True
+                except CorruptObjectFileError:
+                    logger.warning('Corrupt object file in build cache, assembling %s again', filename)
+        self.assemble_code(source_code)
+        if self.optimizer is not None:
+            logger.info('Optimized %s: %s', filename, self.get_optimization_summary())
+        object_file = self.get_object()
+        listing = '\n'.join(self.get_listing())
+        if build_cache is not None:
+            build_cache.put(cache_key, object_file.to_bytes(), listing)
+        return object_file, listing, source_code, False
 
     def assemble_code(self, source_code):
         '''
         Assemble source code and return opcode
         '''
+        previous_labels = self.labels if self.incremental else {}
         self._reset_state()
+        if not self.incremental:
+            self._reset_cache()
         self.source_code = source_code
         logger.debug('Tokenizing...')
         tokenized_code = self._tokenize()
         logger.debug('Tokenized.')
         logger.debug('Collecting labels...')
-        self._collect_labels(tokenized_code)
+        self._collect_labels(tokenized_code, previous_labels)
         logger.debug('Collected.')
+        if self.optimizer is not None:
+            logger.debug('Optimizing...')
+            tokenized_code, self.rewrites = self.optimizer.optimize(tokenized_code)
+            self._rewritten_line_numbers = {rewrite.line_number for rewrite in self.rewrites}
+            logger.debug('Optimized.')
         logger.debug('Generating opcode...')
-        self._generate_opcode(tokenized_code)  # generate opcode first time: label addresses not yet good
-        self._generate_opcode(tokenized_code)  # generate opcode second time: label addresses good
-        logger.debug('Generated.')
-        self._log_code()
+        self._resolve_labels(tokenized_code)
+        logger.debug('Generated in %d passes.', self.pass_count)
+        if self.external_references and not self.imports:
+            reference = self.external_references[0]
+            _raise_error(
+                reference.source_line,
+                reference.line_number,
+                reference.pos,
+                'Unknown label reference: {}'.format(reference.label_name),
+                LabelError,
+            )
+        if logger.isEnabledFor(logging.DEBUG):
+            self._log_code()
         return self.opcode
 
-    def _log_code(self):
-        logger.debug('===CODE===')
+    def get_object(self):
+        '''
+        Return object file of the last assembled code
+        '''
+        return ObjectFile(
+            opcode=list(self.opcode),
+            labels=dict(self.labels),
+            references=[
+                ExternalReference(reference.label_name, reference.line_pos, reference.patch_pos)
+                for reference in self.external_references
+            ],
+            imports=list(self.imports),
+            data_ranges=self.get_data_ranges(),
+        )
+
+    def get_data_ranges(self):
+        '''
+        Return list of (address, length) of opcode generated by data macros in the last assembled code
+        '''
+        data_ranges = []
+        for line_number, opcode_pos, line_opcode, source_line, tokens in self.augmented_opcode:
+            is_data = any(token.type == TokenType.MACRO and token.value in DATA_MACROS for token in tokens)
+            if not line_opcode or not is_data:
+                continue
+            if data_ranges and sum(data_ranges[-1]) == opcode_pos:
+                data_ranges[-1] = (data_ranges[-1][0], data_ranges[-1][1] + len(line_opcode))
+            else:
+                data_ranges.append((opcode_pos, len(line_opcode)))
+        return data_ranges
+
+    def get_optimization_summary(self):
+        '''
+        Return summary of the optimizations of the last assembled code as a human-readable string
+        '''
+        rule_counts = {}
+        for rewrite in self.rewrites:
+            rule_counts[rewrite.rule_name] = rule_counts.get(rewrite.rule_name, 0) + 1
+        return '{} rewrites, {} bytes saved, {} cycles saved per run of each line{}'.format(
+            len(self.rewrites),
+            sum(rewrite.bytes_saved for rewrite in self.rewrites),
+            sum(rewrite.cycles_saved for rewrite in self.rewrites),
+            ''.join(
+                '\n    {}: {}'.format(rule_name, count)
+                for rule_name, count in sorted(rule_counts.items())
+            ),
+        )
+
+    def add_import(self, module_filename):
+        '''
+        Add module to be linked (labels not defined in the source code are looked up in imported modules)
+        '''
+        if module_filename not in self.imports:
+            self.imports.append(module_filename)
+
+    def get_listing(self):
+        '''
+        Return listing of the last assembled code as list of lines (line number, address, opcode, source line)
+        '''
+        if not self.augmented_opcode:
+            return []
         max_line_opcode_length = max(
             len(line_opcode)
             for line_number, opcode_pos, line_opcode, source_line, tokens in self.augmented_opcode
         )
         if max_line_opcode_length > MAX_LINE_OPCODE_LENGTH:
             max_line_opcode_length = MAX_LINE_OPCODE_LENGTH
+        rewritten_lines = {}
+        for rewrite in self.rewrites:
+            rewritten_lines.setdefault(rewrite.line_number, []).append(rewrite.rule_name)
+        listing = []
         for line_number, opcode_pos, line_opcode, source_line, tokens in self.augmented_opcode:
             line_label_names = [token.value for token in tokens if token.type == TokenType.LABEL]
-            if not line_label_names and not line_opcode:
+            if line_number in rewritten_lines:
+                source_line = '{}  # optimized: {}'.format(source_line, ', '.join(rewritten_lines[line_number]))
+            elif not line_label_names and not line_opcode:
                 continue
-            logger.debug(
+            listing.append(
                 ' '.join([
                     '{:4}'.format(line_number),
                     utils.word_to_str(opcode_pos),
@@ -98,36 +268,63 @@ class Assembler:
                     source_line,
                 ])
             )
+        return listing
+
+    def _log_code(self):
+        logger.debug('===CODE===')
+        for listing_line in self.get_listing():
+            logger.debug(listing_line)
 
     def _reset_state(self):
         self.source_code = ''
+        self.pass_count = 0
         self.labels = {}
         self.opcode = []
         self.augmented_opcode = []
         self.consts = {}
         self.current_scope = None
+        self.imports = []
+        self.external_references = []
+        self.rewrites = []
+        self._rewritten_line_numbers = set()
+        self.cache_stats = {
+            'tokenized_lines': 0,
+            'encoded_lines': 0,
+            'cached_lines': 0,
+        }
+
+    def _reset_cache(self):
+        self._tokenized_line_cache = {}
+        self._line_cache_info = {}
+        self._line_opcode_cache = {}
 
     def _tokenize(self):
-        tokenized_code = []
-        for idx, source_line in enumerate(self.source_code.split('\n')):
-            line_number = idx + 1
-            try:
-                meaningful_tokens = [
-                    token
-                    for token in self.tokenizer.tokenize(source_line)
-                    if token.type != TokenType.COMMENT
-                ]
-            except AldebaranError as ex:
-                msg, pos = ex.args
-                _raise_error(source_line, line_number, pos, str(msg), ex.__class__)
-            tokenized_code.append((
-                line_number,
-                source_line,
-                meaningful_tokens,
-            ))
-        return tokenized_code
+        source_lines = self.source_code.split('\n')
+        # tokenize every line not yet in the cache in one pass
+        new_lines = list(dict.fromkeys(
+            source_line
+            for source_line in source_lines
+            if source_line not in self._tokenized_line_cache
+        ))
+        try:
+            new_tokenized_lines = self.tokenizer.tokenize_lines(new_lines)
+        except AldebaranError as ex:
+            msg, pos = ex.args
+            source_line = new_lines[ex.line_index]
+            _raise_error(source_line, source_lines.index(source_line) + 1, pos, str(msg), ex.__class__)
+        for source_line, tokens in zip(new_lines, new_tokenized_lines):
+            self._tokenized_line_cache[source_line] = [
+                token
+                for token in tokens
+                if token.type != TokenType.COMMENT
+            ]
+        self.cache_stats['tokenized_lines'] += len(new_lines)
+        return [
+            (line_number, source_line, self._tokenized_line_cache[source_line])
+            for line_number, source_line in enumerate(source_lines, 1)
+        ]
 
-    def _collect_labels(self, tokenized_code):
+    def _collect_labels(self, tokenized_code, previous_labels):
         for line_number, source_line, tokens in tokenized_code:
             for token in tokens:
                 if token.type == TokenType.LABEL:
@@ -136,17 +333,42 @@ class Assembler:
                         _raise_error(source_line, line_number, token.pos, 'Label already defined', LabelError)
                     if label_name in self.keywords:
                         _raise_error(source_line, line_number, token.pos, 'Label name cannot be keyword', LabelError)
-                    self.labels[label_name] = 0
+                    # start from the label's previous address (in incremental mode) as it's likely still good
+                    self.labels[label_name] = previous_labels.get(label_name, 0)
+
+    def _resolve_labels(self, tokenized_code):
+        '''
+        Generate opcode until label addresses are stable
+
+        A pass uses the label addresses of the previous pass for forward references.
+        If no label moved during a pass (i.e. no line's opcode length changed in a way that moves a label),
+        every reference was resolved with the final addresses and the opcode is good.
+        Lines not referencing moved labels are not re-encoded, they come from the line opcode cache.
+        '''
+        while True:
+            if self.pass_count >= MAX_PASSES:
+                raise LabelError('Label addresses did not settle in {} passes'.format(MAX_PASSES))
+            labels_before_pass = dict(self.labels)
+            self._generate_opcode(tokenized_code)
+            self.pass_count += 1
+            if self.labels == labels_before_pass:
+                break
 
     def _generate_opcode(self, tokenized_code):
         self.opcode = []
         self.augmented_opcode = []
         self.consts = {}
         self.current_scope = None
+        self.imports = []
+        self.external_references = []
         opcode_pos = 0
         for line_number, source_line, tokens in tokenized_code:
-            line_opcode = self._parse_line(line_number, source_line, tokens, opcode_pos)
-            self.opcode += line_opcode
+            if line_number in self._rewritten_line_numbers:
+                # tokens differ from what the source line says, so it cannot use the line opcode cache
+                line_opcode = self._parse_line(line_number, source_line, tokens, opcode_pos)
+            else:
+                line_opcode = self._encode_line(line_number, source_line, tokens, opcode_pos)
+            self.opcode.extend(line_opcode)
             self.augmented_opcode.append((
                 line_number,
                 opcode_pos,
@@ -156,6 +378,58 @@ class Assembler:
             ))
             opcode_pos += len(line_opcode)
 
+    def _encode_line(self, line_number, source_line, tokens, opcode_pos):
+        '''
+        Return opcode of line from cache if possible, otherwise parse it
+        '''
+        for token in tokens:
+            if token.type != TokenType.LABEL:
+                break
+            self.labels[token.value] = opcode_pos
+        try:
+            cacheable, referenced_label_names = self._line_cache_info[source_line]
+        except KeyError:
+            cacheable, referenced_label_names = self._get_line_cache_info(tokens)
+            self._line_cache_info[source_line] = (cacheable, referenced_label_names)
+        if not cacheable:
+            self.cache_stats['encoded_lines'] += 1
+            return self._parse_line(line_number, source_line, tokens, opcode_pos)
+        try:
+            cache_key = (source_line, tuple(
+                self.labels[label_name] - opcode_pos
+                for label_name in referenced_label_names
+            ))
+        except KeyError:
+            # unknown label reference: let the parser raise the error
+            return self._parse_line(line_number, source_line, tokens, opcode_pos)
+        try:
+            line_opcode = self._line_opcode_cache[cache_key]
+        except KeyError:
+            line_opcode = self._parse_line(line_number, source_line, tokens, opcode_pos)
+            self._line_opcode_cache[cache_key] = line_opcode
+            self.cache_stats['encoded_lines'] += 1
+        else:
+            self.cache_stats['cached_lines'] += 1
+        return line_opcode
+
+    def _get_line_cache_info(self, tokens):
+        '''
+        Return if line's opcode can be cached and the names of labels it references
+        '''
+        referenced_label_names = []
+        for token in tokens:
+            if token.type in {TokenType.VARIABLE, TokenType.SYSTEM_VARIABLE}:
+                return False, None
+            if token.type == TokenType.INSTRUCTION and token.value in SCOPE_INSTRUCTIONS:
+                return False, None
+            if token.type == TokenType.MACRO and MACRO_SET[token.value].has_side_effects:
+                return False, None
+            if token.type == TokenType.ADDRESS_LABEL or token.type == TokenType.IDENTIFIER:
+                referenced_label_names.append(token.value)
+            elif token.type in LABEL_REFERENCE_TYPES:
+                referenced_label_names.append(token.value.base)
+        return True, tuple(referenced_label_names)
+
     def _parse_line(self, line_number, source_line, tokens, opcode_pos):
         state = ParserState.LABEL
         inst_name = None
@@ -233,15 +507,17 @@ class Assembler:
 
     def _parse_operands(self, args, source_line, line_number, opcode_pos):
         operands = []
+        operand_pos = opcode_pos + 1  # after instruction opcode
         for arg in args:
             if arg.type == TokenType.STRING_LITERAL:
                 _raise_error(source_line, line_number, arg.pos, 'String literal cannot be instruction operand: {}'.format(arg.value), OperandError)
             if arg.type == TokenType.VARIABLE:
                 arg = self.substitute_variable(arg, source_line, line_number)
             if arg.type in LABEL_REFERENCE_TYPES:
-                arg = self._substitute_label(arg, source_line, line_number, opcode_pos)
+                arg = self._substitute_label(arg, source_line, line_number, opcode_pos, operand_pos)
             try:
                 operands.append(get_operand_opcode(arg))
+                operand_pos += len(operands[-1])
             except AldebaranError as ex:
                 orig_msg = '{}({})'.format(
                     ex.__class__.__name__,
@@ -260,17 +536,25 @@ class Assembler:
                 )
         return operands
 
-    def _substitute_label(self, arg, source_line, line_number, opcode_pos):
+    def _substitute_label(self, arg, source_line, line_number, opcode_pos, operand_pos):
         assert arg.type in LABEL_REFERENCE_TYPES
         if arg.type == TokenType.ADDRESS_LABEL or arg.type == TokenType.IDENTIFIER:
             label_name = arg.value
         else:
             label_name = arg.value.base
         try:
-            label_address = self.labels[label_name]
+            relative_address = self.labels[label_name] - opcode_pos
         except KeyError:
-            _raise_error(source_line, line_number, arg.pos, 'Unknown label reference: {}'.format(arg.value), LabelError)
-        relative_address = label_address - opcode_pos
+            # label may be defined in an imported module: the linker will patch the address word after the opbyte
+            self.external_references.append(UnresolvedReference(
+                label_name=label_name,
+                line_pos=opcode_pos,
+                patch_pos=operand_pos + 1,
+                source_line=source_line,
+                line_number=line_number,
+                pos=arg.pos,
+            ))
+            relative_address = 0
         new_type = {
             TokenType.ADDRESS_LABEL: TokenType.ADDRESS_WORD_LITERAL,
             TokenType.IDENTIFIER: TokenType.ADDRESS_WORD_LITERAL,
@@ -303,15 +587,12 @@ class Assembler:
         Substitute variable with its value (token)
         '''
         assert arg.type == TokenType.VARIABLE
-        try:
+        if arg.value in self.consts:
             new_token = self.consts[arg.value]
-        except KeyError:
-            try:
-                if self.current_scope is None:
-                    raise ScopeError('No scope')
-                new_token = self.current_scope.get_value(arg.value)
-            except ScopeError:
-                _raise_error(source_line, line_number, arg.pos, 'Unknown variable reference: {}'.format(arg.value), VariableError)
+        elif self.current_scope is not None and self.current_scope.is_variable_defined(arg.value):
+            new_token = self.current_scope.get_value(arg.value)
+        else:
+            _raise_error(source_line, line_number, arg.pos, 'Unknown variable reference: {}'.format(arg.value), VariableError)
         return Token(
             new_token.type,
             new_token.value,
@@ -348,8 +629,8 @@ class Scope:
         self.max_byte_count_of_variables = enter_args[1].value
         self.byte_count_of_parameters = 0
         self.byte_count_of_variables = 0
-        self._variables = []
-        self._parameters = []
+        # name -> token of parameter/variable ([BP+-offset]), calculated when it is added
+        self._values = {}
 
     def add_parameter(self, name, size):
         '''
@@ -362,8 +643,9 @@ class Scope:
         if self.is_variable_defined(name):
             raise ScopeError('Parameter {} already defined'.format(name))
 
+        offset = 6 + self.max_byte_count_of_parameters - self.byte_count_of_parameters - (size - 1)
         self.byte_count_of_parameters += size
-        self._parameters.append((name, size))
+        self._values[name] = _get_bp_reference_token(offset, size)
 
     def add_variable(self, name, size):
         '''
@@ -377,58 +659,92 @@ class Scope:
             raise ScopeError('Variable {} already defined'.format(name))
 
         self.byte_count_of_variables += size
-        self._variables.append((name, size))
+        offset = 1 - self.byte_count_of_variables
+        self._values[name] = _get_bp_reference_token(offset, size)
 
     def get_value(self, name):
         '''
         Get value of parameter/variable
         '''
         try:
-            offset, size = self._get_param(name)
-        except ScopeError:
-            offset, size = self._get_var(name)
-        return Token(
-            TokenType.ABS_REF_REG,
-            Reference('BP', offset, 'B' if size == 1 else 'W'),
-            0,
-        )
+            return self._values[name]
+        except KeyError:
+            raise ScopeError('No parameter or local variable found')
 
     def is_variable_defined(self, name):
         '''
         Return if parameter or local variable is defined
         '''
-        try:
-            self._get_param(name)
-        except ScopeError:
-            try:
-                self._get_var(name)
-            except ScopeError:
-                return False
-        return True
-
-    def _get_param(self, name):
-        offset = 0
-        for param_name, param_size in self._parameters:
-            if param_name == name:
-                return 6 + self.max_byte_count_of_parameters - offset - (param_size - 1), param_size
-            offset += param_size
-        raise ScopeError('No parameter found')
-
-    def _get_var(self, name):
-        offset = 0
-        for var_name, var_size in self._variables:
-            offset += var_size
-            if var_name == name:
-                return 1 - offset, var_size
-        raise ScopeError('No local variable found')
+        return name in self._values
 
 
 MAX_LINE_OPCODE_LENGTH = 15
 
+SCOPE_INSTRUCTIONS = {'ENTER', 'LVRET'}
+
+DATA_MACROS = {'DAT', 'DATN'}
+
+MAX_PASSES = 16
+
+# listing line: line number, address, opcode bytes, source line (starting with its labels)
+LISTING_LINE_REGEX = re.compile(r'\s*\d+ (?P<address>[0-9A-F]{4}) (?:[0-9A-F]{2} )*\s*(?P<labels>(?:[A-Za-z_][A-Za-z0-9_]*:\s*)*)')
+LISTING_MODULE_REGEX = re.compile(r'# .* @ (?P<address>[0-9A-F]{4})$')
+
+
+UnresolvedReference = namedtuple('UnresolvedReference', [
+    'label_name',  # string
+    'line_pos',  # integer
+    'patch_pos',  # integer
+    'source_line',  # string
+    'line_number',  # integer
+    'pos',  # integer
+])
+
+
+AssembledFile = namedtuple('AssembledFile', [
+    'filename',  # string (executable file)
+    'size',  # integer (bytes)
+    'lines',  # integer (source code lines)
+    'cached',  # bool
+])
+
+
+def get_labels_from_listing(listing_lines):
+    '''
+    Return dict of label name -> address (relative to the start of the executable) from lines of a listing file
+    '''
+    labels = {}
+    module_address = 0
+    for line in listing_lines:
+        module_match = LISTING_MODULE_REGEX.match(line)
+        if module_match:
+            module_address = int(module_match.group('address'), 16)
+            continue
+        line_match = LISTING_LINE_REGEX.match(line)
+        if not line_match:
+            continue
+        address = module_address + int(line_match.group('address'), 16)
+        for label_name in re.findall(r'([A-Za-z_][A-Za-z0-9_]*):', line_match.group('labels')):
+            labels.setdefault(label_name, address)
+    return labels
+
+
+def _get_bp_reference_token(offset, size):
+    return Token(
+        TokenType.ABS_REF_REG,
+        Reference('BP', offset, 'B' if size == 1 else 'W'),
+        0,
+    )
+
 
 def _raise_error(code, line_number, pos, error_message, exception):
     _log_error_position(code, line_number, pos)
-    raise exception(error_message)
+    error = exception(error_message)
+    # keep position, so errors can be reported later (e.g. in batch mode)
+    error.source_line = code
+    error.line_number = line_number
+    error.pos = pos
+    raise error
 
 
 def _log_error(code, line_number, pos, error_message):
@@ -0,0 +1,183 @@
+'''
+Batch assembly of many source code files, optionally in a process pool
+'''
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import logging
+import os
+import time
+
+from utils.errors import AldebaranError
+from .assembler import Assembler
+from .build_cache import BuildCache
+
+
+logger = logging.getLogger(__name__)
+
+
+SOURCE_CODE_EXTENSION = '.ald'
+
+# every worker process has one assembler (and build cache), so the tokenizer regex is compiled once per worker
+_worker_args = None
+_worker_assembler = None
+_worker_build_cache = None
+_worker_assemble_file_options = {}
+
+# loggers of the assembler logging errors (with position) before raising them
+ERROR_LOGGER_NAMES = ['assembler.assembler', 'assembler.macros']
+
+
+def find_source_files(paths):
+    '''
+    Return source code files: files as they are, directories replaced by the .ald files in them
+    '''
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames += sorted(
+                os.path.join(path, filename)
+                for filename in os.listdir(path)
+                if filename.endswith(SOURCE_CODE_EXTENSION)
+            )
+        else:
+            filenames.append(path)
+    return filenames
+
+
+def assemble_files(filenames, instruction_set, registers, jobs=1, build_cache=None, optimize=False, **assemble_file_options):
+    '''
+    Assemble files, return list of FileResult in the order of `filenames`
+
+    Errors are collected per file instead of stopping the batch.
+    With `jobs` > 1 files are assembled in a pool of worker processes.
+    Errors are not logged by the assembler during the batch, they are reported in FileResult.
+    Statistics of the workers' build caches are added to `build_cache.stats`.
+    Other keyword arguments (e.g. `write_listing`) are passed to Assembler.assemble_file.
+    '''
+    if build_cache is None:
+        cache_dir = None
+        cache_max_size = None
+    else:
+        cache_dir = build_cache.cache_dir
+        cache_max_size = build_cache.max_size
+    # passed with every file (not as pool initializer, that's Python 3.7+), workers set up only on the first one
+    worker_args = (instruction_set, registers, optimize, cache_dir, cache_max_size, assemble_file_options)
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_assemble_file, filenames, repeat(worker_args)))
+    else:
+        try:
+            results = [_assemble_file(filename, worker_args) for filename in filenames]
+        finally:
+            _reset_worker()
+    if build_cache is not None:
+        for result in results:
+            for stat_name, value in result.cache_stats.items():
+                build_cache.stats[stat_name] += value
+    return results
+
+
+def get_summary(results, duration):
+    '''
+    Return summary of batch as a human-readable string
+    '''
+    failed = sum(1 for result in results if result.error is not None)
+    cached = sum(1 for result in results if result.cached)
+    lines = sum(result.lines for result in results)
+    return '{} files ({} failed, {} cached), {} lines in {:.3f} s ({:.0f} lines/s)'.format(
+        len(results),
+        failed,
+        cached,
+        lines,
+        duration,
+        lines / duration if duration else 0,
+    )
+
+
+def format_error(ex):
+    '''
+    Return error message with its position in the source code (if known)
+    '''
+    message = '{}: {}'.format(ex.__class__.__name__, ex)
+    if getattr(ex, 'line_number', None) is None:
+        return message
+    position = ['line {}:'.format(ex.line_number), ex.source_line]
+    if ex.pos is not None:
+        position.append(' ' * ex.pos + '^')
+    return '\n'.join(position + [message])
+
+
+def _set_up_worker(worker_args):
+    global _worker_args, _worker_assembler, _worker_build_cache, _worker_assemble_file_options  # pylint: disable=global-statement
+    if worker_args == _worker_args:
+        return
+    instruction_set, registers, optimize, cache_dir, cache_max_size, assemble_file_options = worker_args
+    _worker_assembler = Assembler(instruction_set, registers, optimize=optimize)
+    if cache_dir is None:
+        _worker_build_cache = None
+    else:
+        _worker_build_cache = BuildCache(cache_dir, cache_max_size)
+    _worker_assemble_file_options = assemble_file_options
+    _worker_args = worker_args
+    for logger_name in ERROR_LOGGER_NAMES:
+        logging.getLogger(logger_name).addFilter(_error_log_filter)
+
+
+def _reset_worker():
+    global _worker_args  # pylint: disable=global-statement
+    _worker_args = None
+    for logger_name in ERROR_LOGGER_NAMES:
+        logging.getLogger(logger_name).removeFilter(_error_log_filter)
+
+
+def _error_log_filter(record):
+    return record.levelno < logging.ERROR
+
+
+def _assemble_file(filename, worker_args):
+    _set_up_worker(worker_args)
+    if _worker_build_cache is None:
+        cache_stats_before = {}
+    else:
+        cache_stats_before = dict(_worker_build_cache.stats)
+    start_time = time.perf_counter()
+    try:
+        assembled_file = _worker_assembler.assemble_file(
+            filename,
+            build_cache=_worker_build_cache,
+            **_worker_assemble_file_options
+        )
+        error = None
+    except AldebaranError as ex:
+        assembled_file = None
+        error = format_error(ex)
+    except (OSError, UnicodeDecodeError) as ex:
+        assembled_file = None
+        error = '{}: {}'.format(ex.__class__.__name__, ex)
+    duration = time.perf_counter() - start_time
+    cache_stats = {
+        stat_name: _worker_build_cache.stats[stat_name] - value
+        for stat_name, value in cache_stats_before.items()
+    }
+    return FileResult(
+        filename=filename,
+        size=assembled_file.size if assembled_file else 0,
+        lines=assembled_file.lines if assembled_file else 0,
+        cached=assembled_file.cached if assembled_file else False,
+        duration=duration,
+        error=error,
+        cache_stats=cache_stats,
+    )
+
+
+FileResult = namedtuple('FileResult', [
+    'filename',  # string (source code file)
+    'size',  # integer (bytes of executable)
+    'lines',  # integer (source code lines)
+    'cached',  # bool
+    'duration',  # float (sec)
+    'error',  # string | None
+    'cache_stats',  # dict (change of build cache stats)
+])
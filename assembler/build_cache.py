@@ -0,0 +1,164 @@
+'''
+Content-addressed on-disk build cache of the assembler
+
+Key: hash of the source code and the toolchain (instruction set, registers, macro set, optimization)
+Value: object file bytes and listing
+'''
+
+import hashlib
+import logging
+import os
+import struct
+
+
+logger = logging.getLogger(__name__)
+
+
+# increase if the assembler generates different opcode from the same source code and toolchain
+CACHE_FORMAT_VERSION = 4
+
+ENTRY_SUFFIX = '.aldc'
+ENTRY_HEADER = struct.Struct('>I')  # length of object file
+
+
+class BuildCache:
+    '''
+    Build cache with size-bounded LRU eviction
+
+    Every entry is a file named after its key. Hits update the modification time of the entry,
+    so the least recently used entries are evicted first when the cache grows above `max_size` bytes.
+    '''
+
+    def __init__(self, cache_dir, max_size):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, source_code, toolchain_hash):
+        '''
+        Return cache key of source code assembled by a given toolchain
+        '''
+        key_hash = hashlib.sha256()
+        key_hash.update(toolchain_hash.encode('ascii'))
+        key_hash.update(source_code.encode('utf-8'))
+        return key_hash.hexdigest()
+
+    def get(self, key):
+        '''
+        Return (object file bytes, listing) for key or None if not cached
+        '''
+        entry_filename = self._get_entry_filename(key)
+        try:
+            with open(entry_filename, 'rb') as entry_file:
+                content = entry_file.read()
+        except FileNotFoundError:
+            self.stats['misses'] += 1
+            return None
+        try:
+            object_file_length, = ENTRY_HEADER.unpack_from(content)
+            object_file_end = ENTRY_HEADER.size + object_file_length
+            listing = content[object_file_end:].decode('utf-8')
+        except (struct.error, UnicodeDecodeError):
+            object_file_end = None
+        if object_file_end is None or object_file_end > len(content):
+            logger.warning('Corrupt cache entry removed: %s', key)
+            os.remove(entry_filename)
+            self.stats['misses'] += 1
+            return None
+        os.utime(entry_filename)
+        self.stats['hits'] += 1
+        return content[ENTRY_HEADER.size:object_file_end], listing
+
+    def put(self, key, object_file, listing):
+        '''
+        Store object file bytes and listing, then evict least recently used entries if the cache is too big
+        '''
+        entry_filename = self._get_entry_filename(key)
+        tmp_filename = '{}.{}.tmp'.format(entry_filename, os.getpid())
+        with open(tmp_filename, 'wb') as entry_file:
+            entry_file.write(ENTRY_HEADER.pack(len(object_file)))
+            entry_file.write(object_file)
+            entry_file.write(listing.encode('utf-8'))
+        os.replace(tmp_filename, entry_filename)
+        self.stats['stores'] += 1
+        self._evict()
+
+    def get_size(self):
+        '''
+        Return number of entries and their total size in bytes
+        '''
+        entries = self._get_entries()
+        return len(entries), sum(size for mtime, size, path in entries)
+
+    def get_summary(self):
+        '''
+        Return cache statistics as a human-readable string
+        '''
+        number_of_entries, size = self.get_size()
+        lookups = self.stats['hits'] + self.stats['misses']
+        return '{} hits, {} misses ({:.0%} hit rate), {} stores, {} evictions, {} entries ({} bytes)'.format(
+            self.stats['hits'],
+            self.stats['misses'],
+            self.stats['hits'] / lookups if lookups else 0,
+            self.stats['stores'],
+            self.stats['evictions'],
+            number_of_entries,
+            size,
+        )
+
+    def _evict(self):
+        entries = self._get_entries()
+        size = sum(size for mtime, size, path in entries)
+        for mtime, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # evicted by another process
+            size -= entry_size
+            self.stats['evictions'] += 1
+            logger.debug('Evicted %s', os.path.basename(path))
+
+    def _get_entries(self):
+        entries = []
+        with os.scandir(self.cache_dir) as dir_entries:
+            for dir_entry in dir_entries:
+                if not dir_entry.name.endswith(ENTRY_SUFFIX):
+                    continue
+                try:
+                    stat = dir_entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return entries
+
+    def _get_entry_filename(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+
+def get_toolchain_hash(instruction_set, registers, macro_set, optimize=False):
+    '''
+    Return hash of everything besides the source code that determines the assembler's output
+    '''
+    toolchain = (
+        CACHE_FORMAT_VERSION,
+        [
+            (opcode, inst.__name__, inst.operand_count, inst.oplens)
+            for opcode, inst in instruction_set
+        ],
+        registers['byte'],
+        registers['word'],
+        sorted(
+            (macro_name, macro.__name__, macro.param_count, macro.has_side_effects)
+            for macro_name, macro in macro_set.items()
+        ),
+        optimize,
+    )
+    return hashlib.sha256(repr(toolchain).encode('utf-8')).hexdigest()
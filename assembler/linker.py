@@ -0,0 +1,68 @@
+'''
+Linker: put object files of modules after each other and patch their unresolved references
+'''
+
+import logging
+
+from utils import utils
+from utils.errors import AldebaranError
+
+
+logger = logging.getLogger(__name__)
+
+
+def link(modules):
+    '''
+    Link modules, return opcode
+
+    `modules` is a list of (name, ObjectFile), the first one is the main module (its opcode starts at 0).
+    An unresolved reference of a module is resolved to the label of the same name in another module,
+    it must be defined by exactly one of them.
+    '''
+    base_addresses = []
+    label_definitions = {}
+    opcode = []
+    for name, object_file in modules:
+        base_address = len(opcode)
+        base_addresses.append(base_address)
+        for label_name, label_address in object_file.labels.items():
+            label_definitions.setdefault(label_name, []).append((name, base_address + label_address))
+        opcode += object_file.opcode
+    for (name, object_file), base_address in zip(modules, base_addresses):
+        for reference in object_file.references:
+            definitions = [
+                (module_name, address)
+                for module_name, address in label_definitions.get(reference.label_name, [])
+                if module_name != name
+            ]
+            if not definitions:
+                raise UnresolvedReferenceError('Unresolved reference in {}: {}'.format(name, reference.label_name))
+            if len(definitions) > 1:
+                raise AmbiguousReferenceError('Ambiguous reference in {}: {} is defined in {}'.format(
+                    name,
+                    reference.label_name,
+                    ', '.join(module_name for module_name, address in definitions),
+                ))
+            _, label_address = definitions[0]
+            relative_address = label_address - (base_address + reference.line_pos)
+            patch_pos = base_address + reference.patch_pos
+            try:
+                opcode[patch_pos:patch_pos + 2] = utils.word_to_binary(relative_address, signed=True)
+            except AldebaranError:
+                raise LinkerError('Reference in {} too far: {}'.format(name, reference.label_name))
+            logger.debug('Patched %s in %s @ %s', reference.label_name, name, utils.word_to_str(patch_pos))
+    return opcode
+
+
+# pylint: disable=missing-docstring
+
+class LinkerError(AldebaranError):
+    pass
+
+
+class UnresolvedReferenceError(LinkerError):
+    pass
+
+
+class AmbiguousReferenceError(LinkerError):
+    pass
@@ -12,6 +12,9 @@ from .tokenizer import Token, TokenType, Reference
 
 logger = logging.getLogger(__name__)
 
+# (macro class, tuple of parameter types) already validated
+_valid_param_types = set()
+
 
 class Macro:
     '''
@@ -22,6 +25,7 @@ class Macro:
     substitute_variables_in_params = None
     param_types = None
     param_type_list = None
+    has_side_effects = False  # True if it changes the assembler's state (so its opcode cannot be cached)
 
     def __init__(self, assembler, source_line, line_number):
         self.assembler = assembler
@@ -63,14 +67,11 @@ class Macro:
                     param_idx = param_number - 1
                     if params[param_idx].type == TokenType.VARIABLE:
                         params[param_idx] = self.assembler.substitute_variable(params[param_idx], self.source_line, self.line_number)
-        # validate parameter types
-        if self.param_types is not None:
-            for param_idx, param_type_list in enumerate(self.param_types):
-                param_number = param_idx + 1
-                self._validate_parameter(params[param_idx], param_type_list, param_number)
-        if self.param_type_list is not None:
-            for param in params:
-                self._validate_parameter(param, self.param_type_list)
+        # validate parameter types (only once for every combination of types)
+        validation_key = (self.__class__, tuple(param.type for param in params))
+        if validation_key not in _valid_param_types:
+            self._validate_parameters(params)
+            _valid_param_types.add(validation_key)
 
         return self.do(params)
 
@@ -80,6 +81,15 @@ class Macro:
         '''
         raise NotImplementedError()
 
+    def _validate_parameters(self, params):
+        if self.param_types is not None:
+            for param_idx, param_type_list in enumerate(self.param_types):
+                param_number = param_idx + 1
+                self._validate_parameter(params[param_idx], param_type_list, param_number)
+        if self.param_type_list is not None:
+            for param in params:
+                self._validate_parameter(param, self.param_type_list)
+
     def _validate_parameter(self, param, param_type_list, param_number=None):
         if param.type not in param_type_list:
             if param_number is None:
@@ -160,6 +170,7 @@ class CONST(Macro):
     '''
 
     param_count = (2, 2)
+    has_side_effects = True
     substitute_variables_in_params = [2]
     param_types = [
         [TokenType.VARIABLE],
@@ -182,6 +193,7 @@ class PARAM(Macro):
     '''
 
     param_count = (1, 1)
+    has_side_effects = True
     length = 2
     param_types = [
         [TokenType.VARIABLE],
@@ -220,6 +232,7 @@ class VAR(Macro):
     '''
 
     param_count = (1, 2)
+    has_side_effects = True
     length = 2
     param_types = [
         [TokenType.VARIABLE],
@@ -270,6 +283,24 @@ class VARB(VAR):
     length = 1
 
 
+class IMPORT(Macro):
+    '''
+    .IMPORT <filename>
+
+    Link module (relative to the importing file), its labels can be referenced
+    '''
+
+    param_count = (1, 1)
+    has_side_effects = True
+    param_types = [
+        [TokenType.STRING_LITERAL],
+    ]
+
+    def do(self, params):
+        self.assembler.add_import(params[0].value)
+        return []
+
+
 MACRO_SET = {
     'DAT': DAT,
     'DATN': DATN,
@@ -278,6 +309,7 @@ MACRO_SET = {
     'PARAMB': PARAMB,
     'VAR': VAR,
     'VARB': VARB,
+    'IMPORT': IMPORT,
 }
 
 
@@ -286,7 +318,12 @@ def _raise_error(code, line_number, pos, error_message, exception):
     logger.error(code)
     if pos is not None:
         logger.error(' ' * pos + '^')
-    raise exception(error_message)
+    error = exception(error_message)
+    # keep position, so errors can be reported later (e.g. in batch mode)
+    error.source_line = code
+    error.line_number = line_number
+    error.pos = pos
+    raise error
 
 
 def _param_count_string(cnt):
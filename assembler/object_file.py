@@ -0,0 +1,96 @@
+'''
+Object file: assembled opcode of a module with its labels, unresolved references and imports
+
+Format:
+- bytes 0-5: signature
+- byte 6: version
+- bytes 7-10: length of metadata
+- metadata (JSON): labels, references, imports, data ranges
+- opcode
+
+All operands referring to labels are IP-relative, so the opcode of a module can be placed anywhere
+in the executable; only the unresolved references have to be patched by the linker.
+'''
+
+from collections import namedtuple
+import json
+import struct
+
+from utils.errors import AldebaranError
+
+
+OBJECT_FILE_SIGNATURE = b'ALDOBJ'
+OBJECT_FILE_VERSION = 1
+OBJECT_FILE_HEADER = struct.Struct('>6sBI')  # signature, version, length of metadata
+
+
+ExternalReference = namedtuple('ExternalReference', [
+    'label_name',  # string
+    'line_pos',  # integer (position of the referencing instruction, relative addresses are calculated from here)
+    'patch_pos',  # integer (position of the signed word to patch)
+])
+
+
+class ObjectFile:
+    '''
+    Container for an object file
+    '''
+
+    def __init__(self, opcode=None, labels=None, references=None, imports=None, data_ranges=None):
+        self.opcode = opcode or []
+        self.labels = labels or {}
+        self.references = references or []
+        self.imports = imports or []
+        self.data_ranges = data_ranges or []  # list of (address, length) generated by data macros
+
+    def to_bytes(self):
+        '''
+        Return object file as bytes
+        '''
+        metadata = json.dumps({
+            'labels': self.labels,
+            'references': [list(reference) for reference in self.references],
+            'imports': self.imports,
+            'data_ranges': [list(data_range) for data_range in self.data_ranges],
+        }).encode('utf-8')
+        return (
+            OBJECT_FILE_HEADER.pack(OBJECT_FILE_SIGNATURE, OBJECT_FILE_VERSION, len(metadata))
+            + metadata
+            + bytes(self.opcode)
+        )
+
+    @classmethod
+    def from_bytes(cls, content):
+        '''
+        Create object file from bytes
+        '''
+        try:
+            signature, version, metadata_length = OBJECT_FILE_HEADER.unpack_from(content)
+        except struct.error:
+            raise CorruptObjectFileError('Header not valid')
+        if signature != OBJECT_FILE_SIGNATURE:
+            raise CorruptObjectFileError('Signature not valid')
+        if version != OBJECT_FILE_VERSION:
+            raise CorruptObjectFileError('Version not supported: {}'.format(version))
+        metadata_end = OBJECT_FILE_HEADER.size + metadata_length
+        try:
+            metadata = json.loads(content[OBJECT_FILE_HEADER.size:metadata_end].decode('utf-8'))
+            return cls(
+                opcode=list(content[metadata_end:]),
+                labels=metadata['labels'],
+                references=[ExternalReference(*reference) for reference in metadata['references']],
+                imports=metadata['imports'],
+                data_ranges=[tuple(data_range) for data_range in metadata.get('data_ranges', [])],
+            )
+        except (ValueError, KeyError, TypeError):
+            raise CorruptObjectFileError('Metadata not valid')
+
+
+# pylint: disable=missing-docstring
+
+class ObjectFileError(AldebaranError):
+    pass
+
+
+class CorruptObjectFileError(ObjectFileError):
+    pass
@@ -0,0 +1,279 @@
+'''
+Peephole optimizer: rewrite tokenized code into cheaper equivalents, driven by a rule table
+'''
+
+from collections import namedtuple
+import logging
+
+from .tokenizer import Token, TokenType
+
+
+logger = logging.getLogger(__name__)
+
+
+JUMP_INSTRUCTIONS = {'JMP', 'JE', 'JNE', 'JG', 'JGE', 'JL', 'JLE', 'JA', 'JAE', 'JB', 'JBE', 'CALL'}
+REGISTER_TYPES = {TokenType.WORD_REGISTER, TokenType.BYTE_REGISTER}
+MAX_JUMP_CHAIN_LENGTH = 16
+
+# operand opcode length by token type (variables in destination operands are always scope variables: [BP+-0xNN])
+OPERAND_LENGTHS = {
+    TokenType.WORD_REGISTER: 1,
+    TokenType.BYTE_REGISTER: 1,
+    TokenType.BYTE_LITERAL: 2,
+    TokenType.WORD_LITERAL: 3,
+    TokenType.ADDRESS_WORD_LITERAL: 3,
+    TokenType.ADDRESS_LABEL: 3,
+    TokenType.IDENTIFIER: 3,
+    TokenType.ABS_REF_REG: 2,
+    TokenType.VARIABLE: 2,
+    TokenType.REL_REF_WORD: 3,
+    TokenType.REL_REF_LABEL: 3,
+    TokenType.REL_REF_WORD_REG: 3,
+    TokenType.REL_REF_LABEL_REG: 3,
+    TokenType.REL_REF_WORD_BYTE: 4,
+    TokenType.REL_REF_LABEL_BYTE: 4,
+}
+
+
+class Optimizer:
+    '''
+    Peephole optimizer
+
+    Rules are applied in the order of `OPTIMIZATION_RULES`, each on every line, until nothing changes.
+    A rule gets the program and a line index, and returns (new tokens, bytes saved, estimated cycles saved) or None.
+    Every executed instruction takes one clock cycle, so cycles saved are instructions not executed
+    each time the rewritten line runs.
+    '''
+
+    def __init__(self, instruction_names):
+        self.rules = [
+            rule
+            for rule in OPTIMIZATION_RULES
+            if rule.required_instructions <= set(instruction_names)
+        ]
+
+    def optimize(self, tokenized_code):
+        '''
+        Return optimized tokenized code and list of Rewrite
+        '''
+        program = Program(tokenized_code)
+        rewrites = []
+        while True:
+            # a rewrite can make another one possible (e.g. a collapsed jump chain ends up jumping to the next line)
+            round_rewrites = self._run_rules(program)
+            if not round_rewrites:
+                break
+            rewrites += round_rewrites
+        return program.tokenized_code, rewrites
+
+    def _run_rules(self, program):
+        rewrites = []
+        for rule in self.rules:
+            for idx in range(len(program.lines)):
+                result = rule.function(program, idx)
+                if result is None:
+                    continue
+                new_tokens, bytes_saved, cycles_saved = result
+                line_number, source_line, tokens = program.tokenized_code[idx]
+                logger.debug('Line %d: %s', line_number, rule.name)
+                rewrites.append(Rewrite(rule.name, line_number, tokens, bytes_saved, cycles_saved))
+                program.replace_line(idx, new_tokens)
+        return rewrites
+
+
+class Program:
+    '''
+    Tokenized code with parsed lines and label definitions for the optimization rules
+    '''
+
+    def __init__(self, tokenized_code):
+        self.tokenized_code = list(tokenized_code)
+        self.lines = [_parse_line(tokens) for line_number, source_line, tokens in self.tokenized_code]
+        self.label_lines = {
+            label_name: idx
+            for idx, line in enumerate(self.lines)
+            for label_name in line.labels
+        }
+
+    def replace_line(self, idx, new_tokens):
+        '''
+        Replace tokens of line (labels must stay the same)
+        '''
+        line_number, source_line, _ = self.tokenized_code[idx]
+        self.tokenized_code[idx] = (line_number, source_line, new_tokens)
+        self.lines[idx] = _parse_line(new_tokens)
+
+    def get_code_line_index(self, idx):
+        '''
+        Return index of the first line from `idx` generating opcode (or None)
+        '''
+        while idx < len(self.lines):
+            if self.lines[idx].keyword is not None:
+                return idx
+            idx += 1
+        return None
+
+    def get_label_code_line_index(self, label_name):
+        '''
+        Return index of the first line generating opcode at label (or None)
+        '''
+        try:
+            return self.get_code_line_index(self.label_lines[label_name])
+        except KeyError:
+            return None
+
+
+ParsedLine = namedtuple('ParsedLine', [
+    'labels',  # list of label names
+    'keyword',  # Token (INSTRUCTION or MACRO) | None
+    'args',  # list of Token
+])
+
+
+Rewrite = namedtuple('Rewrite', [
+    'rule_name',  # string
+    'line_number',  # integer
+    'original_tokens',  # list of Token
+    'bytes_saved',  # integer
+    'cycles_saved',  # integer (per execution of the line)
+])
+
+
+OptimizationRule = namedtuple('OptimizationRule', [
+    'name',  # string
+    'required_instructions',  # set of instruction names
+    'function',  # function(program, idx) -> (tokens, bytes saved, cycles saved) | None
+])
+
+
+def _parse_line(tokens):
+    labels = []
+    keyword = None
+    args = []
+    for token in tokens:
+        if keyword is None and token.type == TokenType.LABEL:
+            labels.append(token.value)
+        elif keyword is None and token.type in {TokenType.INSTRUCTION, TokenType.MACRO}:
+            keyword = token
+        else:
+            args.append(token)
+    return ParsedLine(labels, keyword, args)
+
+
+def _is_instruction(line, inst_names):
+    return line.keyword is not None and line.keyword.type == TokenType.INSTRUCTION and line.keyword.value in inst_names
+
+
+def _get_label_target(line):
+    '''
+    Return name of label the last operand of line jumps to (or None)
+    '''
+    if not line.args:
+        return None
+    target = line.args[-1]
+    if target.type in {TokenType.IDENTIFIER, TokenType.ADDRESS_LABEL}:
+        return target.value
+    return None
+
+
+def _label_tokens(tokens):
+    return [token for token in tokens if token.type == TokenType.LABEL]
+
+
+def _collapse_jump_chain(program, idx):
+    '''
+    J* L where L: JMP M  =>  J* M
+    '''
+    line = program.lines[idx]
+    if not _is_instruction(line, JUMP_INSTRUCTIONS):
+        return None
+    original_target = target = _get_label_target(line)
+    hops = 0
+    visited = set()
+    while target is not None and target not in visited and hops < MAX_JUMP_CHAIN_LENGTH:
+        visited.add(target)
+        target_idx = program.get_label_code_line_index(target)
+        if target_idx is None or target_idx == idx or not _is_instruction(program.lines[target_idx], {'JMP'}):
+            break
+        next_target = _get_label_target(program.lines[target_idx])
+        if next_target is None:
+            break
+        target = next_target
+        hops += 1
+    if hops == 0 or target == original_target:
+        return None
+    _, _, tokens = program.tokenized_code[idx]
+    old_target = tokens[-1]
+    return tokens[:-1] + [Token(old_target.type, target, old_target.pos)], 0, hops
+
+
+def _remove_jump_to_next(program, idx):
+    '''
+    JMP L where L is the next instruction  =>  (nothing)
+    '''
+    line = program.lines[idx]
+    if not _is_instruction(line, {'JMP'}):
+        return None
+    target = _get_label_target(line)
+    if target is None or target not in program.label_lines:
+        return None
+    label_idx = program.label_lines[target]
+    if label_idx <= idx:
+        return None
+    next_code_idx = program.get_code_line_index(idx + 1)
+    if next_code_idx is not None and label_idx > next_code_idx:
+        return None
+    _, _, tokens = program.tokenized_code[idx]
+    return _label_tokens(tokens), 1 + OPERAND_LENGTHS[line.args[-1].type], 1
+
+
+def _remove_redundant_mov(program, idx):
+    '''
+    MOV r r  =>  (nothing)
+    '''
+    line = program.lines[idx]
+    if not _is_instruction(line, {'MOV'}) or len(line.args) != 2:
+        return None
+    dst, src = line.args
+    if dst.type not in REGISTER_TYPES or (dst.type, dst.value) != (src.type, src.value):
+        return None
+    _, _, tokens = program.tokenized_code[idx]
+    return _label_tokens(tokens), 1 + 2 * OPERAND_LENGTHS[dst.type], 1
+
+
+def _add_to_inc(program, idx):
+    '''
+    ADD x x v  =>  INC x v
+    '''
+    return _to_two_operand_instruction(program, idx, 'ADD', 'INC')
+
+
+def _sub_to_dec(program, idx):
+    '''
+    SUB x x v  =>  DEC x v
+    '''
+    return _to_two_operand_instruction(program, idx, 'SUB', 'DEC')
+
+
+def _to_two_operand_instruction(program, idx, inst_name, new_inst_name):
+    line = program.lines[idx]
+    if not _is_instruction(line, {inst_name}) or len(line.args) != 3:
+        return None
+    dst, src, value = line.args
+    if (dst.type, dst.value) != (src.type, src.value) or dst.type not in OPERAND_LENGTHS:
+        return None
+    _, _, tokens = program.tokenized_code[idx]
+    return _label_tokens(tokens) + [
+        Token(TokenType.INSTRUCTION, new_inst_name, line.keyword.pos),
+        dst,
+        value,
+    ], OPERAND_LENGTHS[dst.type], 0
+
+
+OPTIMIZATION_RULES = [
+    OptimizationRule('collapse_jump_chain', {'JMP'}, _collapse_jump_chain),
+    OptimizationRule('remove_jump_to_next', {'JMP'}, _remove_jump_to_next),
+    OptimizationRule('remove_redundant_mov', {'MOV'}, _remove_redundant_mov),
+    OptimizationRule('add_to_inc', {'ADD', 'INC'}, _add_to_inc),
+    OptimizationRule('sub_to_dec', {'SUB', 'DEC'}, _sub_to_dec),
+]
@@ -58,17 +58,14 @@ Token types:
 '''
 
 import ast
+import functools
 import re
 from collections import namedtuple
 from enum import Enum
-import logging
 
 from utils.errors import AldebaranError
 
 
-logger = logging.getLogger(__name__)
-
-
 Token = namedtuple('Token', [
     'type',  # TokenType
     'value',  # string | Reference | word | signed word | byte | register
@@ -141,35 +138,67 @@ LABEL_REFERENCE_TYPES = {
 class Tokenizer:
     '''
     Tokenizer based on: https://docs.python.org/3/library/re.html#writing-a-tokenizer
+
+    Every token rule is a capturing group of one big regex, so `match.lastindex` tells which rule matched.
+    Handlers are looked up by group index in a table built once, so matching needs no per-match objects
+    apart from the tokens themselves.
+    Multiple lines are tokenized in a single `finditer` pass, newlines separate the token lists of lines.
+    The regex is case-insensitive (ASCII only), so positions of matches are positions in the original code;
+    keywords, registers and literals are upper-cased by the handlers.
     '''
 
     def __init__(self, keywords):
         self.keywords = keywords
+        self._instruction_names = set(keywords['instruction_names'])
+        self._macro_names = set(keywords['macro_names'])
+        self._word_registers = set(keywords['word_registers'])
+        self._byte_registers = set(keywords['byte_registers'])
         self.token_rules = self._get_token_rules()
         self.tokenizer_regex = re.compile(r'|'.join(
             r'(?P<{}>{})'.format(token_rule.case, token_rule.regex)
             for token_rule in self.token_rules
-        ))
+        ), re.IGNORECASE | re.ASCII)
+        self._handlers = self._get_handlers()
+        self._newline_index = self.tokenizer_regex.groupindex['newline']
 
     def tokenize(self, code):
         '''
         Tokenize a single line of assembly code
         '''
-        logger.info('Code: %s', code)
-        tokens = []
-        for match in self.tokenizer_regex.finditer(code.upper()):
-            case_name = match.lastgroup
-            logger.debug('Match: %s @ %d', case_name, match.start())
-            case_handler = CaseHandler(code, match, self.keywords)
-            token = case_handler.handle_case(case_name)
-            if token is None:
-                continue
-            logger.debug('Token: %s', token)
-            tokens.append(token)
-        return tokens
+        return self.tokenize_lines([code])[0]
+
+    def tokenize_lines(self, lines):
+        '''
+        Tokenize lines of assembly code in one pass
+
+        Return list of token lists, one per line. Token positions are relative to the start of their line.
+        If a line cannot be tokenized, the raised error has the index of the line in `line_index`.
+        '''
+        code = '\n'.join(lines)
+        handlers = self._handlers
+        newline_index = self._newline_index
+        line_tokens = []
+        tokenized_lines = [line_tokens]
+        line_start = 0
+        try:
+            for match in self.tokenizer_regex.finditer(code):
+                index = match.lastindex
+                if index == newline_index:
+                    line_tokens = []
+                    tokenized_lines.append(line_tokens)
+                    line_start = match.end()
+                    continue
+                handler = handlers[index]
+                if handler is None:
+                    continue
+                line_tokens.append(handler(code, match, match.start() - line_start))
+        except TokenizerError as ex:
+            ex.line_index = len(tokenized_lines) - 1
+            raise
+        return tokenized_lines
 
     def _get_token_rules(self):
-        # NOTE: code.upper() is matched against these regex patterns
+        # NOTE: these regex patterns are matched case-insensitively
         basic_patterns = {
             'identifier': r'[A-Z_][A-Z0-9_]*',
             'var_name': r'[A-Z_][A-Z0-9_\[\]]*',
@@ -184,7 +213,7 @@ class Tokenizer:
                 'label'
             ),
             Rule(
-                r'''("(?:[^\"]|\.)*"|'(?:[^\']|\.)*')''',  # TODO: make it match '\''
+                r'''("(?:[^\"\n]|\.)*"|'(?:[^\'\n]|\.)*')''',  # TODO: make it match '\''
                 'string_literal'
             ),
             Rule(
@@ -262,7 +291,11 @@ class Tokenizer:
                 'identifier'
             ),
             Rule(
-                r'\s+',
+                r'\n',
+                'newline'
+            ),
+            Rule(
+                r'[^\S\n]+',
                 'whitespace'
             ),
             Rule(
@@ -272,214 +305,136 @@ class Tokenizer:
         ]
         return token_rules
 
-
-Rule = namedtuple('Rule', [
-    'regex',  # raw string (regex)
-    'case',  # string (casename or casename__subcasename of CaseHandler)
-])
-
-
-class CaseHandler:
-    '''
-    Handle cases of the tokenizer regex
-    '''
-
-    def __init__(self, code, match, keywords):
-        self.code = code
-        self.match = match
-        self.raw_value = match.group()
-        self.original_value = code[match.start():match.end()]
-        self.keywords = keywords
-
-    def handle_case(self, case_name):
-        '''
-        Return token for a given case
+    def _get_handlers(self):
         '''
-        if '__' in case_name:
-            case_name, subcase_name = case_name.split('__', 1)
-            case = getattr(self, '_case_{}'.format(case_name))(subcase_name)
-        else:
-            case = getattr(self, '_case_{}'.format(case_name))()
-        if case is None:
-            return None
-        return Token(
-            case.token_type,
-            case.value,
-            self.match.start(),
-        )
-
-    def _case_label(self):
-        return Case(
-            TokenType.LABEL,
-            self._get_subgroup_value('label_value'),
-        )
-
-    def _case_string_literal(self):
-        return Case(
-            TokenType.STRING_LITERAL,
-            self._get_string_literal_value(),
-        )
-
-    def _case_comment(self):
-        return Case(
-            TokenType.COMMENT,
-            self._get_subgroup_value('comment_value'),
-        )
-
-    def _case_macro(self):
-        macro_name = self.raw_value[1:]
-        if macro_name not in self.keywords['macro_names']:
-            self._raise_error(
-                'Unknown macro: {}'.format(macro_name),
-                UnknownMacroError,
-            )
-        return Case(
-            TokenType.MACRO,
-            macro_name,
-        )
+        Return handler table indexed by the regex group number of token rules
 
-    def _case_variable(self):
-        return Case(
-            TokenType.VARIABLE,
-            self.original_value,
+        Handlers get the original code, the match and the position of the match in its line, and return a token.
+        Rules without token (whitespace, newline) have no handler.
+        '''
+        groupindex = self.tokenizer_regex.groupindex
+        handlers = [None] * (self.tokenizer_regex.groups + 1)
+        for token_rule in self.token_rules:
+            if token_rule.case in {'whitespace', 'newline'}:
+                continue
+            if '__' in token_rule.case:
+                subcase_name = token_rule.case.split('__', 1)[1]
+                handler = functools.partial(self._handle_ref, self._get_ref_rule(subcase_name))
+            else:
+                handler = getattr(self, '_handle_{}'.format(token_rule.case))
+            handlers[groupindex[token_rule.case]] = handler
+        return handlers
+
+    def _get_ref_rule(self, subcase_name):
+        groupindex = self.tokenizer_regex.groupindex
+        return RefRule(
+            token_type={
+                'abs_reg': TokenType.ABS_REF_REG,
+                'word_reg': TokenType.REL_REF_WORD_REG,
+                'label_reg': TokenType.REL_REF_LABEL_REG,
+                'word_byte': TokenType.REL_REF_WORD_BYTE,
+                'label_byte': TokenType.REL_REF_LABEL_BYTE,
+                'word': TokenType.REL_REF_WORD,
+                'label': TokenType.REL_REF_LABEL,
+            }[subcase_name],
+            subcase=subcase_name,
+            base_index=groupindex['base_{}'.format(subcase_name)],
+            offset_index=groupindex.get('offset_{}'.format(subcase_name)),
+            offset_sign_index=groupindex.get('offset_sign_{}'.format(subcase_name)),
+            length_index=groupindex['length_{}'.format(subcase_name)],
         )
 
-    def _case_system_variable(self):
-        return Case(
-            TokenType.SYSTEM_VARIABLE,
-            self.original_value,
-        )
+    def _handle_label(self, code, match, pos):
+        return Token(TokenType.LABEL, code[match.start('label_value'):match.end('label_value')], pos)
 
-    def _case_address_word_literal(self):
-        return Case(
-            TokenType.ADDRESS_WORD_LITERAL,
-            self._get_address_hex_literal_value(),
-        )
+    def _handle_string_literal(self, code, match, pos):
+        original_value = code[match.start():match.end()]
+        try:
+            value = ast.literal_eval(original_value)
+        except Exception:
+            raise InvalidStringLiteralError('Invalid string literal: {}'.format(original_value), pos)
+        return Token(TokenType.STRING_LITERAL, value, pos)
 
-    def _case_address_label(self):
-        return Case(
-            TokenType.ADDRESS_LABEL,
-            self._get_subgroup_value('address_label_value'),
-        )
+    def _handle_comment(self, code, match, pos):
+        return Token(TokenType.COMMENT, code[match.start('comment_value'):match.end('comment_value')], pos)
 
-    def _case_word_literal(self):
-        return Case(
-            TokenType.WORD_LITERAL,
-            self._get_hex_literal_value(),
-        )
+    def _handle_macro(self, code, match, pos):
+        macro_name = match.group()[1:].upper()
+        if macro_name not in self._macro_names:
+            raise UnknownMacroError('Unknown macro: {}'.format(macro_name), pos)
+        return Token(TokenType.MACRO, macro_name, pos)
 
-    def _case_byte_literal(self):
-        return Case(
-            TokenType.BYTE_LITERAL,
-            self._get_hex_literal_value(),
-        )
+    def _handle_variable(self, code, match, pos):
+        return Token(TokenType.VARIABLE, code[match.start():match.end()], pos)
 
-    def _case_ref(self, subcase_name):
-        token_type = {
-            'abs_reg': TokenType.ABS_REF_REG,
-            'word_reg': TokenType.REL_REF_WORD_REG,
-            'label_reg': TokenType.REL_REF_LABEL_REG,
-            'word_byte': TokenType.REL_REF_WORD_BYTE,
-            'label_byte': TokenType.REL_REF_LABEL_BYTE,
-            'word': TokenType.REL_REF_WORD,
-            'label': TokenType.REL_REF_LABEL,
-        }[subcase_name]
-        return Case(
-            token_type,
-            self._get_ref_value(subcase_name),
-        )
+    def _handle_system_variable(self, code, match, pos):
+        return Token(TokenType.SYSTEM_VARIABLE, code[match.start():match.end()], pos)
 
-    def _case_identifier(self):
-        if self.raw_value in self.keywords['instruction_names']:
-            token_type = TokenType.INSTRUCTION
-        elif self.raw_value in self.keywords['word_registers']:
-            token_type = TokenType.WORD_REGISTER
-        elif self.raw_value in self.keywords['byte_registers']:
-            token_type = TokenType.BYTE_REGISTER
-        else:
-            token_type = TokenType.IDENTIFIER
-        if token_type == TokenType.IDENTIFIER:
-            token_value = self.original_value
-        else:
-            token_value = self.raw_value
-        return Case(
-            token_type,
-            token_value,
-        )
+    def _handle_address_word_literal(self, code, match, pos):
+        return Token(TokenType.ADDRESS_WORD_LITERAL, int(match.group()[1:], 16), pos)
 
-    def _case_whitespace(self):
-        return None
+    def _handle_address_label(self, code, match, pos):
+        return Token(TokenType.ADDRESS_LABEL, code[match.start('address_label_value'):match.end('address_label_value')], pos)
 
-    def _case_unexpected(self):
-        self._raise_error(
-            'Unexpected character "{}"'.format(self.original_value),
-            UnexpectedCharacterError,
-        )
+    def _handle_word_literal(self, code, match, pos):
+        return Token(TokenType.WORD_LITERAL, int(match.group(), 16), pos)
 
-    def _get_subgroup_value(self, subgroup):
-        return self.code[self.match.start(subgroup):self.match.end(subgroup)]
+    def _handle_byte_literal(self, code, match, pos):
+        return Token(TokenType.BYTE_LITERAL, int(match.group(), 16), pos)
 
-    def _get_string_literal_value(self):
-        try:
-            value = ast.literal_eval(self.original_value)
-        except Exception:
-            self._raise_error(
-                'Invalid string literal: {}'.format(self.original_value),
-                InvalidStringLiteralError,
-            )
-        return value
-
-    def _get_address_hex_literal_value(self):
-        return int(self.raw_value[1:], 16)
-
-    def _get_hex_literal_value(self):
-        return int(self.raw_value, 16)
-
-    def _get_ref_value(self, ref_type):
-        assert ref_type in {'abs_reg', 'word_reg', 'word_byte', 'word', 'label_reg', 'label_byte', 'label'}
-        base_subgroup_name = 'base_{}'.format(ref_type)
-        base = self.match.group(base_subgroup_name)
-        try:
-            offset = self.match.group('offset_{}'.format(ref_type))
-        except IndexError:
-            offset = None
-        try:
-            offset_sign = self.match.group('offset_sign_{}'.format(ref_type))
-        except IndexError:
-            offset_sign = None
-        length = 'B' if self.match.group('length_{}'.format(ref_type)) == 'B' else 'W'
-        if ref_type == 'abs_reg':
+    def _handle_ref(self, ref_rule, code, match, pos):
+        base = match.group(ref_rule.base_index)
+        offset = None if ref_rule.offset_index is None else match.group(ref_rule.offset_index)
+        length = 'B' if match.group(ref_rule.length_index).upper() == 'B' else 'W'
+        subcase = ref_rule.subcase
+        if subcase in {'word_reg', 'label_reg'}:
+            offset = offset.upper()
+        if subcase == 'abs_reg':
+            base = base.upper()
             if offset is None:
                 offset = 0
+            elif match.group(ref_rule.offset_sign_index) == '+':
+                offset = int(offset, 16)
             else:
-                if offset_sign == '+':
-                    offset = int(offset, 16)
-                else:
-                    offset = -int(offset, 16)
-        elif ref_type == 'word_reg':
+                offset = -int(offset, 16)
+        elif subcase in {'word_reg', 'word'}:
             base = int(base, 16)
-        elif ref_type == 'word_byte':
+        elif subcase == 'word_byte':
             base = int(base, 16)
             offset = int(offset, 16)
-        elif ref_type == 'word':
-            base = int(base, 16)
-        elif ref_type == 'label_reg':
-            base = self._get_subgroup_value(base_subgroup_name)
-        elif ref_type == 'label_byte':
-            base = self._get_subgroup_value(base_subgroup_name)
-            offset = int(offset, 16)
-        elif ref_type == 'label':
-            base = self._get_subgroup_value(base_subgroup_name)
-        return Reference(base, offset, length)
+        else:
+            base = code[match.start(ref_rule.base_index):match.end(ref_rule.base_index)]
+            if subcase == 'label_byte':
+                offset = int(offset, 16)
+        return Token(ref_rule.token_type, Reference(base, offset, length), pos)
+
+    def _handle_identifier(self, code, match, pos):
+        raw_value = match.group().upper()
+        if raw_value in self._instruction_names:
+            return Token(TokenType.INSTRUCTION, raw_value, pos)
+        if raw_value in self._word_registers:
+            return Token(TokenType.WORD_REGISTER, raw_value, pos)
+        if raw_value in self._byte_registers:
+            return Token(TokenType.BYTE_REGISTER, raw_value, pos)
+        return Token(TokenType.IDENTIFIER, code[match.start():match.end()], pos)
+
+    def _handle_unexpected(self, code, match, pos):
+        raise UnexpectedCharacterError('Unexpected character "{}"'.format(code[match.start():match.end()]), pos)
 
-    def _raise_error(self, error_message, exception):
-        raise exception(error_message, self.match.start())
 
+Rule = namedtuple('Rule', [
+    'regex',  # raw string (regex)
+    'case',  # string (casename or casename__subcasename of handler)
+])
 
 
-Case = namedtuple('Case', [
+RefRule = namedtuple('RefRule', [
     'token_type',  # TokenType
-    'value',  # same as Token.value
+    'subcase',  # string
+    'base_index',  # integer (regex group number)
+    'offset_index',  # integer (regex group number) | None
+    'offset_sign_index',  # integer (regex group number) | None
+    'length_index',  # integer (regex group number)
 ])
 
 
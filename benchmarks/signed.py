@@ -0,0 +1,93 @@
+'''
+Benchmark the conversion of signed operands
+
+Compares the former conversion through byte lists with the integer arithmetic of `to_signed` and `from_signed`,
+then runs a loop of signed instructions on the CPU.
+
+Usage: python -m benchmarks.signed [-n <number of conversions/instructions>]
+'''
+
+import argparse
+import time
+
+from assembler.assembler import Assembler
+from hardware.clock import Clock
+from hardware.cpu import CPU, Registers, Stack
+from hardware.memory import Memory, RAM
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import OpLen, WORD_REGISTERS, BYTE_REGISTERS, to_signed, from_signed
+from utils import config
+from utils import utils
+
+
+SOURCE_CODE = '''
+start:
+    MOV AX 0xFF00
+loop:
+    IADD AX AX 0x0003
+    IMUL BX AX 0xFFFE
+    JG AX 0x0000 start
+    JMP loop
+'''
+
+
+def main():
+    '''
+    Entry point of script
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n', '--number',
+        type=int,
+        default=100000,
+        help='Number of conversions and executed instructions (default: 100000)'
+    )
+    args = parser.parse_args()
+    values = [value & 0xFFFF for value in range(args.number)]
+
+    start_time = time.perf_counter()
+    for value in values:
+        utils.binary_to_number(utils.word_to_binary(utils.binary_to_number(utils.word_to_binary(value), signed=True), signed=True))
+    binary_duration = time.perf_counter() - start_time
+    _print_result('binary', args.number, binary_duration, 'conversions')
+
+    start_time = time.perf_counter()
+    for value in values:
+        from_signed(to_signed(value, OpLen.WORD), OpLen.WORD)
+    integer_duration = time.perf_counter() - start_time
+    _print_result('integer', args.number, integer_duration, 'conversions')
+    print('{:.2f}x speedup'.format(binary_duration / integer_duration))
+
+    opcode = Assembler(INSTRUCTION_SET, {
+        'byte': BYTE_REGISTERS,
+        'word': WORD_REGISTERS,
+    }).assemble_code(SOURCE_CODE)
+    _print_result('cpu', args.number, run(opcode, args.number), 'instructions')
+
+
+def run(opcode, number_of_instructions):
+    '''
+    Run opcode on a CPU (without devices and interrupts), return duration
+    '''
+    clock = Clock()
+    registers = Registers(config.system_addresses['bottom_of_stack'])
+    stack = Stack(config.system_addresses['bottom_of_stack'])
+    cpu = CPU(config.system_addresses, INSTRUCTION_SET, config.operand_buffer_size, config.cpu_halt_freq)
+    memory = Memory(config.ram_size)
+    ram = RAM(config.ram_size)
+    ram.write_block(0, opcode)
+    memory.register_architecture(ram, None)
+    cpu.register_architecture(registers, stack, memory, None, None, None, None, None)
+    start_time = time.perf_counter()
+    for _ in range(number_of_instructions):
+        clock.cycle_count += 1
+        cpu.step()
+    return time.perf_counter() - start_time
+
+
+def _print_result(name, number, duration, unit):
+    print('{:<10}{:>8.3f} s{:>12.0f} {}/s'.format(name, duration, number / duration, unit))
+
+
+if __name__ == '__main__':
+    main()
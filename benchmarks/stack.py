@@ -0,0 +1,110 @@
+'''
+Benchmark stack operations on a call-heavy workload
+
+Runs stack operations, then `software/factorial.ald` (recursive FACT with parameters on the stack) on the CPU,
+with Stack and FastStack.
+
+FastStack makes stack operations about 3-4x faster, but FACT only about 1.03-1.08x:
+its stack operations are a small part of the time of a CPU step, most of which is reading and parsing instructions.
+
+Usage: python -m benchmarks.stack [-n <number of instructions and stack operations>] [-r <number of runs>]
+'''
+
+import argparse
+import os
+import time
+
+from assembler.assembler import Assembler
+from hardware.clock import Clock
+from hardware.cpu import CPU, Registers, Stack, FastStack
+from hardware.memory import Memory, RAM
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+from utils import config
+
+
+SOURCE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'software', 'factorial.ald')
+
+
+def main():
+    '''
+    Entry point of script
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n', '--instructions',
+        type=int,
+        default=100000,
+        help='Number of executed instructions and stack operations (default: 100000)'
+    )
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int,
+        default=3,
+        help='Number of runs, the fastest one is reported (default: 3)'
+    )
+    args = parser.parse_args()
+    with open(SOURCE_FILE) as source_file:
+        opcode = Assembler(INSTRUCTION_SET, {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        }).assemble_code(source_file.read())
+
+    for name, function in [('push/pop', run_stack_operations), ('FACT', run)]:
+        durations = {
+            stack_class: min(function(opcode, args.instructions, stack_class) for _ in range(args.repeat))
+            for stack_class in [Stack, FastStack]
+        }
+        for stack_class, duration in durations.items():
+            _print_result('{} {}'.format(name, stack_class.__name__), args.instructions, duration)
+        print('{:.2f}x speedup'.format(durations[Stack] / durations[FastStack]))
+
+
+def run(opcode, number_of_instructions, stack_class):
+    '''
+    Run opcode on a CPU (without devices and interrupts), return duration
+    '''
+    clock = Clock()
+    registers, stack, memory = _get_stack(opcode, stack_class)
+    cpu = CPU(config.system_addresses, INSTRUCTION_SET, config.operand_buffer_size, config.cpu_halt_freq)
+    cpu.register_architecture(registers, stack, memory, None, None, None, None, None)
+    start_time = time.perf_counter()
+    for _ in range(number_of_instructions):
+        clock.cycle_count += 1
+        cpu.step()
+    return time.perf_counter() - start_time
+
+
+def run_stack_operations(opcode, number_of_operations, stack_class):
+    '''
+    Push and pop words, bytes and flags (`number_of_operations` in total), return duration
+    '''
+    _, stack, _ = _get_stack(opcode, stack_class)
+    start_time = time.perf_counter()
+    for _ in range(number_of_operations // 6):
+        stack.push_word(0x1234)
+        stack.push_byte(0x56)
+        stack.push_flags()
+        stack.pop_flags()
+        stack.pop_byte()
+        stack.pop_word()
+    return time.perf_counter() - start_time
+
+
+def _get_stack(opcode, stack_class):
+    registers = Registers(config.system_addresses['bottom_of_stack'])
+    stack = stack_class(config.system_addresses['bottom_of_stack'])
+    memory = Memory(config.ram_size)
+    ram = RAM(config.ram_size)
+    ram.write_block(0, opcode)
+    memory.register_architecture(ram, None)
+    stack.register_architecture(registers, memory)
+    return registers, stack, memory
+
+
+def _print_result(name, number, duration):
+    print('{:<20}{:>8.3f} s{:>12.0f} /s'.format(name, duration, number / duration))
+
+
+if __name__ == '__main__':
+    main()
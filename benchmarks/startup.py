@@ -0,0 +1,133 @@
+'''
+Benchmark startup of run_aldebaran.py: cold start to the first executed instruction
+
+Runs an executable whose first instruction prints a character, and measures the time until it appears.
+Import times come from `python -X importtime`.
+
+Usage: python -m benchmarks.startup [-n <runs>] [-t <target in ms>]
+'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from assembler.assembler import Assembler
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+from utils.executable import Executable
+
+
+RUN_ALDEBARAN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'run_aldebaran.py')
+
+SOURCE_CODE = '''
+PRINTCHAR 0x21
+SHUTDOWN
+'''
+
+# modules that should not be imported if they are not used
+LAZY_MODULES = [
+    'requests',
+    'hardware.debugger.debugger',
+    'hardware.host',
+    'hardware.farm',
+    'multiprocessing',
+]
+
+
+def main():
+    '''
+    Entry point of script
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n', '--runs',
+        type=int,
+        default=5,
+        help='Number of runs (default: 5)'
+    )
+    parser.add_argument(
+        '-t', '--target',
+        type=float,
+        default=250,
+        help='Target of median time to the first instruction in ms (default: 250)'
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='Number of slowest top-level imports to show (default: 10)'
+    )
+    args = parser.parse_args()
+    opcode = Assembler(INSTRUCTION_SET, {
+        'byte': BYTE_REGISTERS,
+        'word': WORD_REGISTERS,
+    }).assemble_code(SOURCE_CODE)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        exe_filename = os.path.join(tmp_dir, 'startup')
+        Executable(1, opcode).save_to_file(exe_filename)
+        durations = []
+        for _ in range(args.runs):
+            start_time = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, '-X', 'importtime', RUN_ALDEBARAN, exe_filename],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            # output of the first instruction
+            process.stdout.read(1)
+            durations.append(time.perf_counter() - start_time)
+            _, stderr = process.communicate()
+    import_times = parse_import_times(stderr.decode('utf-8'))
+
+    print('Slowest top-level imports (cumulative):')
+    top_level_import_times = sorted(
+        (
+            (cumulative, module_name)
+            for module_name, (self_time, cumulative, depth) in import_times.items()
+            if depth == 0
+        ),
+        reverse=True,
+    )
+    for cumulative, module_name in top_level_import_times[:args.top]:
+        print('{:>10.1f} ms  {}'.format(cumulative / 1000, module_name))
+    imported_lazy_modules = [module_name for module_name in LAZY_MODULES if module_name in import_times]
+    if imported_lazy_modules:
+        print('Imported but not used: {}'.format(', '.join(imported_lazy_modules)))
+    median = statistics.median(durations) * 1000
+    print('First instruction: median {:.1f} ms, min {:.1f} ms ({} runs), target {:.0f} ms: {}'.format(
+        median,
+        min(durations) * 1000,
+        args.runs,
+        args.target,
+        'OK' if median <= args.target else 'FAILED',
+    ))
+    if median > args.target or imported_lazy_modules:
+        sys.exit(1)
+
+
+def parse_import_times(importtime_output):
+    '''
+    Return {module name: (self time, cumulative time, depth)} from `python -X importtime` output (times in us)
+    '''
+    import_times = {}
+    for line in importtime_output.split('\n'):
+        if not line.startswith('import time:'):
+            continue
+        try:
+            self_time, cumulative, name = line[len('import time:'):].split('|')
+            self_time = int(self_time)
+            cumulative = int(cumulative)
+        except ValueError:
+            continue  # header
+        module_name = name.strip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        import_times[module_name] = (self_time, cumulative, depth)
+    return import_times
+
+
+if __name__ == '__main__':
+    main()
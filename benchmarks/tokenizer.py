@@ -0,0 +1,74 @@
+'''
+Benchmark tokenizer on generated source code
+
+Usage: python -m benchmarks.tokenizer [-n <number of lines>]
+'''
+
+import argparse
+import time
+
+from assembler.macros import MACRO_SET
+from assembler.tokenizer import Tokenizer
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+
+
+SOURCE_LINE_TEMPLATES = [
+    'label_{n}: MOV AX [data_{n}]  # comment {n}',
+    '    ADD AX BX 0x{n:04X}',
+    '    JLE AX 0x0010 label_{n}',
+    '    MOV [AX+0x12]B AL',
+    '    MOV [label_{n}+BX] ^0x1234',
+    '    PUSH [0x1234+0x56]',
+    '    NOP',
+    'data_{n}: .DAT 0x{n:04X} "hello world"',
+]
+
+
+def main():
+    '''
+    Entry point of script
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n', '--lines',
+        type=int,
+        default=100000,
+        help='Number of generated source code lines'
+    )
+    args = parser.parse_args()
+    tokenizer = Tokenizer({
+        'instruction_names': [inst.__name__ for _, inst in INSTRUCTION_SET],
+        'macro_names': list(MACRO_SET.keys()),
+        'word_registers': WORD_REGISTERS,
+        'byte_registers': BYTE_REGISTERS,
+    })
+    lines = generate_source_lines(args.lines)
+
+    start_time = time.perf_counter()
+    tokenized_lines = [tokenizer.tokenize(line) for line in lines]
+    _print_result('line by line', len(lines), time.perf_counter() - start_time)
+
+    del tokenized_lines
+
+    start_time = time.perf_counter()
+    tokenized_lines = tokenizer.tokenize_lines(lines)
+    _print_result('one pass', len(lines), time.perf_counter() - start_time)
+
+
+def generate_source_lines(number_of_lines):
+    '''
+    Return list of `number_of_lines` source code lines with every token type
+    '''
+    return [
+        SOURCE_LINE_TEMPLATES[idx % len(SOURCE_LINE_TEMPLATES)].format(n=idx // len(SOURCE_LINE_TEMPLATES))
+        for idx in range(number_of_lines)
+    ]
+
+
+def _print_result(name, number_of_lines, duration):
+    print('{:<14}{:>8.3f} s{:>12.0f} lines/s'.format(name, duration, number_of_lines / duration))
+
+
+if __name__ == '__main__':
+    main()
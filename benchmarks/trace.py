@@ -0,0 +1,97 @@
+'''
+Benchmark the cost of recording an execution trace
+
+Runs the same loop on the CPU without and with a trace recorder.
+
+Usage: python -m benchmarks.trace [-n <number of instructions>]
+'''
+
+import argparse
+import os
+import tempfile
+import time
+
+from assembler.assembler import Assembler
+from hardware.clock import Clock
+from hardware.cpu import CPU, Registers, Stack
+from hardware.memory import Memory, RAM
+from hardware.trace_recorder import TraceRecorder
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+from utils import config
+
+
+SOURCE_CODE = '''
+loop:
+    INC AX 0x0001
+    PUSH AX
+    POP BX
+    MOV [data] BX
+    JMP loop
+data: .DAT 0x0000
+'''
+
+
+def main():
+    '''
+    Entry point of script
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-n', '--instructions',
+        type=int,
+        default=100000,
+        help='Number of executed instructions (default: 100000)'
+    )
+    args = parser.parse_args()
+    opcode = Assembler(INSTRUCTION_SET, {
+        'byte': BYTE_REGISTERS,
+        'word': WORD_REGISTERS,
+    }).assemble_code(SOURCE_CODE)
+
+    duration = run(opcode, args.instructions, None)
+    _print_result('no trace', args.instructions, duration)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        trace_filename = os.path.join(tmp_dir, 'trace')
+        trace_recorder = TraceRecorder(trace_filename, config.trace_block_size)
+        traced_duration = run(opcode, args.instructions, trace_recorder)
+        _print_result('trace', args.instructions, traced_duration)
+        print('{} records, {} bytes, {:.2f}x slowdown'.format(
+            trace_recorder.record_count,
+            os.path.getsize(trace_filename),
+            traced_duration / duration,
+        ))
+
+
+def run(opcode, number_of_instructions, trace_recorder):
+    '''
+    Run opcode on a CPU (without devices and interrupts), return duration
+    '''
+    clock = Clock()
+    registers = Registers(config.system_addresses['bottom_of_stack'])
+    stack = Stack(config.system_addresses['bottom_of_stack'])
+    cpu = CPU(config.system_addresses, INSTRUCTION_SET, config.operand_buffer_size, config.cpu_halt_freq)
+    memory = Memory(config.ram_size)
+    ram = RAM(config.ram_size)
+    ram.write_block(0, opcode)
+    memory.register_architecture(ram, None, trace_recorder)
+    cpu.register_architecture(registers, stack, memory, None, None, None, None, None, trace_recorder)
+    if trace_recorder is not None:
+        trace_recorder.register_architecture(clock, registers)
+        trace_recorder.start()
+    start_time = time.perf_counter()
+    for _ in range(number_of_instructions):
+        clock.cycle_count += 1
+        cpu.step()
+    if trace_recorder is not None:
+        trace_recorder.stop()
+    return time.perf_counter() - start_time
+
+
+def _print_result(name, number_of_instructions, duration):
+    print('{:<10}{:>8.3f} s{:>12.0f} instructions/s'.format(name, duration, number_of_instructions / duration))
+
+
+if __name__ == '__main__':
+    main()
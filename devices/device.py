@@ -33,8 +33,9 @@ class Device:
     - override handle_data() to handle data coming from Aldebaran
     '''
 
-    def __init__(self, ioport_number, device_descriptor, aldebaran_address, device_address):
+    def __init__(self, ioport_number, device_descriptor, aldebaran_address, device_address, vm_id=None):
         self.ioport_number = ioport_number
+        self.vm_id = vm_id  # VM of a multi-VM host
         self.device_type, self.device_id = device_descriptor
         self.aldebaran_host, self.aldebaran_device_controller_port = aldebaran_address
         self.device_host, self.device_port = device_address
@@ -169,13 +170,16 @@ class Device:
     def _send_request(self, command, data=None, content_type='application/octet-stream'):
         if data is None:
             data = b''
+        if self.vm_id is None:
+            path = '{}/{}'.format(self.ioport_number, command)
+        else:
+            path = '{}/{}/{}'.format(self.vm_id, self.ioport_number, command)
         try:
             response = requests.post(
-                'http://{}:{}/{}/{}'.format(
+                'http://{}:{}/{}'.format(
                     self.aldebaran_host,
                     self.aldebaran_device_controller_port,
-                    self.ioport_number,
-                    command,
+                    path,
                 ),
                 data=data,
                 headers={'Content-Type': content_type},
@@ -4,9 +4,10 @@ Internal components of Aldebaran
 
 from .aldebaran import Aldebaran
 from .clock import Clock
-from .cpu import CPU, Registers, Stack
+from .cpu import CPU, Registers, Stack, FastStack, InstructionFuser
 from .device_controller import DeviceController, IOPort
+from .dma_controller import DMAController
 from .interrupt_controller import InterruptController
 from .memory import Memory, RAM, VirtualRAM
 from .timer import Timer
-from .debugger import Debugger
+from .trace_recorder import TraceRecorder
@@ -16,6 +16,9 @@ logger = logging.getLogger(__name__)
 logger_crash_dump = logging.getLogger(__name__ + '-crash-dump')
 
 
+SNAPSHOT_VERSION = 1
+
+
 class Aldebaran:
     '''
     Aldebaran
@@ -32,8 +35,13 @@ class Aldebaran:
         self.interrupt_controller = components['interrupt_controller']
         self.device_controller = components['device_controller']
         self.timer = components['timer']
+        self.dma_controller = components['dma_controller']
         self.debugger = components['debugger']
+        self.trace_recorder = components.get('trace_recorder')
+        self.instruction_fuser = components.get('instruction_fuser')
+        self.time_travel = components.get('time_travel')
         # architecture:
+        self.memory.register_architecture(self.ram, self.virtual_ram, self.trace_recorder)  # before the stack
         self.cpu.register_architecture(
             self.registers,
             self.stack,
@@ -41,15 +49,25 @@ class Aldebaran:
             self.interrupt_controller,
             self.device_controller,
             self.timer,
+            self.dma_controller,
             self.debugger,
+            self.trace_recorder,
+            self.instruction_fuser,
         )
         self.clock.register_architecture(self.cpu)
         self.device_controller.register_architecture(self.interrupt_controller)
         self.timer.register_architecture(self.interrupt_controller)
-        self.memory.register_architecture(self.ram, self.virtual_ram)
+        self.dma_controller.register_architecture(self.ram, self.device_controller, self.interrupt_controller)
         self.virtual_ram.register_architecture(self.device_controller)
+        if self.time_travel:
+            self.time_travel.register_architecture(
+                self.cpu, self.clock, self.ram,
+                self.interrupt_controller, self.device_controller, self.dma_controller,
+            )
         if self.debugger:
-            self.debugger.register_architecture(self.cpu, self.clock, self.memory)
+            self.debugger.register_architecture(self.cpu, self.clock, self.memory, self.device_controller, self.time_travel)
+        if self.trace_recorder:
+            self.trace_recorder.register_architecture(self.clock, self.registers)
 
     def boot(self, boot_file):
         '''
@@ -57,35 +75,112 @@ class Aldebaran:
         '''
         logger.info('Loading boot file %s...', boot_file)
         boot_loader = boot.BootLoader(self.ram)
-        boot_image = config.create_boot_image()  # later it should be loaded from file
+        boot_image = config.get_boot_image()
         boot_loader.load_image(0, boot_image)
-        boot_exe = executable.Executable()
-        boot_exe.load_from_file(boot_file)
-        if boot_exe.version != 1:
-            raise UnsupportedExecutableVersionError('Unsupported version: {}'.format(boot_exe.version))
-        boot_loader.load_executable(config.system_addresses['entry_point'], boot_exe)
+        with executable.ExecutableFile(boot_file) as boot_exe:
+            if boot_exe.version not in executable.SUPPORTED_VERSIONS:
+                raise UnsupportedExecutableVersionError('Unsupported version: {}'.format(boot_exe.version))
+            boot_loader.load_executable(config.system_addresses['entry_point'], boot_exe)
         logger.info('Loaded.')
 
     def run(self):
         '''
-        Start device controller, timer and clock
+        Start device controller, timer, DMA controller and clock
         '''
         logger.info('Started.')
         if self.debugger:
             self.debugger.start()
+        if self.trace_recorder:
+            self.trace_recorder.start()
         self.device_controller.start()
         self.timer.start()
+        self.dma_controller.start()
         start_time = time.time()
         try:
             self.clock.run(bool(self.debugger))
         finally:
             stop_time = time.time()
+            self.dma_controller.stop()
             self.timer.stop()
             self.device_controller.stop()
             if self.debugger:
                 self.debugger.stop()
+            if self.trace_recorder:
+                self.trace_recorder.stop()
             self._print_stats(start_time, stop_time)
 
+    def run_slice(self, max_cycles, now):
+        '''
+        Run timer beats and DMA transfers that are due, then at most `max_cycles` cycles, return number of cycles run
+
+        It's the cooperative version of `run` (e.g. for a multi-VM host): no threads are started,
+        and the device controller must be served from outside.
+        '''
+        self.timer.run_due_beats(now)
+        self.dma_controller.run_transfers()
+        return self.clock.run_slice(max_cycles)
+
+    def get_snapshot(self):
+        '''
+        Return state of CPU, registers and RAM as a dict (to save as JSON)
+
+        Devices, timers and DMA transfers are not in the snapshot.
+        '''
+        return {
+            'version': SNAPSHOT_VERSION,
+            'cycle_count': self.clock.cycle_count,
+            'ip': self.cpu.ip,
+            'halt': self.cpu.halt,
+            'shutdown': self.cpu.shutdown,
+            'registers': self.cpu.registers.get_word_registers(),
+            'flag_word': self.cpu.registers.get_flag_word(),
+            'ram': self.ram.read_block(0, self.ram.size, silent=True).hex(),
+        }
+
+    def load_snapshot(self, snapshot):
+        '''
+        Restore state from snapshot (instead of booting)
+        '''
+        ram = self._check_snapshot(snapshot)
+        self.ram.write_block(0, ram, silent=True)
+        self.cpu.ip = snapshot['ip']
+        self.cpu.halt = snapshot['halt']
+        self.cpu.shutdown = snapshot['shutdown']
+        # updated in place, as the stack may hold the register storage
+        self.cpu.registers.get_word_register_storage().update(snapshot['registers'])
+        self.cpu.registers.set_flag_word(snapshot['flag_word'])
+        self.clock.cycle_count = snapshot['cycle_count']
+        logger.info('Snapshot loaded (cycle %d).', self.clock.cycle_count)
+
+    def _check_snapshot(self, snapshot):
+        '''
+        Check snapshot before restoring anything from it, return RAM content
+        '''
+        if not isinstance(snapshot, dict):
+            raise InvalidSnapshotError('Snapshot must be an object')
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise UnsupportedSnapshotVersionError('Unsupported version: {}'.format(snapshot.get('version')))
+        for key in ['cycle_count', 'ip', 'flag_word']:
+            value = snapshot.get(key)
+            if not _is_int(value) or value < 0 or (key != 'cycle_count' and value > 0xFFFF):
+                raise InvalidSnapshotError('Invalid {}: {}'.format(key, value))
+        for key in ['halt', 'shutdown']:
+            if not isinstance(snapshot.get(key), bool):
+                raise InvalidSnapshotError('Invalid {}: {}'.format(key, snapshot.get(key)))
+        registers = snapshot.get('registers')
+        if not isinstance(registers, dict) or set(registers) != set(self.cpu.registers.get_word_registers()):
+            raise InvalidSnapshotError('Invalid registers: {}'.format(registers))
+        for register_name, value in registers.items():
+            if not _is_int(value) or value < 0 or value > 0xFFFF:
+                raise InvalidSnapshotError('Invalid value of {}: {}'.format(register_name, value))
+        try:
+            ram = bytes.fromhex(snapshot.get('ram'))
+        except (TypeError, ValueError):
+            raise InvalidSnapshotError('Invalid RAM content')
+        if len(ram) != self.ram.size:
+            raise InvalidSnapshotError('RAM size mismatch: {} != {}'.format(len(ram), self.ram.size))
+        return ram
+
     def _print_stats(self, start_time, stop_time):
         full_time = stop_time - start_time
         sleep_time = self.clock.sleep_time
@@ -109,6 +204,10 @@ class Aldebaran:
             round(sleep_time, 2),
             round(full_time, 2),
         )
+        if self.instruction_fuser:
+            logger.info('Superinstructions:')
+            for line in self.instruction_fuser.get_report():
+                logger.info('  %s', line)
 
     def crash_dump(self):
         '''
@@ -177,7 +276,23 @@ class Aldebaran:
             logger_crash_dump.error('%s=%s', reg, utils.word_to_str(self.cpu.registers.get_register(reg, silent=True)))
 
 
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
 # pylint: disable=missing-docstring
 
 class UnsupportedExecutableVersionError(AldebaranError):
     pass
+
+
+class SnapshotError(AldebaranError):
+    pass
+
+
+class UnsupportedSnapshotVersionError(SnapshotError):
+    pass
+
+
+class InvalidSnapshotError(SnapshotError):
+    pass
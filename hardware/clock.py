@@ -6,13 +6,19 @@ import logging
 import queue
 import time
 
+from utils import utils
 from utils.errors import ArchitectureError
+from .dma_controller import DMACrashError
 from .timer import TimerCrashError
 
 
 logger = logging.getLogger(__name__)
 
 
+# cycles between checking pause requests and crashed threads when running until a break in debug mode
+DEBUGGER_CHECK_PERIOD = 1024
+
+
 class Clock:
     '''
     Clock
@@ -62,23 +68,54 @@ class Clock:
                     break
                 if not self.cpu.timer.is_alive():
                     raise TimerCrashError('Timer crashed')
+                if not self.cpu.dma_controller.is_alive():
+                    raise DMACrashError('DMA Controller crashed')
         except (KeyboardInterrupt, SystemExit):
             pass
         finally:
             logger.info('Stopped.')
 
+    def run_slice(self, max_cycles):
+        '''
+        Run at most `max_cycles` cycles at full speed (instead of `run`, e.g. in a multi-VM host), return number of cycles run
+
+        The slice ends early when the CPU shuts down or it's halted and cannot take an interrupt.
+        '''
+        cpu = self.cpu
+        interrupt_controller = cpu.interrupt_controller
+        cycles = 0
+        while cycles < max_cycles and not cpu.shutdown:
+            if cpu.halt and not (interrupt_controller.is_pending() and cpu.registers.get_flag('interrupt', silent=True)):
+                break
+            self.cycle_count += 1
+            cpu.step()
+            cycles += 1
+        return cycles
+
     def _run_with_debugger(self):
         self.debugger_queue = queue.Queue()
+        time_travel = self.cpu.debugger.time_travel
         try:
             while True:
                 try:
                     command = self.debugger_queue.get(timeout=0.1)
                 except queue.Empty:
                     continue
-                if not self.cpu.shutdown:
-                    if command['action'] == 'step':
+                if command['action'] in {'goto', 'step_back'}:
+                    if time_travel is not None:
+                        if command['action'] == 'goto':
+                            time_travel.goto(int(command['data']['cycle']))
+                        else:
+                            time_travel.goto(self.cycle_count - int(command['data']['step_count']))
+                    self.cpu.debugger.notify()
+                elif not self.cpu.shutdown:
+                    if command['action'] == 'run':
+                        self._run_until_break()
+                    elif command['action'] == 'step':
                         step_count = int(command['data']['step_count'])
                         for _ in range(step_count):
+                            if time_travel is not None:
+                                time_travel.before_cycle()
                             self.cycle_count += 1
                             logger.debug('Cycle %d', self.cycle_count)
                             self.cpu.step()
@@ -86,11 +123,52 @@ class Clock:
                                 break
                             if not self.cpu.timer.is_alive():
                                 raise TimerCrashError('Timer crashed')
+                            if not self.cpu.dma_controller.is_alive():
+                                raise DMACrashError('DMA Controller crashed')
+                        self.cpu.debugger.notify()
         except (KeyboardInterrupt, SystemExit):
             pass
         finally:
             logger.info('Stopped.')
 
+    def _run_until_break(self):
+        '''
+        Run CPU at full speed until a breakpoint or watchpoint is hit, pause is requested or CPU shuts down
+        '''
+        debugger = self.cpu.debugger
+        breakpoints = debugger.breakpoints
+        watchpoints = debugger.watchpoints
+        time_travel = debugger.time_travel
+        debugger.run_started()
+        break_reason = None
+        while break_reason is None:
+            if time_travel is not None:
+                time_travel.before_cycle()
+            self.cycle_count += 1
+            logger.debug('Cycle %d', self.cycle_count)
+            self.cpu.step()
+            if self.cpu.shutdown:
+                break_reason = {
+                    'reason': 'shutdown',
+                }
+            elif breakpoints[self.cpu.ip]:
+                break_reason = {
+                    'reason': 'breakpoint',
+                    'address': utils.word_to_str(self.cpu.ip),
+                }
+            elif watchpoints.hit is not None:
+                break_reason = dict(watchpoints.hit, reason='watchpoint')
+            elif self.cycle_count % DEBUGGER_CHECK_PERIOD == 0:
+                if debugger.pause_requested.is_set():
+                    break_reason = {
+                        'reason': 'pause',
+                    }
+                if not self.cpu.timer.is_alive():
+                    raise TimerCrashError('Timer crashed')
+                if not self.cpu.dma_controller.is_alive():
+                    raise DMACrashError('DMA Controller crashed')
+        debugger.run_stopped(break_reason)
+
     def _sleep(self):
         '''
         Sleep enough so that the average cycle period converges to `Clock.period`
@@ -4,4 +4,5 @@ Internal components of CPU
 
 from .cpu import CPU
 from .registers import Registers
-from .stack import Stack
+from .stack import Stack, FastStack
+from .superinstructions import InstructionFuser
@@ -38,10 +38,15 @@ class CPU:
         self.interrupt_controller = None
         self.device_controller = None
         self.timer = None
+        self.dma_controller = None
         self.debugger = None
+        self.trace_recorder = None
+        self.instruction_fuser = None
+        self.time_travel = None  # set by the debugger's time travel
         self.architecture_registered = False
 
-    def register_architecture(self, registers, stack, memory, interrupt_controller, device_controller, timer, debugger):
+    def register_architecture(self, registers, stack, memory, interrupt_controller, device_controller, timer, dma_controller, debugger,
+                              trace_recorder=None, instruction_fuser=None):
         '''
         Register other internal devices
         '''
@@ -52,7 +57,15 @@ class CPU:
         self.interrupt_controller = interrupt_controller
         self.device_controller = device_controller
         self.timer = timer
+        self.dma_controller = dma_controller
         self.debugger = debugger
+        self.trace_recorder = trace_recorder
+        # a superinstruction runs two instructions in one step, but the debugger (breakpoints, stepping,
+        # time travel replay) and the trace recorder need one instruction per step, so instructions are not fused
+        # when debugging or tracing
+        self.instruction_fuser = instruction_fuser if debugger is None and trace_recorder is None else None
+        if self.instruction_fuser is not None:
+            self.instruction_fuser.register_architecture(self)
         self.architecture_registered = True
 
     def step(self):
@@ -65,13 +78,27 @@ class CPU:
         if self._check_hardware_interrupts():
             return
         if self.halt:
-            time.sleep(1 / self.halt_freq)  # so it doesn't burn the host machine's CPU in turbo mode
+            if self.time_travel is None or not self.time_travel.replaying:
+                time.sleep(1 / self.halt_freq)  # so it doesn't burn the host machine's CPU in turbo mode
             return
         self._mini_debugger()
+        if self.instruction_fuser is not None:
+            next_ip = self.instruction_fuser.run_superinstruction(self.ip)
+            if next_ip is not None:
+                self.ip = next_ip
+                return
+            start_time = time.perf_counter()
         inst_opcode, operand_buffer = self.read_instruction(self.ip)
         instruction = self.parse_instruction(inst_opcode, operand_buffer)
         self.last_ip = self.ip
-        self.ip = instruction.run()
+        if self.trace_recorder is not None:
+            self.trace_recorder.record_instruction(self.ip, inst_opcode, operand_buffer)
+            self.ip = instruction.run()
+            self.trace_recorder.record_registers()
+        elif self.instruction_fuser is not None:
+            self.ip = self.instruction_fuser.run(instruction, start_time)
+        else:
+            self.ip = instruction.run()
 
     def read_instruction(self, ip):
         '''
@@ -103,6 +130,8 @@ class CPU:
         '''
         Log message to user log
         '''
+        if self.time_travel is not None and self.time_travel.replaying:
+            return  # already logged
         logger_user.info(message, *args)
         if self.debugger:
             self.debugger.user_log(message)
@@ -139,10 +168,14 @@ class CPU:
     def _call_hardware_interrupt(self, interrupt_number):
         logger.debug('Calling hardware interrupt: %s', utils.byte_to_str(interrupt_number))
         self.halt = False
+        if self.trace_recorder is not None:
+            self.trace_recorder.record_interrupt(interrupt_number)
         self.stack.push_flags()
         self.disable_interrupts()
         self.stack.push_word(self.ip)
         self.ip = self.memory.read_word(self.system_addresses['IVT'] + 2 * interrupt_number)
+        if self.trace_recorder is not None:
+            self.trace_recorder.record_registers()
 
     def _mini_debugger(self):
         if logger.level != logging.DEBUG:
@@ -34,6 +34,7 @@ class Registers:
         self._flags = {
             'interrupt': 1,
         }
+        self._flag_word = self._get_flag_word()
 
     def get_register(self, register_name, silent=False):
         '''
@@ -56,6 +57,18 @@ class Registers:
             logger.debug('Get register %s = %s', register_name, hex_value)
         return value
 
+    def get_word_registers(self):
+        '''
+        Get values of word registers as a dict (without logging)
+        '''
+        return dict(self._registers)
+
+    def get_word_register_storage(self):
+        '''
+        Get the dict storing the values of word registers (for fast paths, values written to it must be words)
+        '''
+        return self._registers
+
     def set_register(self, register_name, value, silent=False):
         '''
         Set register value
@@ -110,9 +123,30 @@ class Registers:
         if value not in {0, 1}:
             raise InvalidFlagValueError('Invalid flag value: {}'.format(value))
         self._flags[flag_name] = value
+        self._flag_word = self._get_flag_word()
         if not silent:
             logger.debug('Set flag %s = %s', flag_name, value)
 
+    def get_flag_word(self):
+        '''
+        Get all flags as a word (bit N = flag N of FLAGS)
+        '''
+        return self._flag_word
+
+    def set_flag_word(self, flag_word):
+        '''
+        Set all flags from a word (bit N = flag N of FLAGS)
+        '''
+        for idx, flag_name in enumerate(FLAGS):
+            self._flags[flag_name] = (flag_word >> idx) & 0x0001
+        self._flag_word = self._get_flag_word()
+
+    def _get_flag_word(self):
+        flag_word = 0x0000
+        for idx, flag_name in enumerate(FLAGS):
+            flag_word += self._flags[flag_name] << idx
+        return flag_word
+
 
 # pylint: disable=missing-docstring
 
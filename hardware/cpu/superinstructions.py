@@ -0,0 +1,224 @@
+'''
+Superinstructions: pairs of adjacent instructions executed in one CPU step
+
+The instruction fuser profiles which instruction falls through to which one (per IP), and when a pair
+at the same IP has run `threshold` times, it's fused: both instructions are decoded once and kept with the bytes
+they were decoded from, so from then on the pair runs in one step without reading and parsing its instructions.
+The binary is not changed, the pair is detected in memory.
+'''
+
+from collections import namedtuple
+import logging
+import time
+
+from instructions.operands import operand_to_str
+from utils import utils
+
+
+logger = logging.getLogger('hardware.cpu')
+
+
+# instructions that never jump, halt or touch interrupts and I/O, so they can be the first of a fused pair
+FUSABLE_INSTRUCTIONS = {
+    'NOP', 'PRINT', 'PRINTCHAR',
+    'ADD', 'SUB', 'MUL', 'DIV', 'MOD', 'INC', 'DEC',
+    'IADD', 'ISUB', 'IMUL', 'IDIV', 'IMOD', 'IINC', 'IDEC', 'NEG',
+    'MOV', 'PUSH', 'POP',
+}
+
+
+class InstructionFuser:
+    '''
+    Instruction fuser
+
+    A superinstruction takes one clock cycle, but hardware interrupts are still checked between its instructions.
+    Before each instruction of a superinstruction runs, its bytes in RAM are compared with the decoded ones:
+    if the code at a fused IP has been written to (e.g. self-modifying code), the superinstruction is thrown away.
+    Only code in RAM is fused.
+
+    The time of unfused instructions (read, parse and run) is measured per instruction, and the time saved by
+    a superinstruction is the time its two instructions would take unfused minus its own measured time.
+    '''
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.stats = {}  # name -> SuperinstructionStats
+        self._pair_counts = {}
+        self._superinstructions = {}  # IP -> Superinstruction
+        self._previous = None  # (instruction, opcode, fall-through IP) of last instruction that fell through
+        self._instruction_times = {}  # instruction class -> [number of runs, sum of durations]
+        self.cpu = None
+        self._content = None
+        self._ram_size = 0
+        self.architecture_registered = False
+
+    def register_architecture(self, cpu):
+        '''
+        Register other internal devices
+        '''
+        self.cpu = cpu
+        self._content = cpu.memory.ram._content  # pylint: disable=protected-access
+        self._ram_size = cpu.memory.ram.size
+        self.architecture_registered = True
+
+    def run(self, instruction, start_time):
+        '''
+        Run instruction read and parsed since `start_time` (perf counter), return next IP
+        '''
+        ip = instruction.ip
+        opcode = self._content[ip:ip + instruction.opcode_length]
+        next_ip = instruction.run()
+        inst_class = instruction.__class__
+        instruction_time = self._instruction_times.get(inst_class)
+        if instruction_time is None:
+            instruction_time = self._instruction_times[inst_class] = [0, 0.0]
+        instruction_time[0] += 1
+        instruction_time[1] += time.perf_counter() - start_time
+        self._profile(instruction, opcode, next_ip)
+        return next_ip
+
+    def run_superinstruction(self, ip):
+        '''
+        Run superinstruction at IP, return next IP, or None if there's none (or it's thrown away)
+        '''
+        superinstruction = self._superinstructions.get(ip)
+        if superinstruction is None:
+            return None
+        start_time = time.perf_counter()
+        content = self._content
+        second_ip = superinstruction.second_ip
+        if content[ip:second_ip] != superinstruction.first_opcode:
+            self._unfuse(ip)
+            return None
+        self._previous = None
+        cpu = self.cpu
+        cpu.last_ip = ip
+        first_instruction = superinstruction.first
+        if logger.isEnabledFor(logging.INFO):
+            _log_instruction(first_instruction)
+        next_ip = first_instruction.run()
+        if next_ip != second_ip:
+            return next_ip
+        cpu.ip = next_ip
+        if cpu._check_hardware_interrupts():  # pylint: disable=protected-access
+            return cpu.ip
+        if content[second_ip:superinstruction.end_ip] != superinstruction.second_opcode:
+            # written to by the first instruction, the second one runs unfused in the next step
+            self._unfuse(ip)
+            return next_ip
+        cpu.last_ip = next_ip
+        second_instruction = superinstruction.second
+        if logger.isEnabledFor(logging.INFO):
+            _log_instruction(second_instruction)
+        next_ip = second_instruction.run()
+        name = superinstruction.name
+        stats = self.stats[name]
+        self.stats[name] = stats._replace(
+            executions=stats.executions + 1,
+            run_time=stats.run_time + time.perf_counter() - start_time,
+        )
+        return next_ip
+
+    def get_report(self):
+        '''
+        Return list of lines: superinstructions with number of sites, executions and saved time
+        '''
+        lines = []
+        for name, stats in sorted(self.stats.items(), key=lambda item: -item[1].executions):
+            lines.append('{:<20} {:>4} sites {:>10} executions {:>10.1f} ms saved'.format(
+                name,
+                stats.sites,
+                stats.executions,
+                self.get_saved_time(name) * 1000,
+            ))
+        return lines
+
+    def get_saved_time(self, name):
+        '''
+        Return wall-clock time (sec) saved by superinstruction (negative if it was slower than unfused instructions)
+        '''
+        stats = self.stats[name]
+        unfused_time = stats.executions * sum(
+            duration / count
+            for count, duration in (self._instruction_times[inst_class] for inst_class in stats.pair)
+        )
+        return unfused_time - stats.run_time
+
+    def _profile(self, instruction, opcode, next_ip):
+        ip = instruction.ip
+        previous = self._previous
+        if previous is not None and previous[2] == ip:
+            pair = (previous[0].__class__, instruction.__class__)
+            key = (previous[0].ip, pair)
+            count = self._pair_counts.get(key, 0) + 1
+            self._pair_counts[key] = count
+            if count >= self.threshold:
+                self._fuse(previous[0], previous[1], instruction, opcode)
+        fall_through_ip = ip + instruction.opcode_length
+        if next_ip == fall_through_ip and instruction.__class__.__name__ in FUSABLE_INSTRUCTIONS:
+            self._previous = (instruction, opcode, fall_through_ip)
+        else:
+            self._previous = None
+
+    def _fuse(self, first_instruction, first_opcode, second_instruction, second_opcode):
+        ip = first_instruction.ip
+        end_ip = second_instruction.ip + second_instruction.opcode_length
+        if end_ip > self._ram_size:
+            return
+        if ip in self._superinstructions:
+            self._unfuse(ip)
+        pair = (first_instruction.__class__, second_instruction.__class__)
+        name = _get_name(pair)
+        self._superinstructions[ip] = Superinstruction(
+            name=name,
+            first=first_instruction,
+            second=second_instruction,
+            second_ip=second_instruction.ip,
+            end_ip=end_ip,
+            first_opcode=first_opcode,
+            second_opcode=second_opcode,
+        )
+        self._pair_counts.pop((ip, pair), None)
+        self._previous = None
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = SuperinstructionStats(pair, 0, 0, 0.0)
+        self.stats[name] = stats._replace(sites=stats.sites + 1)
+        logger.debug('Fused %s @ %s', name, utils.word_to_str(ip))
+
+    def _unfuse(self, ip):
+        name = self._superinstructions.pop(ip).name
+        stats = self.stats[name]
+        self.stats[name] = stats._replace(sites=stats.sites - 1)
+        logger.debug('Unfused %s @ %s', name, utils.word_to_str(ip))
+
+
+Superinstruction = namedtuple('Superinstruction', [
+    'name',  # string
+    'first',  # Instruction (decoded once, run again and again)
+    'second',  # Instruction
+    'second_ip',  # integer
+    'end_ip',  # integer (IP after the second instruction)
+    'first_opcode',  # list of bytes (the first instruction was decoded from, read before it ran)
+    'second_opcode',  # list of bytes
+])
+
+
+SuperinstructionStats = namedtuple('SuperinstructionStats', [
+    'pair',  # (instruction class, instruction class)
+    'sites',  # integer (number of fused IPs)
+    'executions',  # integer (every execution saves one clock cycle)
+    'run_time',  # float (sec, measured time of executions)
+])
+
+
+def _get_name(pair):
+    first_class, second_class = pair
+    return '{}+{}'.format(first_class.__name__, second_class.__name__)
+
+
+def _log_instruction(instruction):
+    logger.info('Instruction: %s %s', instruction.__class__.__name__, ' '.join([
+        operand_to_str(op)
+        for op in instruction.operands
+    ]))
@@ -1 +1,2 @@
 from .debugger import Debugger
+from .time_travel import TimeTravel
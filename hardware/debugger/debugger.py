@@ -2,18 +2,23 @@
 Debugger to show Aldebaran's internal state
 '''
 
+from collections import deque
+import hashlib
 import json
 import logging
+import socketserver
 import threading
+import time
 from http import HTTPStatus
 from urllib.parse import urlparse, parse_qs
 
+from assembler.assembler import get_labels_from_listing
 from instructions.operands import WORD_REGISTERS, operand_to_str
 from utils import config
 from utils import utils
 from utils.errors import ArchitectureError, AldebaranError
 from utils.utils import GenericRequestHandler, GenericServer
-from hardware.memory.memory import SegfaultError
+from hardware.memory.watchpoints import Watchpoints, WatchpointError
 
 
 logger = logging.getLogger(__name__)
@@ -24,28 +29,85 @@ class Debugger:
     Debugger
 
     API endpoints:
-        GET /cpu
-        GET /memory?offset=&length=
-        GET /stack
+        GET /api/internal
+        GET /api/state?since=&wait=
+        GET /api/memory?offset=&length=
+        GET /api/memory.bin (Range: bytes=first-last, If-None-Match: etag)
+        GET /api/devices
+        GET /api/breakpoints
+        GET /api/watchpoints
+        GET /api/time_travel
+        POST /api/cpu/step {"step_count": }
+        POST /api/cpu/run
+        POST /api/cpu/pause
+        POST /api/cpu/step_back {"step_count": }
+        POST /api/cpu/goto {"cycle": }
+        POST /api/breakpoints {"address": | "label": , "remove": }
+        POST /api/watchpoints {"first_address": , "last_address": , "mode": "r"|"w"|"rw", "remove": }
+
+    /api/state returns only what changed since sequence number `since` (0: everything), with the current
+    sequence number in `seq`. Changes are detected when the state is requested: registers, CPU state and
+    RAM pages are compared with their last known values, and the changed ones are stamped with a new sequence number.
+    With `wait` (sec) the request is long-polling: it returns when there's a change or `wait` is over.
+
+    /api/cpu/run runs the CPU at full speed until a breakpoint, a watchpoint, a pause request or shutdown.
+    Breakpoints are flags in a table with a byte for every address, checked by the clock after every instruction.
+    Labels of breakpoints are looked up in the listing file of the executable.
+    Watchpoints are checked by Memory (only if there are any) through their page table.
+
+    /api/memory.bin returns memory (the whole address space or the requested range) as application/octet-stream:
+    the content (X-Memory-Length bytes, unmapped bytes are 00) followed by its validity bitmap (a bit for every byte,
+    MSB first, 1: mapped). Its ETag is based on the generations of the RAM pages in the range (the seq when they last
+    changed) and the content of virtual RAM, so unchanged ranges are not sent again (304 Not Modified).
+
+    /api/cpu/step_back and /api/cpu/goto work in record mode (with time travel), limited to the recorded cycles.
     '''
 
-    def __init__(self, host, port):
-        self._server = GenericServer((host, port), GenericRequestHandler, self._handle_get, self._handle_post)
+    def __init__(self, host, port, listing_filename=None):
+        self._server = DebuggerServer(
+            (host, port), DebuggerRequestHandler,
+            self._handle_get, self._handle_post, self._handle_get_binary,
+        )
         self._input_thread = threading.Thread(target=self._server.serve_forever)
-        self._user_log = []
+        self._state_changed = threading.Condition()
+        self._seq = 0
+        self._user_log = deque(maxlen=config.debugger_user_log_size)  # (seq, message)
+        self._user_log_dropped_seq = 0  # seq of the last message dropped from the full user log
+        self._known_registers = {}
+        self._register_seqs = {}
+        self._known_cpu_state = None
+        self._cpu_state_seq = 0
+        self._known_pages = []
+        self._page_seqs = []
+        self._etag_salt = str(time.time())  # ETags of different runs differ
+        self._labels = {}
+        if listing_filename is not None:
+            with open(listing_filename, 'rt') as listing_file:
+                self._labels = get_labels_from_listing(listing_file.read().split('\n'))
+        self._breakpoint_labels = {}  # address -> label name | None
+        self._break_count = 0
+        self.breakpoints = bytearray(config.memory_size)
+        self.watchpoints = Watchpoints(config.memory_size, config.debugger_page_size)
+        self.pause_requested = threading.Event()
+        self.running = False
+        self.break_reason = None
 
         self.cpu = None
         self.clock = None
         self.memory = None
+        self.device_controller = None
+        self.time_travel = None
         self.architecture_registered = False
 
-    def register_architecture(self, cpu, clock, memory):
+    def register_architecture(self, cpu, clock, memory, device_controller, time_travel=None):
         '''
         Register other internal devices
         '''
         self.cpu = cpu
         self.clock = clock
         self.memory = memory
+        self.device_controller = device_controller
+        self.time_travel = time_travel
         self.architecture_registered = True
 
     def start(self):
@@ -72,7 +134,41 @@ class Debugger:
         '''
         Append message to user log
         '''
-        self._user_log.append(message)
+        with self._state_changed:
+            self._seq += 1
+            if len(self._user_log) == self._user_log.maxlen:
+                self._user_log_dropped_seq = self._user_log[0][0]
+            self._user_log.append((self._seq, message))
+            self._state_changed.notify_all()
+
+    def notify(self):
+        '''
+        Wake up long-polling requests (called after the CPU has run)
+        '''
+        with self._state_changed:
+            self._state_changed.notify_all()
+
+    def run_started(self):
+        '''
+        Called by the clock when it starts running until a break
+        '''
+        with self._state_changed:
+            self.running = True
+            self.break_reason = None
+            self.pause_requested.clear()
+            self.watchpoints.clear_hit()
+            self._state_changed.notify_all()
+
+    def run_stopped(self, break_reason):
+        '''
+        Called by the clock when it stopped running because of `break_reason`
+        '''
+        with self._state_changed:
+            self.running = False
+            self.break_reason = break_reason
+            self._break_count += 1
+            self._state_changed.notify_all()
+        logger.info('Break: %s', break_reason)
 
     def _handle_get(self, path):
         '''
@@ -83,6 +179,16 @@ class Debugger:
         query = parse_qs(parse_result.query)
         if path == '/api/internal':
             return self._get_internal_state()
+        if path == '/api/state':
+            try:
+                since = int(query.get('since')[0])
+            except Exception:
+                since = 0
+            try:
+                wait = min(float(query.get('wait')[0]), config.debugger_max_wait)
+            except Exception:
+                wait = 0
+            return self._get_state_changes(since, wait)
         if path == '/api/memory':
             try:
                 offset = int(query.get('offset')[0], 16)
@@ -93,6 +199,29 @@ class Debugger:
             except Exception:
                 length = 256
             return self._get_memory(offset, length)
+        if path == '/api/devices':
+            return self._get_devices()
+        if path == '/api/breakpoints':
+            return self._get_breakpoints()
+        if path == '/api/watchpoints':
+            return (
+                HTTPStatus.OK,
+                {
+                    'watchpoints': self.watchpoints.get_watchpoints(),
+                }
+            )
+        if path == '/api/time_travel':
+            if self.time_travel is None:
+                return (
+                    HTTPStatus.OK,
+                    {
+                        'recording': False,
+                    }
+                )
+            return (
+                HTTPStatus.OK,
+                dict(self.time_travel.get_state(), recording=True),
+            )
 
         return (
             HTTPStatus.BAD_REQUEST,
@@ -101,6 +230,64 @@ class Debugger:
             }
         )
 
+    def _handle_get_binary(self, path, headers):
+        '''
+        Handle incoming GET request with binary response, called by DebuggerRequestHandler
+
+        Return (status, headers, body) or None if the response of path is JSON.
+        '''
+        if urlparse(path).path != '/api/memory.bin':
+            return None
+        memory_size = config.memory_size
+        range_header = headers.get('Range')
+        if range_header is None:
+            first_address, last_address = 0, memory_size - 1
+        else:
+            try:
+                first_address, last_address = _parse_range(range_header, memory_size)
+            except DebuggerError:
+                return (
+                    HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE,
+                    {
+                        'Content-Range': 'bytes */{}'.format(memory_size),
+                        'Content-Length': '0',
+                    },
+                    b'',
+                )
+        page_size = config.debugger_page_size
+        with self._state_changed:
+            self._update_state()
+            # generations are read before the content, so a change after this gets a new ETag next time
+            generations = self._page_seqs[first_address // page_size:last_address // page_size + 1]
+        length = last_address - first_address + 1
+        content, validity = self.memory.read_block(first_address, length)
+        virtual_content = content[max(self.memory.ram_size - first_address, 0):]
+        etag = '"{}"'.format(hashlib.sha1(repr((
+            self._etag_salt, first_address, last_address, generations, virtual_content,
+        )).encode('utf-8')).hexdigest()[:20])
+        if_none_match = headers.get('If-None-Match')
+        if if_none_match is not None and {etag, '*'} & {tag.strip() for tag in if_none_match.split(',')}:
+            return (
+                HTTPStatus.NOT_MODIFIED,
+                {
+                    'ETag': etag,
+                },
+                b'',
+            )
+        response_headers = {
+            'Content-Type': 'application/octet-stream',
+            'Content-Length': str(len(content) + len(validity)),
+            'Accept-Ranges': 'bytes',
+            'ETag': etag,
+            'X-Memory-Length': str(length),
+        }
+        if range_header is None:
+            status = HTTPStatus.OK
+        else:
+            status = HTTPStatus.PARTIAL_CONTENT
+            response_headers['Content-Range'] = 'bytes {}-{}/{}'.format(first_address, last_address, memory_size)
+        return (status, response_headers, content + validity)
+
     def _get_internal_state(self):
         registers = {
             name: utils.word_to_str(self.cpu.registers.get_register(name, silent=True))
@@ -109,6 +296,97 @@ class Debugger:
         registers['IP'] = utils.word_to_str(self.cpu.ip)
         registers['entry_point'] = utils.word_to_str(self.cpu.system_addresses['entry_point'])
 
+        cpu_state, clock_state = self._get_cpu_state()
+        with self._state_changed:
+            user_log = [message for seq, message in self._user_log]
+        return (
+            HTTPStatus.OK,
+            {
+                'registers': registers,
+                'stack': self._get_stack(),
+                'cpu': cpu_state,
+                'clock': clock_state,
+                'user_log': user_log,
+            }
+        )
+
+    def _get_state_changes(self, since, wait):
+        deadline = time.time() + wait
+        with self._state_changed:
+            while True:
+                self._update_state()
+                remaining = deadline - time.time()
+                if self._seq > since or remaining <= 0:
+                    break
+                self._state_changed.wait(min(remaining, config.debugger_wait_period))
+            page_size = config.debugger_page_size
+            pages = {
+                utils.word_to_str(idx * page_size): self._known_pages[idx].hex().upper()
+                for idx, page_seq in enumerate(self._page_seqs)
+                if page_seq > since
+            }
+            changes = {
+                'seq': self._seq,
+                'registers': {
+                    name: utils.word_to_str(value)
+                    for name, value in self._known_registers.items()
+                    if self._register_seqs[name] > since
+                },
+                'user_log': [message for seq, message in self._user_log if seq > since],
+                'user_log_truncated': self._user_log_dropped_seq > since,
+                'pages': pages,
+            }
+            if self._cpu_state_seq > since:
+                changes['cpu'], changes['clock'] = self._get_cpu_state()
+            stack_first_page = max(self._known_registers['SP'] - 7, 0) // page_size
+            stack_last_page = self.cpu.system_addresses['bottom_of_stack'] // page_size
+            if self._register_seqs['SP'] > since or any(
+                    self._page_seqs[idx] > since
+                    for idx in range(stack_first_page, min(stack_last_page + 1, len(self._page_seqs)))
+            ):
+                changes['stack'] = self._get_stack()
+        return (
+            HTTPStatus.OK,
+            changes,
+        )
+
+    def _update_state(self):
+        '''
+        Compare registers, CPU state and RAM pages with their last known values, stamp changes with a new seq
+        '''
+        new_seq = self._seq + 1
+        changed = False
+        registers = self.cpu.registers.get_word_registers()
+        registers['IP'] = self.cpu.ip
+        for name, value in registers.items():
+            if self._known_registers.get(name) != value:
+                self._known_registers[name] = value
+                self._register_seqs[name] = new_seq
+                changed = True
+        cpu_state = (
+            self.cpu.ip, self.cpu.last_ip, self.cpu.halt, self.cpu.shutdown, self.clock.cycle_count,
+            self.running, self._break_count, self.time_travel is not None and self.time_travel.is_in_past(),
+        )
+        if cpu_state != self._known_cpu_state:
+            self._known_cpu_state = cpu_state
+            self._cpu_state_seq = new_seq
+            changed = True
+        page_size = config.debugger_page_size
+        ram = self.memory.ram
+        for idx in range(ram.size // page_size):
+            page = ram.read_block(idx * page_size, page_size, silent=True)
+            if idx == len(self._known_pages):
+                self._known_pages.append(page)
+                self._page_seqs.append(new_seq)
+                changed = True
+            elif self._known_pages[idx] != page:
+                self._known_pages[idx] = page
+                self._page_seqs[idx] = new_seq
+                changed = True
+        if changed:
+            self._seq = new_seq
+
+    def _get_cpu_state(self):
         if self.cpu.last_ip is not None:
             last_instruction = self._get_instruction(self.cpu.last_ip)
             last_ip = utils.word_to_str(self.cpu.last_ip)
@@ -122,25 +400,21 @@ class Debugger:
         else:
             next_instruction = self._get_instruction(self.cpu.ip)
             next_ip = utils.word_to_str(self.cpu.ip)
-
         return (
-            HTTPStatus.OK,
             {
-                'registers': registers,
-                'stack': self._get_stack(),
-                'cpu': {
-                    'halt': self.cpu.halt,
-                    'shutdown': self.cpu.shutdown,
-                    'last_instruction': last_instruction,
-                    'last_ip': last_ip,
-                    'next_instruction': next_instruction,
-                    'next_ip': next_ip,
-                },
-                'clock': {
-                    'cycle_count': self.clock.cycle_count,
-                },
-                'user_log': self._user_log,
-            }
+                'halt': self.cpu.halt,
+                'shutdown': self.cpu.shutdown,
+                'last_instruction': last_instruction,
+                'last_ip': last_ip,
+                'next_instruction': next_instruction,
+                'next_ip': next_ip,
+                'running': self.running,
+                'break': self.break_reason,
+                'replaying': self.time_travel is not None and self.time_travel.is_in_past(),
+            },
+            {
+                'cycle_count': self.clock.cycle_count,
+            },
         )
 
     def _get_memory(self, offset, length):
@@ -155,12 +429,11 @@ class Debugger:
             length = config.memory_size - offset
 
         first_address = offset
-        content = []
-        for idx in range(length):
-            try:
-                content.append(utils.byte_to_str(self.memory.read_byte(first_address + idx)))
-            except SegfaultError:
-                content.append(None)
+        content, validity = self.memory.read_block(first_address, length)
+        content = [
+            utils.byte_to_str(value) if validity[idx // 8] & (0x80 >> (idx % 8)) else None
+            for idx, value in enumerate(content)
+        ]
         return (
             HTTPStatus.OK,
             {
@@ -170,17 +443,26 @@ class Debugger:
             }
         )
 
+    def _get_devices(self):
+        return (
+            HTTPStatus.OK,
+            {
+                'devices': {
+                    str(ioport_number): health
+                    for ioport_number, health in self.device_controller.get_device_health().items()
+                },
+            }
+        )
+
     def _get_stack(self):
         bottom_of_stack = self.cpu.system_addresses['bottom_of_stack']
         first_address = max(self.cpu.registers.get_register('SP', silent=True) - 7, 0)
         length = bottom_of_stack - first_address + 1
+        content, _ = self.memory.read_block(first_address, length)
         return {
             'first_address': utils.word_to_str(first_address),
             'last_address': utils.word_to_str(bottom_of_stack),
-            'content': [
-                utils.byte_to_str(self.memory.read_byte(first_address + idx))
-                for idx in range(length)
-            ],
+            'content': [utils.byte_to_str(value) for value in content],
         }
 
     def _get_instruction(self, ip):
@@ -232,3 +514,175 @@ class Debugger:
                 HTTPStatus.OK,
                 {}
             )
+        if path == '/api/cpu/run':
+            self.clock.debugger_queue.put({
+                'action': 'run',
+                'data': data,
+            })
+            return (
+                HTTPStatus.OK,
+                {}
+            )
+        if path in {'/api/cpu/step_back', '/api/cpu/goto'}:
+            if self.time_travel is None:
+                return (
+                    HTTPStatus.BAD_REQUEST,
+                    {
+                        'error': 'Not in record mode.',
+                    }
+                )
+            self.clock.debugger_queue.put({
+                'action': path.split('/')[-1],
+                'data': data,
+            })
+            return (
+                HTTPStatus.OK,
+                {}
+            )
+        if path == '/api/cpu/pause':
+            self.pause_requested.set()
+            return (
+                HTTPStatus.OK,
+                {}
+            )
+        try:
+            if path == '/api/breakpoints':
+                self._set_breakpoint(data)
+                return self._get_breakpoints()
+            if path == '/api/watchpoints':
+                self._set_watchpoint(data)
+                return (
+                    HTTPStatus.OK,
+                    {
+                        'watchpoints': self.watchpoints.get_watchpoints(),
+                    }
+                )
+        except (DebuggerError, WatchpointError) as ex:
+            return (
+                HTTPStatus.BAD_REQUEST,
+                {
+                    'error': str(ex),
+                }
+            )
+        return (
+            HTTPStatus.BAD_REQUEST,
+            {
+                'error': 'Unknown path',
+            }
+        )
+
+    def _get_breakpoints(self):
+        return (
+            HTTPStatus.OK,
+            {
+                'breakpoints': [
+                    {
+                        'address': utils.word_to_str(address),
+                        'label': label_name,
+                    }
+                    for address, label_name in sorted(self._breakpoint_labels.items())
+                ],
+            }
+        )
+
+    def _set_breakpoint(self, data):
+        label_name = data.get('label')
+        if label_name is not None:
+            try:
+                address = self.cpu.system_addresses['entry_point'] + self._labels[label_name]
+            except KeyError:
+                raise DebuggerError('Unknown label: {}'.format(label_name))
+        else:
+            address = _parse_address(data.get('address'))
+        if data.get('remove'):
+            self.breakpoints[address] = 0
+            self._breakpoint_labels.pop(address, None)
+        else:
+            self.breakpoints[address] = 1
+            self._breakpoint_labels[address] = label_name
+
+    def _set_watchpoint(self, data):
+        first_address = _parse_address(data.get('first_address'))
+        if data.get('last_address') is None:
+            last_address = first_address
+        else:
+            last_address = _parse_address(data.get('last_address'))
+        mode = data.get('mode', 'w')
+        if data.get('remove'):
+            self.watchpoints.remove(first_address, last_address, mode)
+        else:
+            self.watchpoints.add(first_address, last_address, mode)
+        # Memory checks watchpoints only if there are any
+        self.memory.watchpoints = self.watchpoints if len(self.watchpoints) else None
+
+
+def _parse_address(address_str):
+    try:
+        address = int(address_str, 16)
+    except (TypeError, ValueError):
+        raise DebuggerError('Invalid address: {}'.format(address_str))
+    if address < 0 or address >= config.memory_size:
+        raise DebuggerError('Invalid address: {}'.format(address_str))
+    return address
+
+
+def _parse_range(range_header, size):
+    '''
+    Parse single byte range of Range header (`bytes=first-last`, `bytes=first-` or `bytes=-suffix_length`)
+    '''
+    unit, _, byte_range = range_header.partition('=')
+    first_str, _, last_str = byte_range.partition('-')
+    try:
+        if unit.strip() != 'bytes' or ',' in byte_range:
+            raise ValueError()
+        if first_str.strip():
+            first = int(first_str)
+            last = int(last_str) if last_str.strip() else size - 1
+        else:
+            first = max(size - int(last_str), 0)
+            last = size - 1
+    except ValueError:
+        raise DebuggerError('Invalid range: {}'.format(range_header))
+    last = min(last, size - 1)
+    if first < 0 or first > last:
+        raise DebuggerError('Unsatisfiable range: {}'.format(range_header))
+    return first, last
+
+
+class DebuggerRequestHandler(GenericRequestHandler):
+    '''
+    Request handler for Debugger with binary responses for some GET requests
+    '''
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        '''
+        Get binary response from binary_get_handler_function or JSON response from get_handler_function
+        '''
+        response = self.server.binary_get_handler_function(self.path, self.headers)
+        if response is None:
+            super().do_GET()
+            return
+        status, headers, body = response
+        self.send_response(status.value)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class DebuggerServer(socketserver.ThreadingMixIn, GenericServer):
+    '''
+    Server for Debugger, a thread per request so long-polling requests don't block the others
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, server_address, request_handler, get_handler_function, post_handler_function, binary_get_handler_function):
+        GenericServer.__init__(self, server_address, request_handler, get_handler_function, post_handler_function)
+        self.binary_get_handler_function = binary_get_handler_function
+
+
+# pylint: disable=missing-docstring
+
+class DebuggerError(AldebaranError):
+    pass
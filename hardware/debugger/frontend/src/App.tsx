@@ -3,7 +3,7 @@ import { Stack, StackType } from './Stack';
 import { Memory, MemoryType } from './Memory';
 import { Token } from './Token';
 import { Userlog } from './Userlog';
-import { decToHex } from './utils';
+import { decToHex, hexToDec } from './utils';
 import './App.css';
 
 
@@ -15,28 +15,50 @@ type InternalType = {
   user_log: string[];
 };
 
+type StateChangesType = {
+  seq: number;
+  registers: any;
+  stack?: StackType;
+  cpu?: any;
+  clock?: any;
+  user_log: string[];
+  user_log_truncated: boolean;
+  pages: {[address: string]: string};
+};
+
+const LONG_POLL_WAIT = 25;  // sec
+const RETRY_PERIOD = 3000;  // ms
+const MEMORY_LENGTH = 256;
+const USER_LOG_SIZE = 10000;  // lines
+
 interface Props {};
 
 interface State {
   online: boolean;
+  seq: number;
   internal?: InternalType;
   memoryOffset: number;
   memory?: MemoryType;
 };
 
 export class App extends React.Component<Props, State> {
-  interval?: NodeJS.Timeout;
+  timeout?: NodeJS.Timeout;
+  unmounted: boolean = false;
 
   constructor(props: Props) {
     super(props);
     this.state = {
       online: false,
+      seq: 0,
       memoryOffset: 0,
     };
     this.cpuStep = this.cpuStep.bind(this);
+    this.cpuRun = this.cpuRun.bind(this);
+    this.cpuPause = this.cpuPause.bind(this);
+    this.cpuStepBack = this.cpuStepBack.bind(this);
   }
 
-  sendRequest(url: string, payload: object | null, cb: any) {
+  sendRequest(url: string, payload: object | null, cb: any, errorCb?: any) {
     const init = (payload === null) ? undefined : {
       method: 'POST',
       body: JSON.stringify(payload),
@@ -54,33 +76,73 @@ export class App extends React.Component<Props, State> {
       })
       .catch(error => {
         this.setState({ online: false });
+        if (errorCb) {
+          errorCb();
+        }
       });
   }
 
   cpuStep(stepCount: number) {
-    this.sendRequest('/api/cpu/step', {step_count: stepCount}, (data: any) => {
-      this.tick();
-    });
+    // changes are returned by the pending long-polling request
+    this.sendRequest('/api/cpu/step', {step_count: stepCount}, (data: any) => {});
   }
 
-  tick() {
-    this.sendRequest('/api/internal', null, (data: InternalType) => {
-      this.setState({ internal: data });
+  cpuRun() {
+    this.sendRequest('/api/cpu/run', {}, (data: any) => {});
+  }
+
+  cpuPause() {
+    this.sendRequest('/api/cpu/pause', {}, (data: any) => {});
+  }
+
+  cpuStepBack(stepCount: number) {
+    // only in record mode (-r)
+    this.sendRequest('/api/cpu/step_back', {step_count: stepCount}, (data: any) => {});
+  }
+
+  poll() {
+    if (this.unmounted) {
+      return;
+    }
+    const wait = this.state.internal ? LONG_POLL_WAIT : 0;
+    this.sendRequest(`/api/state?since=${this.state.seq}&wait=${wait}`, null, (data: StateChangesType) => {
+      this.applyChanges(data);
+      this.poll();
+    }, () => {
+      this.timeout = setTimeout(() => this.poll(), RETRY_PERIOD);
     });
-    const offsetHex = decToHex(this.state.memoryOffset);
-    this.sendRequest(`/api/memory?offset=${offsetHex}`, null, (data: MemoryType) => {
-      this.setState({ memory: data });
+  }
+
+  applyChanges(data: StateChangesType) {
+    const prev = this.state.internal;
+    const internal: InternalType = {
+      registers: {...(prev ? prev.registers : {}), ...data.registers},
+      stack: data.stack || (prev as InternalType).stack,
+      cpu: data.cpu || (prev as InternalType).cpu,
+      clock: data.clock || (prev as InternalType).clock,
+      user_log: (prev ? prev.user_log : []).concat(data.user_log).slice(-USER_LOG_SIZE),
+    };
+    this.setState({ seq: data.seq, internal: internal });
+    const memoryOffset = this.state.memoryOffset;
+    const memoryChanged = ! this.state.memory || Object.keys(data.pages).some(address => {
+      const pageAddress = hexToDec(address);
+      return pageAddress < memoryOffset + MEMORY_LENGTH && memoryOffset < pageAddress + data.pages[address].length / 2;
     });
+    if (memoryChanged) {
+      this.sendRequest(`/api/memory?offset=${decToHex(memoryOffset)}`, null, (data: MemoryType) => {
+        this.setState({ memory: data });
+      });
+    }
   }
 
   componentDidMount() {
-    this.tick();
-    this.interval = setInterval(() => this.tick(), 3000);
+    this.poll();
   }
 
   componentWillUnmount() {
-    if (this.interval) {
-      clearInterval(this.interval);
+    this.unmounted = true;
+    if (this.timeout) {
+      clearTimeout(this.timeout);
     }
   }
 
@@ -100,10 +162,17 @@ export class App extends React.Component<Props, State> {
         <div className="app-cpu">
           <button onClick={() => this.cpuStep(1)}>STEP 1</button>
           <button onClick={() => this.cpuStep(10)}>STEP 10</button>
+          <button onClick={this.cpuRun} disabled={internal.cpu.running}>RUN</button>
+          <button onClick={this.cpuPause} disabled={! internal.cpu.running}>PAUSE</button>
+          <button onClick={() => this.cpuStepBack(1)}>BACK 1</button>
+          <button onClick={() => this.cpuStepBack(10)}>BACK 10</button>
           <h2>CPU</h2>
           <div>cycle_count = {internal.clock.cycle_count}</div>
           <div>halt = {internal.cpu.halt ? 'HALT' : '-'}</div>
           <div>shutdown = {internal.cpu.shutdown ? 'SHUTDOWN' : '-'}</div>
+          <div>running = {internal.cpu.running ? 'RUNNING' : '-'}</div>
+          <div>replaying = {internal.cpu.replaying ? 'REPLAYING' : '-'}</div>
+          { internal.cpu.break ? <div>break = {internal.cpu.break.reason} {internal.cpu.break.address}</div> : null }
           <div>IP = {internal.registers.IP}</div>
           { internal.cpu.next_instruction ? <div>
             <h2>Next instruction @ {internal.cpu.next_ip}</h2>
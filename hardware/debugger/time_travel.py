@@ -0,0 +1,273 @@
+'''
+Time travel: reverse execution in the debugger by periodic checkpoints and replay
+'''
+
+from collections import deque, namedtuple
+import bisect
+import logging
+
+from utils.errors import AldebaranError, ArchitectureError
+
+
+logger = logging.getLogger(__name__)
+
+
+INPUT_INTERRUPT = 1
+INPUT_IOPORT = 2
+INPUT_VIRTUAL_RAM = 3
+INPUT_DMA = 4
+
+
+class TimeTravel:
+    '''
+    Time travel
+
+    Every `interval` cycles a checkpoint saves the CPU state, the registers and the RAM pages changed since
+    the previous checkpoint (the oldest checkpoint has every page). Nondeterministic inputs of the CPU
+    (hardware interrupts, IOPort input, virtual RAM reads, DMA input written to RAM) are logged with their cycle.
+
+    Going back to an earlier cycle restores the last checkpoint before it and replays the instructions from there.
+    Until the CPU gets back to the last recorded cycle it's replaying: inputs come from the log, and output
+    (IOPort data, DMA transfers, timer settings, user log) is not repeated. Interrupts pending at a checkpoint
+    are not saved, they are in the log when the CPU takes them.
+
+    Checkpoints are kept in a ring buffer: the oldest ones (and their inputs) are evicted
+    when the RAM pages of the checkpoints take more than `max_size` bytes.
+    '''
+
+    def __init__(self, interval, max_size, page_size):
+        self.interval = interval
+        self.max_size = max_size
+        self.page_size = page_size
+        self.replaying = False
+        self.last_cycle = 0  # last recorded cycle
+        self.size = 0  # bytes of RAM pages in checkpoints
+        self._checkpoints = deque()
+        self._checkpoint_cycles = deque()
+        self._last_pages = []  # RAM pages at the last checkpoint
+        self._inputs = {}  # cycle -> [(input type, value, ...)]
+        self._replay_inputs = deque()  # inputs of the replayed cycle
+        self.cpu = None
+        self.clock = None
+        self.ram = None
+        self.architecture_registered = False
+
+    def register_architecture(self, cpu, clock, ram, interrupt_controller, device_controller, dma_controller):
+        '''
+        Register other internal devices and make the ones with nondeterministic input or any output report to time travel
+        '''
+        self.cpu = cpu
+        self.clock = clock
+        self.ram = ram
+        self._last_pages = [None] * len(range(0, ram.size, self.page_size))
+        for device in [cpu, interrupt_controller, cpu.timer, dma_controller, cpu.memory.virtual_ram] + device_controller.ioports:
+            if device is not None:
+                device.time_travel = self
+        self.architecture_registered = True
+
+    def is_in_past(self):
+        '''
+        Return whether the CPU is before the last recorded cycle
+        (`replaying` is cleared only before the next cycle)
+        '''
+        return self.replaying and self.clock.cycle_count < self.last_cycle
+
+    def get_state(self):
+        '''
+        Return recorded cycles and checkpoints as a dict
+        '''
+        return {
+            'replaying': self.is_in_past(),
+            'first_cycle': self._checkpoint_cycles[0] if self._checkpoints else None,
+            'last_cycle': self.last_cycle if self.replaying else self.clock.cycle_count,
+            'checkpoints': len(self._checkpoints),
+            'interval': self.interval,
+            'size': self.size,
+            'max_size': self.max_size,
+        }
+
+    def before_cycle(self):
+        '''
+        Called by the clock before every cycle: take checkpoint or load replayed inputs
+        '''
+        cycle = self.clock.cycle_count
+        if self.replaying:
+            if cycle < self.last_cycle:
+                self._load_inputs(cycle + 1)
+                return
+            self.replaying = False
+            logger.info('Replay finished at cycle %d.', cycle)
+        if not self._checkpoints or cycle >= self._checkpoint_cycles[-1] + self.interval:
+            self._take_checkpoint()
+
+    def goto(self, cycle):
+        '''
+        Restore the last checkpoint before `cycle` and replay until `cycle`
+
+        `cycle` is limited to the recorded cycles.
+        '''
+        if not self.architecture_registered:
+            raise ArchitectureError('Time travel cannot run without registering architecture')
+        if not self._checkpoints:
+            return
+        if not self.replaying:
+            self.last_cycle = self.clock.cycle_count
+        cycle = min(max(cycle, self._checkpoint_cycles[0]), self.last_cycle)
+        if cycle < self.clock.cycle_count or self.cpu.shutdown:
+            self._restore_checkpoint(bisect.bisect_right(self._checkpoint_cycles, cycle) - 1)
+        self.replaying = self.clock.cycle_count < self.last_cycle
+        while self.clock.cycle_count < cycle:
+            self.before_cycle()
+            self.clock.cycle_count += 1
+            self.cpu.step()
+        self.replaying = self.clock.cycle_count < self.last_cycle
+        logger.info('Went to cycle %d.', self.clock.cycle_count)
+
+    def record_interrupt(self, interrupt_number):
+        '''
+        Log hardware interrupt taken by the CPU
+        '''
+        self._record_input(self.clock.cycle_count, (INPUT_INTERRUPT, interrupt_number))
+
+    def replay_interrupt(self):
+        '''
+        Return logged hardware interrupt if the CPU took one at this point, None otherwise
+        '''
+        if self._replay_inputs and self._replay_inputs[0][0] == INPUT_INTERRUPT:
+            return self._replay_inputs.popleft()[1]
+        return None
+
+    def record_ioport_input(self, ioport_number, data):
+        '''
+        Log input data read from IOPort
+        '''
+        self._record_input(self.clock.cycle_count, (INPUT_IOPORT, ioport_number, data))
+
+    def replay_ioport_input(self, ioport_number):
+        '''
+        Return logged input data of IOPort
+        '''
+        return self._replay_input(INPUT_IOPORT, ioport_number)
+
+    def record_virtual_ram_read(self, pos, value):
+        '''
+        Log value read from virtual RAM
+        '''
+        self._record_input(self.clock.cycle_count, (INPUT_VIRTUAL_RAM, pos, value))
+
+    def replay_virtual_ram_read(self, pos):
+        '''
+        Return logged value read from virtual RAM
+        '''
+        return self._replay_input(INPUT_VIRTUAL_RAM, pos)
+
+    def record_dma_input(self, pos, data):
+        '''
+        Log data written to RAM by a DMA transfer (called by the DMA thread, it's replayed before the next cycle)
+        '''
+        self._record_input(self.clock.cycle_count + 1, (INPUT_DMA, pos, data))
+
+    def _record_input(self, cycle, recorded_input):
+        self._inputs.setdefault(cycle, []).append(recorded_input)
+
+    def _replay_input(self, input_type, key):
+        try:
+            recorded_input = self._replay_inputs.popleft()
+        except IndexError:
+            recorded_input = None
+        if recorded_input is None or recorded_input[0] != input_type or recorded_input[1] != key:
+            raise ReplayDivergedError('Replay diverged from recording at cycle {}'.format(self.clock.cycle_count))
+        return recorded_input[2]
+
+    def _load_inputs(self, cycle):
+        self._replay_inputs = deque()
+        for recorded_input in self._inputs.get(cycle, []):
+            if recorded_input[0] == INPUT_DMA:
+                _, pos, data = recorded_input
+                self.ram.write_block(pos, data, silent=True)
+            else:
+                self._replay_inputs.append(recorded_input)
+
+    def _take_checkpoint(self):
+        pages = {}
+        last_pages = self._last_pages
+        for page_number, page_address in enumerate(range(0, self.ram.size, self.page_size)):
+            page = self.ram.read_block(page_address, min(self.page_size, self.ram.size - page_address), silent=True)
+            if page == last_pages[page_number]:
+                continue
+            last_pages[page_number] = page
+            pages[page_address] = page
+        registers = self.cpu.registers
+        checkpoint = Checkpoint(
+            cycle=self.clock.cycle_count,
+            ip=self.cpu.ip,
+            last_ip=self.cpu.last_ip,
+            halt=self.cpu.halt,
+            shutdown=self.cpu.shutdown,
+            registers=registers.get_word_registers(),
+            flag_word=registers.get_flag_word(),
+            pages=pages,
+        )
+        self._checkpoints.append(checkpoint)
+        self._checkpoint_cycles.append(checkpoint.cycle)
+        self.size += _get_size(pages)
+        logger.debug('Checkpoint at cycle %d (%d pages changed).', checkpoint.cycle, len(pages))
+        while self.size > self.max_size and len(self._checkpoints) > 1:
+            self._evict_checkpoint()
+
+    def _evict_checkpoint(self):
+        oldest_checkpoint = self._checkpoints.popleft()
+        self._checkpoint_cycles.popleft()
+        # the next checkpoint becomes the oldest one, so it gets every page
+        pages = dict(oldest_checkpoint.pages)
+        pages.update(self._checkpoints[0].pages)
+        self.size += _get_size(pages) - _get_size(oldest_checkpoint.pages) - _get_size(self._checkpoints[0].pages)
+        self._checkpoints[0] = self._checkpoints[0]._replace(pages=pages)
+        first_cycle = self._checkpoint_cycles[0]
+        for cycle in list(self._inputs):
+            if cycle > first_cycle:
+                break
+            del self._inputs[cycle]
+        logger.debug('Checkpoint at cycle %d evicted.', oldest_checkpoint.cycle)
+
+    def _restore_checkpoint(self, checkpoint_index):
+        for idx in range(checkpoint_index + 1):
+            for page_address, page in self._checkpoints[idx].pages.items():
+                self.ram.write_block(page_address, page, silent=True)
+        checkpoint = self._checkpoints[checkpoint_index]
+        self.cpu.ip = checkpoint.ip
+        self.cpu.last_ip = checkpoint.last_ip
+        self.cpu.halt = checkpoint.halt
+        self.cpu.shutdown = checkpoint.shutdown
+        # updated in place, as the stack may hold the register storage
+        self.cpu.registers.get_word_register_storage().update(checkpoint.registers)
+        self.cpu.registers.set_flag_word(checkpoint.flag_word)
+        self.clock.cycle_count = checkpoint.cycle
+        self._replay_inputs = deque()
+        logger.debug('Checkpoint at cycle %d restored.', checkpoint.cycle)
+
+
+Checkpoint = namedtuple('Checkpoint', [
+    'cycle',  # integer (number of cycles run before the checkpoint)
+    'ip',  # word
+    'last_ip',  # word | None
+    'halt',  # bool
+    'shutdown',  # bool
+    'registers',  # dict (word registers)
+    'flag_word',  # word
+    'pages',  # dict (page address -> bytes of RAM page changed since the previous checkpoint)
+])
+
+
+def _get_size(pages):
+    return sum(len(page) for page in pages.values())
+
+
+# pylint: disable=missing-docstring
+
+class TimeTravelError(AldebaranError):
+    pass
+
+
+class ReplayDivergedError(TimeTravelError):
+    pass
@@ -6,14 +6,16 @@ import json
 import logging
 import queue
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
 
-import requests
-
+from utils import config
 from utils import utils
 from utils.errors import AldebaranError, ArchitectureError
 from utils.utils import GenericRequestHandler, GenericServer
 from hardware.memory.memory import SegfaultError
+from .device_health import DeviceHealth
 
 
 logger = logging.getLogger('hardware.device_controller')
@@ -22,6 +24,9 @@ logger = logging.getLogger('hardware.device_controller')
 class DeviceController:
     '''
     Device Controller
+
+    Without `host` it has no server of its own: requests from devices are passed to `handle_request`
+    and output and pings are run by `flush_output` and `schedule_pings` (e.g. by the shared networking loop of a multi-VM host).
     '''
 
     def __init__(self, host, port, system_addresses, system_interrupts, ioports):
@@ -31,10 +36,18 @@ class DeviceController:
         self._device_status_table = [0] * system_addresses['device_status_table_size']
         self.output_queue = queue.Queue()
         self._stop_event = threading.Event()
-        self._server = GenericServer((host, port), GenericRequestHandler, None, self._handle_incoming_request)
-        self._input_thread = threading.Thread(target=self._server.serve_forever)
+        if host is None:
+            self._server = None
+            self._input_thread = None
+        else:
+            self._server = GenericServer((host, port), GenericRequestHandler, None, self._handle_incoming_request)
+            self._input_thread = threading.Thread(target=self._server.serve_forever)
         self._output_thread = threading.Thread(target=self._output_thread_run)
         self._ping_thread = threading.Thread(target=self._ping_thread_run)
+        self._device_health = [
+            DeviceHealth(config.device_ping_min_period, config.device_ping_max_period)
+            for _ in ioports
+        ]
 
         self.ioports = ioports
         self.interrupt_controller = None
@@ -56,7 +69,8 @@ class DeviceController:
         if not self.architecture_registered:
             raise ArchitectureError('Device Controller cannot run without registering architecture')
         logger.info('Starting...')
-        self._input_thread.start()
+        if self._input_thread is not None:
+            self._input_thread.start()
         self._output_thread.start()
         self._ping_thread.start()
         logger.info('Started.')
@@ -66,9 +80,10 @@ class DeviceController:
         Stop input, output and ping threads
         '''
         logger.info('Stopping...')
-        self._server.shutdown()
-        self._server.server_close()
-        self._input_thread.join()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._input_thread.join()
         self._stop_event.set()
         self._output_thread.join()
         self._ping_thread.join()
@@ -116,6 +131,48 @@ class DeviceController:
         '''
         raise SegfaultError('Segmentation fault when trying to write word at {}'.format(utils.word_to_str(pos)))
 
+    def handle_request(self, path, headers, rfile):
+        '''
+        Handle request from devices (path: /ioport/command) received by a server outside the Device Controller
+        '''
+        return self._handle_incoming_request(path, headers, rfile)
+
+    def flush_output(self, timeout=None):
+        '''
+        Send queued output to devices (instead of the output thread), return number of requests sent
+        '''
+        sent_count = 0
+        while True:
+            try:
+                output = self.output_queue.get_nowait()
+            except queue.Empty:
+                return sent_count
+            self._send_output(*output, timeout=timeout)
+            sent_count += 1
+
+    def schedule_pings(self, executor):
+        '''
+        Submit pings of registered devices to `executor` when their health check is due
+        '''
+        now = time.time()
+        for ioport in self.ioports:
+            health = self._device_health[ioport.ioport_number]
+            if ioport.registered and health.start_check(now):
+                executor.submit(self._check_and_update_device_status, ioport, health)
+
+    def get_device_health(self):
+        '''
+        Return health statistics of registered devices
+        '''
+        return {
+            ioport.ioport_number: dict(
+                self._device_health[ioport.ioport_number].get_stats(),
+                status=self._device_status_table[ioport.ioport_number],
+            )
+            for ioport in self.ioports
+            if ioport.registered
+        }
+
     def _set_device_status(self, ioport_number, status):
         if status < 0:
             status = 0
@@ -129,57 +186,73 @@ class DeviceController:
     def _output_thread_run(self):
         while True:
             try:
-                ioport_number, device_host, device_port, command, data = self.output_queue.get(timeout=0.1)
+                output = self.output_queue.get(timeout=0.1)
             except queue.Empty:
                 if self._stop_event.wait(0):
                     break
                 continue
-            logger.debug('Command "%s" from IOPort %s', command, ioport_number)
-            if command == 'data':
-                response = self._send_request(device_host, device_port, 'data', data)
-                if response.status_code != 200:
-                    raise DeviceError('Could not send data: {}'.format(response.text))
-                logger.debug('[Device] %s', response.json()['message'])
-            else:
-                logger.error('Unknown command')
+            self._send_output(*output)
 
-    def _ping_thread_run(self):
-        ping_period = 1  # sec
-        while True:
-            for ioport in self.ioports:
-                if ioport.registered:
-                    self._check_and_update_device_status(ioport)
-            if self._stop_event.wait(ping_period):
-                break
-
-    def _check_and_update_device_status(self, ioport):
-        ponged = self._ping_device(ioport)
-        if ponged:
-            ping_message = 'ponged'
-        else:
-            ping_message = 'did not pong'
-        logger.debug(
-            'Device[%s:%s] @ IOPort[%s] %s.',
-            ioport.device_host, ioport.device_port,
-            ioport.ioport_number,
-            ping_message,
-        )
-        if ponged:
-            new_status = 0
+    def _send_output(self, ioport_number, device_host, device_port, command, data, timeout=None):
+        logger.debug('Command "%s" from IOPort %s', command, ioport_number)
+        if command == 'data':
+            response = self._send_request(device_host, device_port, 'data', data, timeout=timeout)
+            if response.status_code != 200:
+                raise DeviceError('Could not send data: {}'.format(response.text))
+            self._device_health[ioport_number].record_success(time.time())
+            logger.debug('[Device] %s', response.json()['message'])
         else:
-            new_status = self._device_status_table[ioport.ioport_number] + 1
-        self._set_device_status(ioport.ioport_number, new_status)
+            logger.error('Unknown command')
+
+    def _ping_thread_run(self):
+        '''
+        Schedule health checks: each device is pinged on its own worker when its check is due,
+        so a slow device cannot delay the others
+        '''
+        with ThreadPoolExecutor(max_workers=max(1, len(self.ioports))) as executor:
+            while True:
+                self.schedule_pings(executor)
+                if self._stop_event.wait(config.device_ping_min_period / 2):
+                    break
+
+    def _check_and_update_device_status(self, ioport, health):
+        try:
+            rtt = self._ping_device(ioport)
+            now = time.time()
+            if rtt is not None:
+                health.record_success(now, rtt)
+                ping_message = 'ponged in {} ms'.format(round(rtt * 1000, 1))
+                new_status = 0
+            else:
+                health.record_failure(now)
+                ping_message = 'did not pong'
+                new_status = health.seconds_since_last_seen(now)
+            logger.debug(
+                'Device[%s:%s] @ IOPort[%s] %s.',
+                ioport.device_host, ioport.device_port,
+                ioport.ioport_number,
+                ping_message,
+            )
+            if ioport.registered:
+                self._set_device_status(ioport.ioport_number, new_status)
+        finally:
+            health.finish_check()
 
     def _ping_device(self, ioport):
+        '''
+        Ping device and return round-trip time in seconds, or None if it did not pong
+        '''
+        start_time = time.time()
         try:
-            response = self._send_request(ioport.device_host, ioport.device_port, 'ping')
+            response = self._send_request(ioport.device_host, ioport.device_port, 'ping', timeout=config.device_ping_timeout)
             if response.status_code != 200:
                 raise DeviceError('Device did not pong.')
         except DeviceControllerError:
-            return False
-        return True
+            return None
+        return time.time() - start_time
 
-    def _send_request(self, device_host, device_port, command, data=None, content_type='application/octet-stream'):
+    def _send_request(self, device_host, device_port, command, data=None, content_type='application/octet-stream', timeout=None):
+        import requests  # slow to import, so only when the first device is attached
         if data is None:
             data = b''
         try:
@@ -191,9 +264,12 @@ class DeviceController:
                 ),
                 data=data,
                 headers={'Content-Type': content_type},
+                timeout=timeout,
             )
         except requests.exceptions.ConnectionError:
             raise DeviceControllerConnectionError('Could not connect to Aldebaran.')
+        except requests.exceptions.Timeout:
+            raise DeviceControllerConnectionError('Device timed out.')
         logger.debug('Request sent.')
         return response
 
@@ -275,6 +351,7 @@ class DeviceController:
             )
 
         self.ioports[ioport_number].input_queue.put(data)
+        self._device_health[ioport_number].record_success(time.time())
         logger.info('Delivered data to IOPort %s.', ioport_number)
         self.interrupt_controller.send(self.system_interrupts['ioport_in'][ioport_number])
         return (
@@ -354,6 +431,7 @@ class DeviceController:
         for idx in range(3):
             self._device_registry[4 * ioport_number + 1 + idx] = device_id[idx]
         self._set_device_status(ioport_number, 0)
+        self._device_health[ioport_number].reset(time.time())
         self.ioports[ioport_number].register_device(device_host, device_port)
         self.interrupt_controller.send(self.system_interrupts['device_registered'])
         logger.info('Device registered to IOPort %s.', ioport_number)
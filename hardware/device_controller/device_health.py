@@ -0,0 +1,116 @@
+'''
+Health of a device connected to an IOPort
+'''
+
+import threading
+
+
+class DeviceHealth:
+    '''
+    Health check schedule and round-trip time statistics of a device
+
+    The check period doubles after every successful check (up to `max_period`)
+    and falls back to `min_period` after a failed one.
+    Any successful contact with the device (ping or data transfer) counts as a successful check.
+    '''
+
+    def __init__(self, min_period, max_period):
+        self.min_period = min_period
+        self.max_period = max_period
+        self._lock = threading.Lock()
+        self.reset(0)
+
+    def reset(self, now):
+        '''
+        Reset schedule and statistics, e.g. when a device is registered
+        '''
+        with self._lock:
+            self.period = self.min_period
+            self.last_seen = now
+            self.next_check = now + self.period
+            self.in_flight = False
+            self.ping_count = 0
+            self.failure_count = 0
+            self.rtt_last = None
+            self.rtt_min = None
+            self.rtt_max = None
+            self.rtt_sum = 0
+
+    def is_due(self, now):
+        '''
+        Return if the device should be checked now
+        '''
+        with self._lock:
+            return not self.in_flight and now >= self.next_check
+
+    def start_check(self, now):
+        '''
+        Mark check as in flight if it's due, return if it was due
+        '''
+        with self._lock:
+            if self.in_flight or now < self.next_check:
+                return False
+            self.in_flight = True
+            return True
+
+    def finish_check(self):
+        '''
+        Mark check as finished (after its result is recorded)
+        '''
+        with self._lock:
+            self.in_flight = False
+
+    def record_success(self, now, rtt=None):
+        '''
+        Record successful contact, with round-trip time if it was a ping
+        '''
+        with self._lock:
+            self.last_seen = now
+            self.period = min(self.period * 2, self.max_period)
+            self.next_check = now + self.period
+            if rtt is not None:
+                self.ping_count += 1
+                self.rtt_last = rtt
+                self.rtt_sum += rtt
+                if self.rtt_min is None or rtt < self.rtt_min:
+                    self.rtt_min = rtt
+                if self.rtt_max is None or rtt > self.rtt_max:
+                    self.rtt_max = rtt
+
+    def record_failure(self, now):
+        '''
+        Record failed ping
+        '''
+        with self._lock:
+            self.ping_count += 1
+            self.failure_count += 1
+            self.period = self.min_period
+            self.next_check = now + self.period
+
+    def seconds_since_last_seen(self, now):
+        '''
+        Return whole seconds since the last successful contact
+        '''
+        return int(now - self.last_seen)
+
+    def get_stats(self):
+        '''
+        Return statistics as dict (RTTs in milliseconds)
+        '''
+        with self._lock:
+            successful_pings = self.ping_count - self.failure_count
+            return {
+                'period': self.period,
+                'ping_count': self.ping_count,
+                'failure_count': self.failure_count,
+                'rtt_last': _to_ms(self.rtt_last),
+                'rtt_min': _to_ms(self.rtt_min),
+                'rtt_max': _to_ms(self.rtt_max),
+                'rtt_avg': _to_ms(self.rtt_sum / successful_pings) if successful_pings else None,
+            }
+
+
+def _to_ms(sec):
+    if sec is None:
+        return None
+    return round(sec * 1000, 3)
@@ -20,6 +20,7 @@ class IOPort:
         self.device_host = None
         self.device_port = None
         self.input_queue = queue.Queue()
+        self.time_travel = None  # set by the debugger's time travel
         self.device_controller = None
         self.architecture_registered = False
 
@@ -52,16 +53,23 @@ class IOPort:
         '''
         Read data from input buffer
         '''
+        if self.time_travel is not None and self.time_travel.replaying:
+            return self.time_travel.replay_ioport_input(self.ioport_number)
         try:
-            return self.input_queue.get_nowait()
+            data = self.input_queue.get_nowait()
         except queue.Empty:
             self._log_info('Reading input from empty buffer.')
-            return b''
+            data = b''
+        if self.time_travel is not None:
+            self.time_travel.record_ioport_input(self.ioport_number, data)
+        return data
 
     def send_data(self, data):
         '''
         Send data to device
         '''
+        if self.time_travel is not None and self.time_travel.replaying:
+            return  # already sent
         if not self.registered:
             self._log_error('No device registered to IOPort %s', self.ioport_number)
             return
@@ -0,0 +1,224 @@
+'''
+DMA Controller to transfer data between IOPorts and RAM without the CPU
+'''
+
+import logging
+import queue
+import threading
+from collections import namedtuple
+from enum import Enum
+
+from utils import config
+from utils import utils
+from utils.errors import AldebaranError, ArchitectureError
+from .memory.memory import SegfaultError
+
+
+logger = logging.getLogger(__name__)
+
+
+class DMAController:
+    '''
+    DMA Controller running transfers between IOPorts and RAM in the background
+
+    Transfers are started by the CPU (`DMAIN` and `DMAOUT` instructions) and run on a separate thread.
+    When a transfer is done, the DMA Controller calls the interrupt specified at its start.
+    '''
+
+    def __init__(self, freq):
+        if freq:
+            self._period = 1 / freq
+        else:
+            self._period = None
+        self._transfer_queue = queue.Queue()
+        self._pending_transfers = []
+        self._stop_event = threading.Event()
+        self._dma_thread = threading.Thread(target=self._dma_thread_run)
+        self._ram = None
+        self._ioports = None
+        self._interrupt_controller = None
+        self.time_travel = None  # set by the debugger's time travel
+        self._architecture_registered = False
+
+    def register_architecture(self, ram, device_controller, interrupt_controller):
+        '''
+        Register other internal devices
+        '''
+        self._ram = ram
+        self._ioports = device_controller.ioports
+        self._interrupt_controller = interrupt_controller
+        self._architecture_registered = True
+
+    def start(self):
+        '''
+        Start thread
+        '''
+        if not self._architecture_registered:
+            raise ArchitectureError('DMA Controller cannot run without registering architecture')
+        logger.info('Starting...')
+        self._dma_thread.start()
+        logger.info('Started.')
+
+    def stop(self):
+        '''
+        Set stop event and wait for thread to terminate
+        '''
+        logger.info('Stopping...')
+        self._stop_event.set()
+        self._dma_thread.join()
+        logger.info('Stopped.')
+
+    def is_alive(self):
+        '''
+        Check if thread is alive
+        '''
+        return self._dma_thread.is_alive()
+
+    def run_transfers(self):
+        '''
+        Run pending transfers once (instead of the DMA thread, e.g. in a multi-VM host), return whether any finished
+        '''
+        if not self._architecture_registered:
+            raise ArchitectureError('DMA Controller cannot run without registering architecture')
+        return self._process_transfers()
+
+    def start_input_transfer(self, ioport_number, pos, length, interrupt_number):
+        '''
+        Start transfer of the next input data from IOPort into the buffer at `pos`
+        '''
+        self._start_transfer(DMADirection.IN, ioport_number, pos, length, interrupt_number)
+
+    def start_output_transfer(self, ioport_number, pos, length, interrupt_number):
+        '''
+        Start transfer of `length` bytes at `pos` to IOPort
+        '''
+        self._start_transfer(DMADirection.OUT, ioport_number, pos, length, interrupt_number)
+
+    def _start_transfer(self, direction, ioport_number, pos, length, interrupt_number):
+        '''
+        Validate and queue transfer, it will be run by the DMA thread
+        '''
+        if ioport_number < 0 or ioport_number >= len(self._ioports):
+            raise NoIOPortError('No IOPort with number: {}'.format(ioport_number))
+        if pos < 0 or pos + length > self._ram.size:
+            raise SegfaultError('Segmentation fault when trying to transfer {} bytes at {}'.format(length, utils.word_to_str(pos)))
+        if direction == DMADirection.IN and length < 2:
+            raise InvalidTransferLengthError('Input buffer must be at least 2 bytes long: {}'.format(length))
+        if interrupt_number < 0 or interrupt_number > config.number_of_interrupts - 1:
+            raise InvalidTransferInterruptNumberError('Invalid transfer interrupt number: {}'.format(interrupt_number))
+        if self.time_travel is not None and self.time_travel.replaying:
+            return  # already done, its input and interrupt are replayed
+        self._transfer_queue.put(Transfer(direction, ioport_number, pos, length, interrupt_number))
+        logger.info(
+            'Transfer %s IOPort %s started (%d bytes @ %s).',
+            direction.name, ioport_number, length, utils.word_to_str(pos),
+        )
+
+    def _dma_thread_run(self):
+        try:
+            while True:
+                progressed = self._process_transfers()
+                if progressed:
+                    if self._stop_event.wait(0):
+                        break
+                    continue
+                if self._stop_event.wait(self._period or 0):
+                    break
+        except AldebaranError as ex:
+            logger.error('Crashed: {}({})'.format(
+                ex.__class__.__name__,
+                str(ex),
+            ))
+        except (KeyboardInterrupt, SystemExit) as ex:
+            logger.error('Stopped: {}({})'.format(
+                ex.__class__.__name__,
+                str(ex),
+            ))
+
+    def _process_transfers(self):
+        '''
+        Accept newly queued transfers and try to finish all pending ones
+
+        Return whether any transfer finished.
+        '''
+        if self.time_travel is not None and self.time_travel.replaying:
+            return False  # RAM is in the past
+        while True:
+            try:
+                self._pending_transfers.append(self._transfer_queue.get_nowait())
+            except queue.Empty:
+                break
+        progressed = False
+        still_pending = []
+        for transfer in self._pending_transfers:
+            if self._run_transfer(transfer):
+                self._interrupt_controller.send(transfer.interrupt_number)
+                progressed = True
+            else:
+                still_pending.append(transfer)
+        self._pending_transfers = still_pending
+        return progressed
+
+    def _run_transfer(self, transfer):
+        ioport = self._ioports[transfer.ioport_number]
+        if transfer.direction == DMADirection.IN:
+            try:
+                data = ioport.input_queue.get_nowait()
+            except queue.Empty:
+                return False
+            max_length = transfer.length - 2
+            if len(data) > max_length:
+                logger.error(
+                    'Input data from IOPort %s truncated to %d bytes (from %d).',
+                    transfer.ioport_number, max_length, len(data),
+                )
+                data = data[:max_length]
+            block = bytes(utils.word_to_binary(len(data))) + data
+            self._ram.write_block(transfer.pos, block, silent=True)
+            if self.time_travel is not None:
+                self.time_travel.record_dma_input(transfer.pos, block)
+            logger.info('Transfer IN IOPort %s done (%d bytes).', transfer.ioport_number, len(data))
+        else:
+            data = self._ram.read_block(transfer.pos, transfer.length, silent=True)
+            ioport.send_data(data)
+            logger.info('Transfer OUT IOPort %s done (%d bytes).', transfer.ioport_number, len(data))
+        return True
+
+
+Transfer = namedtuple('Transfer', [
+    'direction',  # DMADirection
+    'ioport_number',  # byte
+    'pos',  # word
+    'length',  # word
+    'interrupt_number',  # byte
+])
+
+
+class DMADirection(Enum):
+    '''
+    Direction of transfer
+    '''
+    IN = 0
+    OUT = 1
+
+
+# pylint: disable=missing-docstring
+
+class DMAError(AldebaranError):
+    pass
+
+
+class NoIOPortError(DMAError):
+    pass
+
+
+class InvalidTransferLengthError(DMAError):
+    pass
+
+
+class InvalidTransferInterruptNumberError(DMAError):
+    pass
+
+
+class DMACrashError(DMAError):
+    pass
@@ -0,0 +1,429 @@
+'''
+VM farm: multi-VM hosts in worker processes, managed by a supervisor
+'''
+
+from collections import namedtuple
+from http import HTTPStatus
+import json
+import logging
+import multiprocessing
+import signal
+import threading
+import time
+from urllib.parse import urlparse
+
+from utils import config
+from utils.errors import AldebaranError
+from utils.utils import GenericRequestHandler, GenericServer
+
+from .host import Host, NoSuchVMError, create_vm
+
+
+logger = logging.getLogger(__name__)
+
+
+class Supervisor:
+    '''
+    VM farm supervisor
+
+    Every worker process runs a multi-VM host with its own device port (`device_base_port` + worker number),
+    workers share nothing. A new VM goes to the least loaded worker: the load of a worker is the sum of the weights
+    of its running VMs, each multiplied by the ratio of its slices not ending in HALT.
+
+    The control server (JSON over HTTP, on localhost by default) starts, stops and snapshots VMs,
+    and returns the status of the farm with the metrics of every VM (cycles/sec, halted ratio, IRQ rate).
+    Commands are run by the workers between two scheduler rounds.
+    '''
+
+    def __init__(self, number_of_workers, slice_size, control_host, control_port, device_host, device_base_port):
+        self.number_of_workers = number_of_workers
+        self.slice_size = slice_size
+        self.device_host = device_host
+        self.device_base_port = device_base_port
+        self._workers = []
+        self._vm_workers = {}  # VM id -> worker number
+        self._next_vm_id = 0
+        self._next_command_id = 0
+        self._vm_lock = threading.Lock()
+        self._command_lock = threading.Lock()
+        self._server = GenericServer((control_host, control_port), GenericRequestHandler, self._handle_get, self._handle_post)
+        self._control_thread = threading.Thread(target=self._server.serve_forever)
+        self._stop_event = threading.Event()
+
+    def start(self):
+        '''
+        Start worker processes and control server
+        '''
+        logger.info('Starting %d workers...', self.number_of_workers)
+        for worker_number in range(self.number_of_workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            device_port = self.device_base_port + worker_number
+            process = multiprocessing.Process(
+                target=_worker_run,
+                args=(worker_connection, self.device_host, device_port, self.slice_size),
+                name='worker-{}'.format(worker_number),
+                daemon=True,
+            )
+            process.start()
+            self._workers.append(Worker(
+                process=process,
+                connection=connection,
+                device_port=device_port,
+            ))
+        self._control_thread.start()
+        logger.info('Started.')
+
+    def stop(self):
+        '''
+        Stop control server and worker processes
+        '''
+        logger.info('Stopping...')
+        self._server.shutdown()
+        self._server.server_close()
+        self._control_thread.join()
+        for worker_number, worker in enumerate(self._workers):
+            try:
+                self._send_command(worker_number, 'quit')
+            except WorkerError:
+                pass
+            worker.process.join(config.farm_command_timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        logger.info('Stopped.')
+
+    def run(self, boot_files=()):
+        '''
+        Start, start a VM for every boot file, then wait until interrupted (VMs are controlled through the control server)
+        '''
+        self.start()
+        dead_workers = set()
+        try:
+            for boot_file in boot_files:
+                self.start_vm(boot_file)
+            while not self._stop_event.wait(1):
+                for worker_number, worker in enumerate(self._workers):
+                    if worker_number not in dead_workers and not worker.process.is_alive():
+                        logger.error('Worker %d died (exit code: %s).', worker_number, worker.process.exitcode)
+                        dead_workers.add(worker_number)
+        except FarmError as ex:
+            logger.error(ex)
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            self.stop()
+
+    def start_vm(self, boot_file=None, weight=1, snapshot=None):
+        '''
+        Start VM from executable file or snapshot (dict) on the least loaded worker, return VM info as a dict
+        '''
+        with self._vm_lock:
+            worker_number = self._get_least_loaded_worker()
+            vm_id = self._next_vm_id
+            self._next_vm_id += 1  # even if starting fails, so an id is never reused
+            self._vm_workers[vm_id] = worker_number
+            try:
+                self._send_command(worker_number, 'start', vm_id, boot_file, weight, snapshot)
+            except CommandFailedError:
+                del self._vm_workers[vm_id]
+                raise
+            except WorkerError:
+                # the worker may still start the VM later, so it's stopped right after that
+                try:
+                    self._send_command(worker_number, 'stop', vm_id, wait=False)
+                except WorkerError:
+                    pass
+                raise
+        logger.info('VM %d started on worker %d.', vm_id, worker_number)
+        return self._get_vm_info(vm_id)
+
+    def stop_vm(self, vm_id):
+        '''
+        Stop VM
+        '''
+        self._send_command(self._get_worker_number(vm_id), 'stop', vm_id)
+        logger.info('VM %d stopped.', vm_id)
+
+    def get_snapshot(self, vm_id):
+        '''
+        Return snapshot of VM as a dict (see `Aldebaran.get_snapshot`)
+        '''
+        return self._send_command(self._get_worker_number(vm_id), 'snapshot', vm_id)
+
+    def get_status(self):
+        '''
+        Return workers, VMs with their metrics and totals as a dict
+        '''
+        workers = []
+        vms = {}
+        for worker_number, worker in enumerate(self._workers):
+            try:
+                metrics = self._send_command(worker_number, 'status')
+            except WorkerError:
+                metrics = None
+            workers.append({
+                'worker': worker_number,
+                'pid': worker.process.pid,
+                'alive': metrics is not None,
+                'device_port': worker.device_port,
+                'load': round(_get_load(metrics), 3) if metrics is not None else None,
+                'vm_count': len(metrics) if metrics is not None else None,
+            })
+            for vm_id, vm_metrics in (metrics or {}).items():
+                vms[vm_id] = dict(vm_metrics, **self._get_vm_info(vm_id))
+        running_vms = [vm for vm in vms.values() if vm['status'] == 'running']
+        return {
+            'workers': workers,
+            'vms': vms,
+            'total': {
+                'vm_count': len(vms),
+                'running_vm_count': len(running_vms),
+                'cycles_per_sec': sum(vm['cycles_per_sec'] for vm in running_vms),
+                'irq_rate': round(sum(vm['irq_rate'] for vm in running_vms), 2),
+            },
+        }
+
+    def _get_vm_info(self, vm_id):
+        worker_number = self._vm_workers[vm_id]
+        return {
+            'vm_id': vm_id,
+            'worker': worker_number,
+            'device_port': self._workers[worker_number].device_port,
+        }
+
+    def _get_worker_number(self, vm_id):
+        try:
+            return self._vm_workers[vm_id]
+        except KeyError:
+            raise NoSuchVMError('No VM with id: {}'.format(vm_id))
+
+    def _get_least_loaded_worker(self):
+        loads = []
+        for worker_number in range(len(self._workers)):
+            try:
+                metrics = self._send_command(worker_number, 'status')
+            except WorkerError:
+                continue
+            loads.append((_get_load(metrics), worker_number))
+        if not loads:
+            raise NoWorkerError('No worker is alive')
+        return min(loads)[1]
+
+    def _send_command(self, worker_number, command, *args, wait=True):
+        '''
+        Send command to worker and wait for its result (unless `wait` is False)
+
+        Commands have ids, so a late response of a timed out (or not waited) command is skipped.
+        '''
+        connection = self._workers[worker_number].connection
+        with self._command_lock:
+            command_id = self._next_command_id
+            self._next_command_id += 1
+            try:
+                connection.send((command_id, command, args))
+                if not wait:
+                    return None
+                while True:
+                    if not connection.poll(config.farm_command_timeout):
+                        raise WorkerError('Worker {} did not respond to command: {}'.format(worker_number, command))
+                    response_id, error, result = connection.recv()
+                    if response_id == command_id:
+                        break
+            except (EOFError, OSError):
+                raise WorkerError('Worker {} is not running'.format(worker_number))
+        if error is not None:
+            raise CommandFailedError(error)
+        return result
+
+    def _handle_get(self, path):
+        '''
+        Handle incoming GET request from control clients, called by GenericRequestHandler
+        '''
+        path = urlparse(path).path
+        if path == '/status':
+            return (
+                HTTPStatus.OK,
+                self.get_status(),
+            )
+        return (
+            HTTPStatus.NOT_FOUND,
+            {
+                'error': 'Not found',
+            }
+        )
+
+    def _handle_post(self, path, headers, rfile):
+        '''
+        Handle incoming POST request from control clients, called by GenericRequestHandler
+
+        /vms: start VM ({"file": executable} or {"snapshot": snapshot file}, optional "weight")
+        /vms/<id>/stop: stop VM
+        /vms/<id>/snapshot: save snapshot of VM ({"file": snapshot file})
+        '''
+        path = urlparse(path).path
+        try:
+            request_body_length = int(headers.get('Content-Length'))
+        except TypeError:
+            return (HTTPStatus.LENGTH_REQUIRED, None)
+        data = rfile.read(request_body_length)
+        try:
+            data = json.loads(data) if data else {}
+        except json.decoder.JSONDecodeError:
+            return (
+                HTTPStatus.BAD_REQUEST,
+                {
+                    'error': 'Could not parse data.',
+                }
+            )
+        try:
+            if path == '/vms':
+                return (
+                    HTTPStatus.OK,
+                    self._start_vm_from_request(data),
+                )
+            parts = path.strip('/').split('/')
+            if len(parts) == 3 and parts[0] == 'vms':
+                try:
+                    vm_id = int(parts[1])
+                except ValueError:
+                    raise NoSuchVMError('No VM with id: {}'.format(parts[1]))
+                if parts[2] == 'stop':
+                    self.stop_vm(vm_id)
+                    return (
+                        HTTPStatus.OK,
+                        {},
+                    )
+                if parts[2] == 'snapshot':
+                    return (
+                        HTTPStatus.OK,
+                        self._save_snapshot(vm_id, data.get('file')),
+                    )
+        except NoSuchVMError as ex:
+            return (
+                HTTPStatus.NOT_FOUND,
+                {
+                    'error': str(ex),
+                }
+            )
+        except (AldebaranError, OSError, ValueError) as ex:
+            return (
+                HTTPStatus.BAD_REQUEST,
+                {
+                    'error': str(ex),
+                }
+            )
+        return (
+            HTTPStatus.NOT_FOUND,
+            {
+                'error': 'Not found',
+            }
+        )
+
+    def _start_vm_from_request(self, data):
+        weight = int(data.get('weight', 1))
+        if data.get('snapshot'):
+            with open(data['snapshot']) as snapshot_file:
+                return self.start_vm(weight=weight, snapshot=json.load(snapshot_file))
+        if data.get('file'):
+            return self.start_vm(boot_file=data['file'], weight=weight)
+        raise ValueError('Either file or snapshot must be given.')
+
+    def _save_snapshot(self, vm_id, filename):
+        if not filename:
+            raise ValueError('File must be given.')
+        snapshot = self.get_snapshot(vm_id)
+        with open(filename, 'w') as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        logger.info('Snapshot of VM %d saved to %s.', vm_id, filename)
+        return {
+            'file': filename,
+            'cycle_count': snapshot['cycle_count'],
+        }
+
+
+Worker = namedtuple('Worker', [
+    'process',  # multiprocessing.Process
+    'connection',  # multiprocessing.Connection (supervisor's end of the pipe)
+    'device_port',  # integer
+])
+
+
+def _get_load(metrics):
+    return sum(
+        vm_metrics['weight'] * (1 - vm_metrics['halted_ratio'])
+        for vm_metrics in metrics.values()
+        if vm_metrics['status'] == 'running'
+    )
+
+
+def _worker_run(connection, device_host, device_port, slice_size):
+    '''
+    Main loop of worker process: run scheduler rounds of its host and the commands of the supervisor between them
+    '''
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # stopped by the supervisor
+    host = Host(device_host, device_port, slice_size)
+    host.start()
+    try:
+        while True:
+            if connection.poll(0):
+                try:
+                    command_id, command, args = connection.recv()
+                except EOFError:
+                    break
+                if command == 'quit':
+                    connection.send((command_id, None, None))
+                    break
+                try:
+                    result = _run_command(host, command, args)
+                except Exception as ex:  # pylint: disable=broad-except
+                    # the error goes back to the supervisor, the worker and its other VMs go on
+                    connection.send((command_id, '{}: {}'.format(ex.__class__.__name__, ex), None))
+                else:
+                    connection.send((command_id, None, result))
+                continue
+            if not host.run_round():
+                # no running VM or every VM is halted
+                connection.poll(1 / config.cpu_halt_freq)
+    finally:
+        host.stop()
+
+
+def _run_command(host, command, args):
+    if command == 'start':
+        vm_id, boot_file, weight, snapshot = args
+        aldebaran = create_vm()
+        if snapshot is None:
+            aldebaran.boot(boot_file)
+        else:
+            aldebaran.load_snapshot(snapshot)
+        host.add_vm(vm_id, aldebaran, weight)
+        return None
+    if command == 'stop':
+        host.stop_vm(args[0])
+        return None
+    if command == 'snapshot':
+        return host.get_vm(args[0]).get_snapshot()
+    if command == 'status':
+        return host.get_metrics(time.time())
+    raise UnknownCommandError('Unknown command: {}'.format(command))
+
+
+# pylint: disable=missing-docstring
+
+class FarmError(AldebaranError):
+    pass
+
+
+class NoWorkerError(FarmError):
+    pass
+
+
+class WorkerError(FarmError):
+    pass
+
+
+class CommandFailedError(FarmError):
+    pass
+
+
+class UnknownCommandError(FarmError):
+    pass
@@ -0,0 +1,302 @@
+'''
+Multi-VM host: many Aldebaran instances in one process
+'''
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import logging
+import threading
+import time
+
+from instructions.instruction_set import INSTRUCTION_SET
+from utils import config
+from utils.errors import AldebaranError
+from utils.utils import GenericRequestHandler, GenericServer
+
+from .aldebaran import Aldebaran
+from .clock import Clock
+from .cpu import CPU, Registers, FastStack
+from .device_controller import DeviceController, IOPort
+from .dma_controller import DMAController
+from .interrupt_controller import InterruptController
+from .memory import Memory, RAM, VirtualRAM
+from .timer import Timer
+
+
+logger = logging.getLogger(__name__)
+
+
+class Host:
+    '''
+    Multi-VM host
+
+    VMs run on one thread, interleaved by a weighted round-robin scheduler: in every round each running VM
+    runs a slice of `slice_size * weight` instructions. Timers and DMA transfers of a VM run between its slices
+    instead of on their own threads, and a halted VM (that cannot take an interrupt) gives up the rest of its slice.
+    VMs run in TURBO mode. A VM that crashes is stopped, the others go on.
+
+    Devices of every VM talk to one shared server (path: /vm_id/ioport/command), and one networking thread
+    sends output to devices and pings them, so the number of threads doesn't grow with the number of VMs.
+    The device controllers of hosted VMs are created without a server of their own.
+    '''
+
+    def __init__(self, host, port, slice_size):
+        self.slice_size = slice_size
+        self.stats = {}  # VM id -> VMStats
+        self._vms = {}  # VM id -> Aldebaran
+        if host is None:
+            self._server = None
+            self._input_thread = None
+        else:
+            self._server = GenericServer((host, port), GenericRequestHandler, None, self._handle_incoming_request)
+            self._input_thread = threading.Thread(target=self._server.serve_forever)
+        self._stop_event = threading.Event()
+        self._network_thread = threading.Thread(target=self._network_thread_run)
+        self._flushing_vm_ids = set()  # VMs whose output is being sent
+
+    def add_vm(self, vm_id, aldebaran, weight=1):
+        '''
+        Add booted VM with a scheduling weight (slices are `weight` times longer)
+        '''
+        if vm_id in self._vms:
+            raise DuplicateVMError('VM already exists: {}'.format(vm_id))
+        if weight < 1:
+            raise InvalidWeightError('Invalid weight: {}'.format(weight))
+        self._vms[vm_id] = aldebaran
+        self.stats[vm_id] = VMStats(
+            weight=weight,
+            status='running',
+            cycle_count=0,
+            slice_count=0,
+            halted_slice_count=0,
+            start_time=time.time(),
+            stop_time=None,
+            error=None,
+        )
+
+    def stop_vm(self, vm_id):
+        '''
+        Stop running VM (it's not scheduled any more, but its stats are kept)
+        '''
+        try:
+            stats = self.stats[vm_id]
+        except KeyError:
+            raise NoSuchVMError('No VM with id: {}'.format(vm_id))
+        if stats.status == 'running':
+            self.stats[vm_id] = stats._replace(status='stopped', stop_time=time.time())
+            logger.info('VM %s stopped.', vm_id)
+
+    def get_vm(self, vm_id):
+        '''
+        Return VM (Aldebaran instance)
+        '''
+        try:
+            return self._vms[vm_id]
+        except KeyError:
+            raise NoSuchVMError('No VM with id: {}'.format(vm_id))
+
+    def get_metrics(self, now):
+        '''
+        Return metrics of every VM as dicts
+
+        Rates are averages over the lifetime of the VM, the halted ratio is the ratio of slices ending in HALT.
+        '''
+        metrics = {}
+        for vm_id, stats in self.stats.items():
+            run_time = (stats.stop_time or now) - stats.start_time
+            metrics[vm_id] = {
+                'status': stats.status,
+                'weight': stats.weight,
+                'cycle_count': stats.cycle_count,
+                'cycles_per_sec': round(stats.cycle_count / run_time) if run_time > 0 else 0,
+                'halted_ratio': round(stats.halted_slice_count / stats.slice_count, 3) if stats.slice_count else 0,
+                'irq_rate': round(self._vms[vm_id].interrupt_controller.interrupt_count / run_time, 2) if run_time > 0 else 0,
+                'error': stats.error,
+            }
+        return metrics
+
+    def run(self):
+        '''
+        Main loop: run scheduler rounds until every VM stopped
+        '''
+        self.start()
+        start_time = time.time()
+        try:
+            while any(stats.status == 'running' for stats in self.stats.values()):
+                if not self.run_round():
+                    # every VM is halted
+                    time.sleep(1 / config.cpu_halt_freq)
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            self.stop()
+            self._print_stats(time.time() - start_time)
+
+    def start(self):
+        '''
+        Start shared device server and networking thread (`run` calls it, or call it before `run_round`)
+        '''
+        logger.info('Started %d VMs.', len(self._vms))
+        if self._input_thread is not None:
+            self._input_thread.start()
+        self._network_thread.start()
+
+    def stop(self):
+        '''
+        Stop shared device server and networking thread
+        '''
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._input_thread.join()
+        self._stop_event.set()
+        self._network_thread.join()
+
+    def run_round(self):
+        '''
+        Run a slice of every running VM, return number of cycles run
+        '''
+        now = time.time()
+        cycle_count = 0
+        for vm_id, aldebaran in self._vms.items():
+            stats = self.stats[vm_id]
+            if stats.status != 'running':
+                continue
+            try:
+                cycles = aldebaran.run_slice(self.slice_size * stats.weight, now)
+            except AldebaranError as ex:
+                logger.error('VM %s crashed: %s(%s)', vm_id, ex.__class__.__name__, ex)
+                self.stats[vm_id] = stats._replace(status='crashed', stop_time=time.time(), error=str(ex))
+                continue
+            shutdown = aldebaran.cpu.shutdown
+            self.stats[vm_id] = stats._replace(
+                status='shutdown' if shutdown else 'running',
+                cycle_count=stats.cycle_count + cycles,
+                slice_count=stats.slice_count + 1,
+                halted_slice_count=stats.halted_slice_count + (1 if aldebaran.cpu.halt else 0),
+                stop_time=time.time() if shutdown else None,
+            )
+            cycle_count += cycles
+        return cycle_count
+
+    def _print_stats(self, full_time):
+        cycle_count = sum(stats.cycle_count for stats in self.stats.values())
+        logger.info(
+            'Stopped after %s cycles of %d VMs in %s sec (%d Hz).',
+            cycle_count,
+            len(self._vms),
+            round(full_time, 2),
+            round(cycle_count / full_time) if full_time else 0,
+        )
+        for vm_id, stats in self.stats.items():
+            logger.info(
+                '  VM %s: %s, weight %d, %d cycles in %d slices',
+                vm_id, stats.status, stats.weight, stats.cycle_count, stats.slice_count,
+            )
+
+    def _network_thread_run(self):
+        '''
+        Schedule sending output to devices and pings of every VM
+
+        Output of a VM is sent on a worker (one at a time per VM, to keep its order) with a timeout,
+        so a device that never replies cannot block the devices of other VMs.
+        '''
+        with ThreadPoolExecutor(max_workers=config.number_of_ioports) as executor:
+            while True:
+                for vm_id, aldebaran in list(self._vms.items()):
+                    if self.stats[vm_id].status in ('crashed', 'stopped'):
+                        continue
+                    if vm_id not in self._flushing_vm_ids and not aldebaran.device_controller.output_queue.empty():
+                        self._flushing_vm_ids.add(vm_id)
+                        executor.submit(self._flush_output, vm_id, aldebaran)
+                    aldebaran.device_controller.schedule_pings(executor)
+                if self._stop_event.wait(config.host_network_period):
+                    break
+
+    def _flush_output(self, vm_id, aldebaran):
+        try:
+            aldebaran.device_controller.flush_output(timeout=config.host_output_timeout)
+        except AldebaranError as ex:
+            logger.error('Device error in VM %s: %s(%s)', vm_id, ex.__class__.__name__, ex)
+        finally:
+            self._flushing_vm_ids.discard(vm_id)
+
+    def _handle_incoming_request(self, path, headers, rfile):
+        '''
+        Dispatch incoming request from devices (/vm_id/ioport/command) to the device controller of the VM
+        '''
+        vm_id, _, device_path = path.lstrip('/').partition('/')
+        try:
+            aldebaran = self._vms[int(vm_id)]
+        except (ValueError, KeyError):
+            return (
+                HTTPStatus.NOT_FOUND,
+                {
+                    'error': 'No VM with id: {}'.format(vm_id),
+                }
+            )
+        return aldebaran.device_controller.handle_request('/' + device_path, headers, rfile)
+
+
+def create_vm():
+    '''
+    Create VM to be hosted: its device controller has no server, and it has no debugger
+    '''
+    ioports = [
+        IOPort(ioport_number, config.input_buffer_size)
+        for ioport_number in range(config.number_of_ioports)
+    ]
+    return Aldebaran({
+        'clock': Clock(),
+        'registers': Registers(config.system_addresses['bottom_of_stack']),
+        'stack': FastStack(config.system_addresses['bottom_of_stack']),
+        'cpu': CPU(config.system_addresses, INSTRUCTION_SET, config.operand_buffer_size, config.cpu_halt_freq),
+        'memory': Memory(config.ram_size),
+        'ram': RAM(config.ram_size),
+        'virtual_ram': VirtualRAM({
+            'device_controller': {
+                'first': config.device_registry_address,
+                'last': config.device_status_table_address + config.device_status_table_size,
+            },
+        }),
+        'interrupt_controller': InterruptController(),
+        'device_controller': DeviceController(
+            None, None,  # devices talk to the host's server
+            config.system_addresses, config.system_interrupts,
+            ioports,
+        ),
+        'timer': Timer(config.timer_freq, config.number_of_subtimers),
+        'dma_controller': DMAController(config.dma_freq),
+        'debugger': None,
+    })
+
+
+VMStats = namedtuple('VMStats', [
+    'weight',  # integer
+    'status',  # 'running' | 'shutdown' | 'crashed' | 'stopped'
+    'cycle_count',  # integer
+    'slice_count',  # integer
+    'halted_slice_count',  # integer (slices ending in HALT)
+    'start_time',  # float
+    'stop_time',  # float | None (if running)
+    'error',  # string | None (if crashed)
+])
+
+
+# pylint: disable=missing-docstring
+
+class HostError(AldebaranError):
+    pass
+
+
+class DuplicateVMError(HostError):
+    pass
+
+
+class InvalidWeightError(HostError):
+    pass
+
+
+class NoSuchVMError(HostError):
+    pass
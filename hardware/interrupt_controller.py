@@ -21,19 +21,32 @@ class InterruptController:
 
     def __init__(self):
         self._interrupt_queue = queue.Queue()
+        self.interrupt_count = 0  # IRQs forwarded to CPU
+        self.time_travel = None  # set by the debugger's time travel
 
     def check(self):
         '''
         Get interrupt, if there's any
         '''
+        if self.time_travel is not None and self.time_travel.replaying:
+            return self.time_travel.replay_interrupt()
         try:
             interrupt_number = self._interrupt_queue.get_nowait()
         except queue.Empty:
             return None
+        if self.time_travel is not None:
+            self.time_travel.record_interrupt(interrupt_number)
+        self.interrupt_count += 1
         logger.info('Forwarded IRQ to CPU: %s', utils.byte_to_str(interrupt_number))
         logger.debug('Interrupt queue length: %d', self._interrupt_queue.qsize())
         return interrupt_number
 
+    def is_pending(self):
+        '''
+        Check if there's any interrupt waiting
+        '''
+        return not self._interrupt_queue.empty()
+
     def send(self, interrupt_number):
         '''
         Send interrupt
@@ -6,6 +6,7 @@ import logging
 
 from utils import utils
 from utils.errors import AldebaranError
+from .watchpoints import WATCH_READ, WATCH_WRITE
 
 
 logger = logging.getLogger('hardware.memory')
@@ -14,20 +15,26 @@ logger = logging.getLogger('hardware.memory')
 class Memory:
     '''
     Memory interface
+
+    Watchpoints are checked on accesses that are not silent (i.e. by operands of instructions,
+    but not instruction fetch, stack operations or the debugger).
     '''
 
     def __init__(self, ram_size):
         self.ram_size = ram_size
         self.ram = None
         self.virtual_ram = None
+        self.trace_recorder = None
+        self.watchpoints = None  # set by the debugger if there are watchpoints
         self.architecture_registered = False
 
-    def register_architecture(self, ram, virtual_ram):
+    def register_architecture(self, ram, virtual_ram, trace_recorder=None):
         '''
         Register other internal devices
         '''
         self.ram = ram
         self.virtual_ram = virtual_ram
+        self.trace_recorder = trace_recorder
         self.architecture_registered = True
 
     def read_byte(self, pos, silent=False):
@@ -35,33 +42,47 @@ class Memory:
         Read byte at position `pos`
         '''
         if pos < self.ram_size:
-            return self.ram.read_byte(pos, silent=silent)
-        return self.virtual_ram.read_byte(pos, silent=silent)
+            value = self.ram.read_byte(pos, silent=silent)
+        else:
+            value = self.virtual_ram.read_byte(pos, silent=silent)
+        if self.watchpoints is not None and not silent:
+            self.watchpoints.check(pos, 1, WATCH_READ, value)
+        return value
 
     def write_byte(self, pos, value, silent=False):
         '''
         Write byte at position `pos`
         '''
+        if self.trace_recorder is not None:
+            self.trace_recorder.record_memory_write(pos, 1, value)
         if pos < self.ram_size:
             self.ram.write_byte(pos, value, silent=silent)
         else:
             self.virtual_ram.write_byte(pos, value, silent=silent)
+        if self.watchpoints is not None and not silent:
+            self.watchpoints.check(pos, 1, WATCH_WRITE, value)
 
     def read_word(self, pos, silent=False):
         '''
         Read word at position `pos`
         '''
         if pos < self.ram_size - 1:
-            return self.ram.read_word(pos, silent=silent)
-        if pos == self.ram_size - 1:
+            value = self.ram.read_word(pos, silent=silent)
+        elif pos == self.ram_size - 1:
             # cannot read word half from ram, half from virtual ram
             raise SegfaultError('Segmentation fault when trying to read word at {}'.format(utils.word_to_str(pos)))
-        return self.virtual_ram.read_word(pos, silent=silent)
+        else:
+            value = self.virtual_ram.read_word(pos, silent=silent)
+        if self.watchpoints is not None and not silent:
+            self.watchpoints.check(pos, 2, WATCH_READ, value)
+        return value
 
     def write_word(self, pos, value, silent=False):
         '''
         Write word at position `pos`
         '''
+        if self.trace_recorder is not None:
+            self.trace_recorder.record_memory_write(pos, 2, value)
         if pos < self.ram_size - 1:
             self.ram.write_word(pos, value, silent=silent)
         elif pos == self.ram_size - 1:
@@ -69,6 +90,31 @@ class Memory:
             raise SegfaultError('Segmentation fault when trying to read word at {}'.format(utils.word_to_str(pos)))
         else:
             self.virtual_ram.write_word(pos, value, silent=silent)
+        if self.watchpoints is not None and not silent:
+            self.watchpoints.check(pos, 2, WATCH_WRITE, value)
+
+    def read_block(self, pos, length):
+        '''
+        Read `length` bytes starting at position `pos` silently (e.g. for the debugger)
+
+        Return content and validity bitmap (bit 7 of byte 0 is the first byte of content, 1: mapped).
+        Unmapped bytes are 00 in the content.
+        '''
+        if pos < 0 or length < 0:
+            raise SegfaultError('Segmentation fault when trying to read {} bytes at {}'.format(length, utils.word_to_str(pos)))
+        content = bytearray(length)
+        validity = bytearray((length + 7) // 8)
+        ram_length = max(min(pos + length, self.ram_size) - pos, 0)
+        if ram_length:
+            content[:ram_length] = self.ram.read_block(pos, ram_length, silent=True)
+            validity[:ram_length // 8] = b'\xFF' * (ram_length // 8)
+            for idx in range(ram_length // 8 * 8, ram_length):
+                validity[idx // 8] |= 0x80 >> (idx % 8)
+        if ram_length < length and self.virtual_ram is not None:
+            for idx, value in self.virtual_ram.read_block(pos + ram_length, length - ram_length):
+                content[ram_length + idx] = value
+                validity[(ram_length + idx) // 8] |= 0x80 >> ((ram_length + idx) % 8)
+        return bytes(content), bytes(validity)
 
 
 # pylint: disable=missing-docstring
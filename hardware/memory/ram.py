@@ -63,3 +63,25 @@ class RAM:
         self._content[pos + 1] = utils.get_low(value)
         if not silent:
             logger.debug('Written word %s to %s.', utils.word_to_str(value), utils.word_to_str(pos))
+
+    def read_block(self, pos, length, silent=False):
+        '''
+        Read `length` bytes from RAM starting at position `pos`
+        '''
+        if pos < 0 or length < 0 or pos + length > self.size:
+            raise SegfaultError('Segmentation fault when trying to read {} bytes at {}'.format(length, utils.word_to_str(pos)))
+        value = bytes(self._content[pos:pos + length])
+        if not silent:
+            logger.debug('Read %d bytes from %s.', length, utils.word_to_str(pos))
+        return value
+
+    def write_block(self, pos, data, silent=False):
+        '''
+        Write bytes of `data` to RAM starting at position `pos`
+        '''
+        length = len(data)
+        if pos < 0 or pos + length > self.size:
+            raise SegfaultError('Segmentation fault when trying to write {} bytes at {}'.format(length, utils.word_to_str(pos)))
+        self._content[pos:pos + length] = data
+        if not silent:
+            logger.debug('Written %d bytes to %s.', length, utils.word_to_str(pos))
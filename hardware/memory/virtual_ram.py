@@ -18,6 +18,7 @@ class VirtualRAM:
 
     def __init__(self, addresses):
         self.addresses = addresses
+        self.time_travel = None  # set by the debugger's time travel
         self.device_controller = None
         self.architecture_registered = False
 
@@ -34,7 +35,7 @@ class VirtualRAM:
         '''
         if pos < self.addresses['device_controller']['first'] or pos > self.addresses['device_controller']['last']:
             raise SegfaultError('Segmentation fault when trying to read byte at {}'.format(utils.word_to_str(pos)))
-        value = self.device_controller.read_byte(pos, silent=silent)
+        value = self._read(self.device_controller.read_byte, pos, silent)
         if not silent:
             logger.debug('Read byte %s from %s.', utils.byte_to_str(value), utils.word_to_str(pos))
         return value
@@ -55,7 +56,7 @@ class VirtualRAM:
         '''
         if pos < self.addresses['device_controller']['first'] or pos > self.addresses['device_controller']['last'] - 1:
             raise SegfaultError('Segmentation fault when trying to read word at {}'.format(utils.word_to_str(pos)))
-        value = self.device_controller.read_word(pos, silent=silent)
+        value = self._read(self.device_controller.read_word, pos, silent)
         if not silent:
             logger.debug('Read word %s from %s.', utils.word_to_str(value), utils.word_to_str(pos))
         return value
@@ -69,3 +70,25 @@ class VirtualRAM:
         self.device_controller.write_word(pos, value, silent=silent)
         if not silent:
             logger.debug('Written word %s to %s.', utils.word_to_str(value), utils.word_to_str(pos))
+
+    def read_block(self, pos, length):
+        '''
+        Read mapped bytes from Virtual RAM between `pos` and `pos + length` silently, yield (relative position, value)
+        '''
+        first = max(pos, self.addresses['device_controller']['first'])
+        last = min(pos + length - 1, self.addresses['device_controller']['last'])
+        for address in range(first, last + 1):
+            try:
+                yield address - pos, self.device_controller.read_byte(address, silent=True)
+            except SegfaultError:
+                pass
+
+    def _read(self, read_method, pos, silent):
+        # device registry and device status table change without the CPU, so reads of the CPU are logged for replay
+        if self.time_travel is None or silent:
+            return read_method(pos, silent=silent)
+        if self.time_travel.replaying:
+            return self.time_travel.replay_virtual_ram_read(pos)
+        value = read_method(pos, silent=silent)
+        self.time_travel.record_virtual_ram_read(pos, value)
+        return value
@@ -0,0 +1,132 @@
+'''
+Memory watchpoints
+'''
+
+from collections import namedtuple
+
+from utils import utils
+from utils.errors import AldebaranError
+
+
+WATCH_READ = 1
+WATCH_WRITE = 2
+WATCH_MODES = {
+    'r': WATCH_READ,
+    'w': WATCH_WRITE,
+    'rw': WATCH_READ | WATCH_WRITE,
+}
+
+
+class Watchpoints:
+    '''
+    Watchpoints on address ranges
+
+    The page table holds the union of watch modes of every page, so an access to a page without watchpoints
+    costs one lookup. Only the first hit is kept until `clear_hit` is called.
+    '''
+
+    def __init__(self, memory_size, page_size):
+        self.page_size = page_size
+        self.hit = None
+        self._watchpoints = []
+        self._page_table = bytearray(memory_size // page_size)
+
+    def __len__(self):
+        return len(self._watchpoints)
+
+    def add(self, first_address, last_address, mode):
+        '''
+        Add watchpoint on addresses first_address-last_address (inclusive) with mode 'r', 'w' or 'rw'
+        '''
+        try:
+            watch_mode = WATCH_MODES[mode]
+        except KeyError:
+            raise InvalidWatchpointError('Invalid mode: {}'.format(mode))
+        if first_address < 0 or last_address < first_address or last_address // self.page_size >= len(self._page_table):
+            raise InvalidWatchpointError('Invalid address range: {}-{}'.format(first_address, last_address))
+        watchpoint = Watchpoint(first_address, last_address, watch_mode)
+        if watchpoint not in self._watchpoints:
+            self._watchpoints.append(watchpoint)
+            self._update_page_table()
+        return watchpoint
+
+    def remove(self, first_address, last_address, mode):
+        '''
+        Remove watchpoint
+        '''
+        try:
+            self._watchpoints.remove(Watchpoint(first_address, last_address, WATCH_MODES.get(mode)))
+        except ValueError:
+            raise InvalidWatchpointError('No such watchpoint: {}-{} {}'.format(first_address, last_address, mode))
+        self._update_page_table()
+
+    def get_watchpoints(self):
+        '''
+        Return list of watchpoints as dicts
+        '''
+        return [
+            _watchpoint_to_dict(watchpoint)
+            for watchpoint in self._watchpoints
+        ]
+
+    def check(self, pos, length, watch_mode, value):
+        '''
+        Check memory access of `length` bytes at `pos`, record hit
+        '''
+        page_table = self._page_table
+        page_size = self.page_size
+        if not (page_table[pos // page_size] | page_table[(pos + length - 1) // page_size]) & watch_mode:
+            return
+        if self.hit is not None:
+            return
+        last_pos = pos + length - 1
+        for watchpoint in self._watchpoints:
+            if watchpoint.mode & watch_mode and pos <= watchpoint.last_address and last_pos >= watchpoint.first_address:
+                self.hit = {
+                    'watchpoint': _watchpoint_to_dict(watchpoint),
+                    'address': utils.word_to_str(pos),
+                    'access': 'write' if watch_mode == WATCH_WRITE else 'read',
+                    'value': utils.byte_to_str(value) if length == 1 else utils.word_to_str(value),
+                }
+                return
+
+    def clear_hit(self):
+        '''
+        Forget last hit
+        '''
+        self.hit = None
+
+    def _update_page_table(self):
+        page_table = bytearray(len(self._page_table))
+        for watchpoint in self._watchpoints:
+            for page in range(watchpoint.first_address // self.page_size, watchpoint.last_address // self.page_size + 1):
+                page_table[page] |= watchpoint.mode
+        self._page_table = page_table
+
+
+Watchpoint = namedtuple('Watchpoint', [
+    'first_address',  # word
+    'last_address',  # word (inclusive)
+    'mode',  # WATCH_READ | WATCH_WRITE
+])
+
+
+def _watchpoint_to_dict(watchpoint):
+    return {
+        'first_address': utils.word_to_str(watchpoint.first_address),
+        'last_address': utils.word_to_str(watchpoint.last_address),
+        'mode': {
+            watch_mode: mode
+            for mode, watch_mode in WATCH_MODES.items()
+        }[watchpoint.mode],
+    }
+
+
+# pylint: disable=missing-docstring
+
+class WatchpointError(AldebaranError):
+    pass
+
+
+class InvalidWatchpointError(WatchpointError):
+    pass
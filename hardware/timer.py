@@ -31,6 +31,7 @@ class Timer:
         self._timer_thread = threading.Thread(target=self._timer_thread_run)
         self._subtimers = [Subtimer() for _ in range(number_of_subtimers)]
         self._interrupt_controller = None
+        self.time_travel = None  # set by the debugger's time travel
         self._architecture_registered = False
 
     def register_architecture(self, interrupt_controller):
@@ -69,20 +70,39 @@ class Timer:
         '''
         Set subtimer's config
         '''
+        if self.time_travel is not None and self.time_travel.replaying:
+            return  # already set
         try:
             self._subtimers[subtimer_number].set_config(raw_mode, speed, phase, interrupt_number)
         except IndexError:
             raise NoSubtimerError('No subtimer with number: {}'.format(subtimer_number))
         logger.info('Subtimer %s set.', utils.byte_to_str(subtimer_number))
 
+    def run_due_beats(self, now):
+        '''
+        Run the beats due by `now` (instead of the timer thread, e.g. in a multi-VM host)
+        '''
+        if not self._architecture_registered:
+            raise ArchitectureError('Timer cannot run without registering architecture')
+        if self._start_time is None:
+            self._start_time = now
+        if self._period is None:
+            self._beat()
+            return
+        while self._start_time + self._step_count * self._period <= now:
+            self._beat()
+
+    def _beat(self):
+        logger.debug('Beat %s', self._step_count)
+        for subtimer_number, subtimer in enumerate(self._subtimers):
+            self._check_subtimer(subtimer_number, subtimer)
+        self._step_count += 1
+
     def _timer_thread_run(self):
         try:
             self._start_time = time.time()
             while True:
-                logger.debug('Beat %s', self._step_count)
-                for subtimer_number, subtimer in enumerate(self._subtimers):
-                    self._check_subtimer(subtimer_number, subtimer)
-                self._step_count += 1
+                self._beat()
                 if self._stop_event.wait(0):
                     break
                 self._sleep()
@@ -0,0 +1,256 @@
+'''
+Trace recorder: record executed instructions, register changes and memory writes in a compact binary file
+
+Format:
+- header: signature, version, record size
+- fixed-size records (big-endian, zero-padded to RECORD_SIZE bytes):
+    - instruction: type, cycle, IP, opcode, operand buffer
+    - register: type, register code (index in WORD_REGISTERS), new value
+    - memory write: type, address, length (1 or 2), value
+    - interrupt: type, cycle, interrupt number
+
+Register and memory write records belong to the last instruction (or interrupt) record before them.
+'''
+
+import logging
+import struct
+
+from instructions.operands import WORD_REGISTERS, parse_operand_buffer, operand_to_str
+from utils import utils
+from utils.errors import AldebaranError, ArchitectureError
+
+
+logger = logging.getLogger(__name__)
+
+
+TRACE_SIGNATURE = b'ALDTRC'
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct('>6sBB')  # signature, version, record size
+
+RECORD_SIZE = 24
+OPERAND_BUFFER_SIZE = 16
+
+RECORD_INSTRUCTION = 1
+RECORD_REGISTER = 2
+RECORD_MEMORY_WRITE = 3
+RECORD_INTERRUPT = 4
+
+RECORD_STRUCTS = {
+    RECORD_INSTRUCTION: struct.Struct('>BIHB{}s'.format(OPERAND_BUFFER_SIZE)),  # cycle, IP, opcode, operand buffer
+    RECORD_REGISTER: struct.Struct('>BBH20x'),  # register code, value
+    RECORD_MEMORY_WRITE: struct.Struct('>BHBH18x'),  # address, length, value
+    RECORD_INTERRUPT: struct.Struct('>BIB18x'),  # cycle, interrupt number
+}
+
+
+class TraceRecorder:
+    '''
+    Trace recorder
+
+    Records are packed into a preallocated buffer, which is written to the trace file
+    when it's full (every `block_size` records), so tracing costs no string formatting or small writes.
+    Only memory writes through Memory (i.e. by the CPU) are recorded.
+    '''
+
+    def __init__(self, filename, block_size):
+        self.filename = filename
+        self.block_size = block_size
+        self.record_count = 0
+        self._buffer = bytearray(RECORD_SIZE * block_size)
+        self._offset = 0
+        self._trace_file = None
+        self._last_registers = {}
+        self._register_codes = {
+            register_name: register_code
+            for register_code, register_name in enumerate(WORD_REGISTERS)
+        }
+        self._instruction_struct = RECORD_STRUCTS[RECORD_INSTRUCTION]
+        self._register_struct = RECORD_STRUCTS[RECORD_REGISTER]
+        self._memory_write_struct = RECORD_STRUCTS[RECORD_MEMORY_WRITE]
+        self._interrupt_struct = RECORD_STRUCTS[RECORD_INTERRUPT]
+        self.clock = None
+        self.registers = None
+        self.architecture_registered = False
+
+    def register_architecture(self, clock, registers):
+        '''
+        Register other internal devices
+        '''
+        self.clock = clock
+        self.registers = registers
+        self.architecture_registered = True
+
+    def start(self):
+        '''
+        Open trace file and record initial value of registers
+        '''
+        if not self.architecture_registered:
+            raise ArchitectureError('Trace recorder cannot run without registering architecture')
+        self._trace_file = open(self.filename, 'wb')
+        self._trace_file.write(TRACE_HEADER.pack(TRACE_SIGNATURE, TRACE_VERSION, RECORD_SIZE))
+        self._last_registers = {}
+        self.record_registers()
+        logger.info('Recording trace to %s...', self.filename)
+
+    def stop(self):
+        '''
+        Flush buffer and close trace file
+        '''
+        if self._trace_file is None:
+            return
+        self._flush()
+        self._trace_file.close()
+        self._trace_file = None
+        logger.info('Recorded %d records.', self.record_count)
+
+    def record_instruction(self, ip, inst_opcode, operand_buffer):
+        '''
+        Record instruction about to be executed
+        '''
+        self._instruction_struct.pack_into(
+            self._buffer, self._offset,
+            RECORD_INSTRUCTION, self.clock.cycle_count, ip, inst_opcode, bytes(operand_buffer[:OPERAND_BUFFER_SIZE]),
+        )
+        self._next_record()
+
+    def record_registers(self):
+        '''
+        Record registers changed since the last call
+        '''
+        registers = self.registers.get_word_registers()
+        if registers == self._last_registers:
+            return
+        for register_name, value in registers.items():
+            if self._last_registers.get(register_name) != value:
+                self._register_struct.pack_into(
+                    self._buffer, self._offset,
+                    RECORD_REGISTER, self._register_codes[register_name], value,
+                )
+                self._next_record()
+        self._last_registers = registers
+
+    def record_memory_write(self, pos, length, value):
+        '''
+        Record memory write of byte (length=1) or word (length=2)
+        '''
+        self._memory_write_struct.pack_into(
+            self._buffer, self._offset,
+            RECORD_MEMORY_WRITE, pos, length, value,
+        )
+        self._next_record()
+
+    def record_interrupt(self, interrupt_number):
+        '''
+        Record hardware interrupt about to be called
+        '''
+        self._interrupt_struct.pack_into(
+            self._buffer, self._offset,
+            RECORD_INTERRUPT, self.clock.cycle_count, interrupt_number,
+        )
+        self._next_record()
+
+    def _next_record(self):
+        self.record_count += 1
+        self._offset += RECORD_SIZE
+        if self._offset == len(self._buffer):
+            self._flush()
+
+    def _flush(self):
+        self._trace_file.write(memoryview(self._buffer)[:self._offset])
+        self._offset = 0
+
+
+def read_trace(filename, block_size=0x1000):
+    '''
+    Read trace file, yield records as tuples: (record type, field, ...)
+    '''
+    with open(filename, 'rb') as trace_file:
+        try:
+            signature, version, record_size = TRACE_HEADER.unpack(trace_file.read(TRACE_HEADER.size))
+        except struct.error:
+            raise CorruptTraceError('Header not valid')
+        if signature != TRACE_SIGNATURE:
+            raise CorruptTraceError('Signature not valid')
+        if version != TRACE_VERSION or record_size != RECORD_SIZE:
+            raise CorruptTraceError('Version not supported: {}'.format(version))
+        while True:
+            block = trace_file.read(RECORD_SIZE * block_size)
+            if not block:
+                break
+            if len(block) % RECORD_SIZE:
+                raise CorruptTraceError('Truncated record')
+            for offset in range(0, len(block), RECORD_SIZE):
+                try:
+                    record_struct = RECORD_STRUCTS[block[offset]]
+                except KeyError:
+                    raise CorruptTraceError('Unknown record type: {}'.format(block[offset]))
+                yield record_struct.unpack_from(block, offset)
+
+
+def format_trace(records, instruction_set):
+    '''
+    Yield trace records rendered as lines: one line for every instruction or interrupt with its changes
+
+    Example: `    1234 0010  MOV AX [BP+02]  | AX=1234 [FFE0]=00FF`
+    '''
+    instruction_opcode_mapping = {
+        opcode: inst
+        for opcode, inst in instruction_set
+    }
+    line = None
+    changes = []
+    for record in records:
+        record_type = record[0]
+        if record_type in {RECORD_INSTRUCTION, RECORD_INTERRUPT}:
+            if line is not None or changes:
+                yield _format_line(line, changes)
+            changes = []
+            if record_type == RECORD_INSTRUCTION:
+                line = _format_instruction(record, instruction_opcode_mapping)
+            else:
+                _, cycle, interrupt_number = record
+                line = '{:>8} INT  {}'.format(cycle, utils.byte_to_str(interrupt_number))
+        elif record_type == RECORD_REGISTER:
+            _, register_code, value = record
+            changes.append('{}={}'.format(WORD_REGISTERS[register_code], utils.word_to_str(value)))
+        else:
+            _, pos, length, value = record
+            changes.append('[{}]={}'.format(
+                utils.word_to_str(pos),
+                utils.byte_to_str(value) if length == 1 else utils.word_to_str(value),
+            ))
+    if line is not None or changes:
+        yield _format_line(line, changes)
+
+
+def _format_instruction(record, instruction_opcode_mapping):
+    _, cycle, ip, inst_opcode, operand_buffer = record
+    try:
+        inst = instruction_opcode_mapping[inst_opcode]
+    except KeyError:
+        instruction = '?? {}'.format(utils.byte_to_str(inst_opcode))
+    else:
+        try:
+            operands, _, _ = parse_operand_buffer(operand_buffer, inst.operand_count)
+            instruction = ' '.join([inst.__name__] + [operand_to_str(operand) for operand in operands])
+        except AldebaranError:
+            instruction = '{} ??'.format(inst.__name__)
+    return '{:>8} {}  {}'.format(cycle, utils.word_to_str(ip), instruction)
+
+
+def _format_line(line, changes):
+    if line is None:
+        line = '{:>8}'.format('')
+    if not changes:
+        return line
+    return '{:<40} | {}'.format(line, ' '.join(changes))
+
+
+# pylint: disable=missing-docstring
+
+class TraceError(AldebaranError):
+    pass
+
+
+class CorruptTraceError(TraceError):
+    pass
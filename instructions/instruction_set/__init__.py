@@ -82,6 +82,8 @@ INSTRUCTION_SET = [
     # (0x57, data_transfer.POPA),
     (0x58, data_transfer.IN),
     (0x59, data_transfer.OUT),
+    (0x5A, data_transfer.DMAIN),
+    (0x5B, data_transfer.DMAOUT),
     # string
     # (0x60, ),
     # (0x61, ),
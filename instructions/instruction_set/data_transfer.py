@@ -101,3 +101,48 @@ class OUT(Instruction):
             utils.binary_to_str(output_data),
             cx,
         )
+
+
+# DMA
+
+class DMAIN(Instruction):
+    '''
+    Start DMA transfer of the next input data from IOPort <op0>B into the <op2>W bytes long buffer at address <op1>W
+
+    The CPU does not wait for the transfer. When it's done, the first word of the buffer is set to the length of the data,
+    the data itself is written after it, and interrupt <op3>B is called.
+    '''
+
+    operand_count = 4
+    oplens = ['BWWB']
+
+    def do(self):
+        ioport_number = self.get_operand(0)
+        self.cpu.dma_controller.start_input_transfer(
+            ioport_number,
+            pos=self.get_operand(1),
+            length=self.get_operand(2),
+            interrupt_number=self.get_operand(3),
+        )
+        self.cpu.cpu_log('DMA input from IOPort %s started.', ioport_number)
+
+
+class DMAOUT(Instruction):
+    '''
+    Start DMA transfer of <op2>W bytes from memory at address <op1>W to IOPort <op0>B
+
+    The CPU does not wait for the transfer. When it's done, interrupt <op3>B is called.
+    '''
+
+    operand_count = 4
+    oplens = ['BWWB']
+
+    def do(self):
+        ioport_number = self.get_operand(0)
+        self.cpu.dma_controller.start_output_transfer(
+            ioport_number,
+            pos=self.get_operand(1),
+            length=self.get_operand(2),
+            interrupt_number=self.get_operand(3),
+        )
+        self.cpu.cpu_log('DMA output to IOPort %s started.', ioport_number)
@@ -2,7 +2,11 @@
 Jump instructions
 '''
 
+from collections import namedtuple
+import operator
+
 from instructions.instructions import Instruction
+from instructions.operands import OpType, get_operand_value, to_signed
 
 
 class JMP(Instruction):
@@ -15,111 +19,165 @@ class JMP(Instruction):
         return self.get_operand(0)
 
 
-class JE(Instruction):
-    '''Jump to <op2> if <op0> = <op1>'''
+# decoded forms of conditional jumps by (instruction class, IP, operand buffer)
+_decoded_jumps = {}
+MAX_DECODED_JUMPS = 4096
+
+
+class ConditionalJump(Instruction):
+    '''
+    Base class for conditional jumps: jump to <op2> if `compare(<op0>, <op1>)` is true
+
+    The operands are decoded once per (IP, operand buffer) into a DecodedJump:
+    the comparison is precompiled for the operand types (literals are read and converted at decode time,
+    registers are read directly) and an ADDRESS target is resolved to an absolute address.
+    The target is only evaluated when the jump is taken.
+    '''
 
     operand_count = 3
     oplens = ['BBW', 'WWW']
+    compare = None  # function(op0, op1) -> bool
+    signed = False
+
+    def __init__(self, cpu, operand_buffer):  # pylint: disable=super-init-not-called
+        self.cpu = cpu
+        self.ip = self.cpu.ip
+        key = (self.__class__, self.ip, tuple(operand_buffer))
+        try:
+            decoded_jump = _decoded_jumps[key]
+        except KeyError:
+            decoded_jump = _decode_jump(self, operand_buffer)
+            if len(_decoded_jumps) >= MAX_DECODED_JUMPS:
+                _decoded_jumps.clear()
+            _decoded_jumps[key] = decoded_jump
+        self.operands = decoded_jump.operands
+        self.operand_buffer_indices = decoded_jump.operand_buffer_indices
+        self.opcode_length = decoded_jump.opcode_length
+        self._decoded_jump = decoded_jump
 
     def do(self):
-        if self.get_operand(0) == self.get_operand(1):
-            return self.get_operand(2)
+        if self._decoded_jump.condition(self.cpu):
+            target = self._decoded_jump.target
+            if target is None:
+                return self.get_operand(2)
+            return target
+
+
+DecodedJump = namedtuple('DecodedJump', [
+    'operands',  # list of Operand
+    'operand_buffer_indices',  # list of integer
+    'opcode_length',  # integer
+    'condition',  # function(cpu) -> bool
+    'target',  # integer (resolved ADDRESS operand) | None (evaluated when taken)
+])
+
+
+def _decode_jump(instruction, operand_buffer):
+    Instruction.__init__(instruction, instruction.cpu, operand_buffer)
+    compare = instruction.__class__.compare
+    read_left = _compile_operand_reader(instruction.operands[0], instruction.ip, instruction.signed)
+    read_right = _compile_operand_reader(instruction.operands[1], instruction.ip, instruction.signed)
+    if not callable(read_left) and not callable(read_right):
+        result = compare(read_left, read_right)
+        condition = lambda cpu: result
+    elif not callable(read_right):
+        condition = lambda cpu: compare(read_left(cpu), read_right)
+    elif not callable(read_left):
+        condition = lambda cpu: compare(read_left, read_right(cpu))
+    else:
+        condition = lambda cpu: compare(read_left(cpu), read_right(cpu))
+    target_operand = instruction.operands[2]
+    if target_operand.optype == OpType.ADDRESS:
+        target = instruction.ip + target_operand.opvalue
+    else:
+        target = None
+    return DecodedJump(
+        instruction.operands,
+        instruction.operand_buffer_indices,
+        instruction.opcode_length,
+        condition,
+        target,
+    )
+
+
+def _compile_operand_reader(operand, ip, signed):
+    '''
+    Return value of a literal operand, or function(cpu) returning the value of other operands
+    '''
+    if operand.optype == OpType.VALUE:
+        if signed:
+            return to_signed(operand.opvalue, operand.oplen)
+        return operand.opvalue
+    if operand.optype == OpType.REGISTER:
+        opreg = operand.opreg
+        if signed:
+            oplen = operand.oplen
+            return lambda cpu: to_signed(cpu.registers.get_register(opreg), oplen)
+        return lambda cpu: cpu.registers.get_register(opreg)
+    if signed:
+        return lambda cpu: to_signed(get_operand_value(operand, cpu, cpu.memory, ip), operand.oplen)
+    return lambda cpu: get_operand_value(operand, cpu, cpu.memory, ip)
+
+
+class JE(ConditionalJump):
+    '''Jump to <op2> if <op0> = <op1>'''
 
+    compare = operator.eq
 
-class JNE(Instruction):
-    '''Jump to <op2> if <op0> != <op1>'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
+class JNE(ConditionalJump):
+    '''Jump to <op2> if <op0> != <op1>'''
 
-    def do(self):
-        if self.get_operand(0) != self.get_operand(1):
-            return self.get_operand(2)
+    compare = operator.ne
 
 
-class JG(Instruction):
+class JG(ConditionalJump):
     '''Jump to <op2> if <op0> > <op1> (signed)'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
-
-    def do(self):
-        if self.get_signed_operand(0) > self.get_signed_operand(1):
-            return self.get_operand(2)
+    compare = operator.gt
+    signed = True
 
 
-class JGE(Instruction):
+class JGE(ConditionalJump):
     '''Jump to <op2> if <op0> >= <op1> (signed)'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
-
-    def do(self):
-        if self.get_signed_operand(0) >= self.get_signed_operand(1):
-            return self.get_operand(2)
+    compare = operator.ge
+    signed = True
 
 
-class JL(Instruction):
+class JL(ConditionalJump):
     '''Jump to <op2> if <op0> < <op1> (signed)'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
+    compare = operator.lt
+    signed = True
 
-    def do(self):
-        if self.get_signed_operand(0) < self.get_signed_operand(1):
-            return self.get_operand(2)
 
-
-class JLE(Instruction):
+class JLE(ConditionalJump):
     '''Jump to <op2> if <op0> <= <op1> (signed)'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
-
-    def do(self):
-        if self.get_signed_operand(0) <= self.get_signed_operand(1):
-            return self.get_operand(2)
+    compare = operator.le
+    signed = True
 
 
-class JA(Instruction):
+class JA(ConditionalJump):
     '''Jump to <op2> if <op0> > <op1> (unsigned)'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
-
-    def do(self):
-        if self.get_operand(0) > self.get_operand(1):
-            return self.get_operand(2)
+    compare = operator.gt
 
 
-class JAE(Instruction):
+class JAE(ConditionalJump):
     '''Jump to <op2> if <op0> >= <op1> (unsigned)'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
-
-    def do(self):
-        if self.get_operand(0) >= self.get_operand(1):
-            return self.get_operand(2)
+    compare = operator.ge
 
 
-class JB(Instruction):
+class JB(ConditionalJump):
     '''Jump to <op2> if <op0> < <op1> (unsigned)'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
-
-    def do(self):
-        if self.get_operand(0) < self.get_operand(1):
-            return self.get_operand(2)
+    compare = operator.lt
 
 
-class JBE(Instruction):
+class JBE(ConditionalJump):
     '''Jump to <op2> if <op0> <= <op1> (unsigned)'''
 
-    operand_count = 3
-    oplens = ['BBW', 'WWW']
-
-    def do(self):
-        if self.get_operand(0) <= self.get_operand(1):
-            return self.get_operand(2)
+    compare = operator.le
@@ -5,7 +5,7 @@ Base class for instructions
 import logging
 
 from utils import utils
-from .operands import parse_operand_buffer, get_operand_value, set_operand_value, OpLen
+from .operands import parse_operand_buffer, get_operand_value, set_operand_value, to_signed, from_signed
 
 
 logger = logging.getLogger('hardware.cpu')
@@ -71,20 +71,11 @@ class Instruction:
         Return value of operand as signed number
         '''
         operand = self.operands[opnum]
-        raw_value = get_operand_value(operand, self.cpu, self.cpu.memory, self.ip)
-        if operand.oplen == OpLen.BYTE:
-            binary_value = utils.byte_to_binary(raw_value)
-        else:
-            binary_value = utils.word_to_binary(raw_value)
-        return utils.binary_to_number(binary_value, signed=True)
+        return to_signed(get_operand_value(operand, self.cpu, self.cpu.memory, self.ip), operand.oplen)
 
     def set_signed_operand(self, opnum, value):
         '''
         Set value of operand as signed number
         '''
         operand = self.operands[opnum]
-        if operand.oplen == OpLen.BYTE:
-            binary_value = utils.byte_to_binary(value, signed=True)
-        else:
-            binary_value = utils.word_to_binary(value, signed=True)
-        set_operand_value(operand, utils.binary_to_number(binary_value), self.cpu, self.cpu.memory, self.ip)
+        set_operand_value(operand, from_signed(value, operand.oplen), self.cpu, self.cpu.memory, self.ip)
@@ -69,6 +69,13 @@ class OpType(Enum):
     EXTENDED = 7
 
 
+# by OpLen: max unsigned value, sign bit, error if out of range
+SIGN_CONVERSIONS = {
+    OpLen.BYTE: (0xFF, 0x80, utils.ByteOutOfRangeError),
+    OpLen.WORD: (0xFFFF, 0x8000, utils.WordOutOfRangeError),
+}
+
+
 WORD_REGISTERS = ['AX', 'BX', 'CX', 'DX', 'BP', 'SP', 'SI', 'DI']
 BYTE_REGISTERS = ['AL', 'AH', 'BL', 'BH', 'CL', 'CH', 'DL', 'DH']
 
@@ -274,6 +281,28 @@ def operand_to_str(operand):
     )
 
 
+def to_signed(value, oplen):
+    '''
+    Convert unsigned byte or word (by `oplen`) to signed number
+    '''
+    max_value, sign_bit, out_of_range_error = SIGN_CONVERSIONS[oplen]
+    if value < 0 or value > max_value:
+        raise out_of_range_error(hex(value))
+    if value & sign_bit:
+        return value - max_value - 1
+    return value
+
+
+def from_signed(value, oplen):
+    '''
+    Convert signed number to unsigned byte or word (by `oplen`)
+    '''
+    max_value, sign_bit, out_of_range_error = SIGN_CONVERSIONS[oplen]
+    if value < -sign_bit or value >= sign_bit:
+        raise out_of_range_error(hex(value))
+    return value & max_value
+
+
 def get_operand_value(operand, cpu, memory, ip):
     '''
     Get operand value (as unsigned) when executing an instruction
@@ -6,17 +6,20 @@ Usage: python run_aldebaran.py <file>
 
 import argparse
 import logging
+import os
 import sys
 
 from hardware import (
     Aldebaran,
     Clock,
-    Registers, Stack, CPU,
+    Registers, FastStack, CPU,
     Memory, RAM, VirtualRAM,
     InterruptController,
     IOPort, DeviceController,
     Timer,
-    Debugger,
+    DMAController,
+    TraceRecorder,
+    InstructionFuser,
 )
 from instructions.instruction_set import INSTRUCTION_SET
 from utils import config
@@ -53,7 +56,24 @@ def main():
         action='store_true',
         help='Debugger'
     )
+    parser.add_argument(
+        '-r', '--record',
+        action='store_true',
+        help='Record checkpoints and inputs in debug mode, so the debugger can go back in time'
+    )
+    parser.add_argument(
+        '-t', '--trace',
+        metavar='TRACE_FILE',
+        help='Record execution trace to file (read it with run_trace_reader.py)'
+    )
+    parser.add_argument(
+        '-f', '--fuse',
+        action='store_true',
+        help='Run frequent adjacent instruction pairs as superinstructions in one cycle'
+    )
     args = parser.parse_args()
+    if args.fuse and (args.debug or args.record):
+        parser.error('argument -f/--fuse: not allowed with arguments -d/--debug and -r/--record')
     _set_logging(args.verbose)
 
     try:
@@ -64,13 +84,30 @@ def main():
         ]
         clock_freq = args.clock
         if args.debug:
-            debugger = Debugger(config.debugger_host, config.debugger_port)
+            from hardware.debugger import Debugger  # imported only if it's used (with its HTTP server)
+            listing_filename = boot_file + '.lst'
+            if not os.path.exists(listing_filename):
+                listing_filename = None  # breakpoints only by address
+            debugger = Debugger(config.debugger_host, config.debugger_port, listing_filename)
         else:
             debugger = None
+        if args.debug and args.record:
+            from hardware.debugger import TimeTravel
+            time_travel = TimeTravel(config.checkpoint_interval, config.checkpoint_max_size, config.debugger_page_size)
+        else:
+            time_travel = None
+        if args.trace:
+            trace_recorder = TraceRecorder(args.trace, config.trace_block_size)
+        else:
+            trace_recorder = None
+        if args.fuse:
+            instruction_fuser = InstructionFuser(config.superinstruction_threshold)
+        else:
+            instruction_fuser = None
         aldebaran = Aldebaran({
             'clock': Clock(clock_freq),
             'registers': Registers(config.system_addresses['bottom_of_stack']),
-            'stack': Stack(config.system_addresses['bottom_of_stack']),
+            'stack': FastStack(config.system_addresses['bottom_of_stack']),
             'cpu': CPU(config.system_addresses, INSTRUCTION_SET, config.operand_buffer_size, config.cpu_halt_freq),
             'memory': Memory(config.ram_size),
             'ram': RAM(config.ram_size),
@@ -87,7 +124,11 @@ def main():
                 ioports,
             ),
             'timer': Timer(config.timer_freq, config.number_of_subtimers),
+            'dma_controller': DMAController(config.dma_freq),
             'debugger': debugger,
+            'trace_recorder': trace_recorder,
+            'instruction_fuser': instruction_fuser,
+            'time_travel': time_travel,
         })
         aldebaran.boot(boot_file)
     except AldebaranError as ex:
@@ -115,6 +156,7 @@ def _set_logging(verbosity):
         'stk': 'EIIDDD',  # push/pop from -vvv
         'ram': 'EIIDDD',  # read/write from -vvv
         'tim': 'EIIIDD',  # timer beats from -vvvv
+        'dma': 'EIDDDD',
         'ict': 'EIDDDD',
         'dct': 'EIDDDD',
     }
@@ -181,6 +223,21 @@ def _set_logging(verbosity):
             'level': levels['tim'][verbosity],
             'color': '0;33',
         },
+        'hardware.dma_controller': {
+            'name': 'DMACont',
+            'level': levels['dma'][verbosity],
+            'color': '0;36',
+        },
+        'hardware.debugger.time_travel': {
+            'name': 'TimeTravel',
+            'level': levels['ald'][verbosity],
+            'color': '0;31',
+        },
+        'hardware.trace_recorder': {
+            'name': 'Trace',
+            'level': levels['ald'][verbosity],
+            'color': '0;31',
+        },
         'hardware.interrupt_controller': {
             'name': 'IntCont',
             'level': levels['ict'][verbosity],
@@ -1,17 +1,20 @@
 '''
-Assemble one or more source code files to executable files
+Assemble one or more source code files (or every .ald file in directories) to executable files
 
-Usage: python run_assembler.py <file>+
+Usage: python run_assembler.py [-j <jobs>] [-O] [-l] [-f (1 | 2)] [-z] [--cache-dir <dir> | --no-cache] (<file> | <dir>)+
 '''
 
 import argparse
 import logging
+import sys
+import time
 
-from assembler.assembler import Assembler
+from assembler import batch
+from assembler.build_cache import BuildCache
 from instructions.instruction_set import INSTRUCTION_SET
 from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+from utils import config
 from utils import utils
-from utils.errors import AldebaranError
 
 
 logger = logging.getLogger(__name__)
@@ -25,7 +28,45 @@ def main():
     parser.add_argument(
         'file',
         nargs='+',
-        help='ALD source code file'
+        help='ALD source code file or directory'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='Number of worker processes (default: 1)'
+    )
+    parser.add_argument(
+        '-O', '--optimize',
+        action='store_true',
+        help='Run peephole optimizer'
+    )
+    parser.add_argument(
+        '-l', '--listing',
+        action='store_true',
+        help='Write listing file next to executable file'
+    )
+    parser.add_argument(
+        '-f', '--format',
+        type=int,
+        choices=[1, 2],
+        default=1,
+        help='Executable format version; 2 stores code, data and zero-filled sections (default: 1)'
+    )
+    parser.add_argument(
+        '-z', '--compress',
+        action='store_true',
+        help='Compress sections of executable (format version 2 only)'
+    )
+    parser.add_argument(
+        '--cache-dir',
+        default=config.build_cache_dir,
+        help='Build cache directory (default: {})'.format(config.build_cache_dir)
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not use build cache'
     )
     parser.add_argument(
         '-v', '--verbose',
@@ -34,19 +75,43 @@ def main():
         help='Verbosity'
     )
     args = parser.parse_args()
+    if args.compress and args.format != 2:
+        parser.error('--compress requires --format 2')
     _set_logging(args.verbose)
-    try:
-        assembler = Assembler(
-            instruction_set=INSTRUCTION_SET,
-            registers={
-                'byte': BYTE_REGISTERS,
-                'word': WORD_REGISTERS,
-            },
-        )
-        for source_file in args.file:
-            assembler.assemble_file(source_file)
-    except AldebaranError as ex:
-        logger.error(ex)
+    if args.no_cache:
+        build_cache = None
+    else:
+        build_cache = BuildCache(args.cache_dir, config.build_cache_max_size)
+    start_time = time.perf_counter()
+    results = batch.assemble_files(
+        batch.find_source_files(args.file),
+        instruction_set=INSTRUCTION_SET,
+        registers={
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        },
+        jobs=args.jobs,
+        build_cache=build_cache,
+        optimize=args.optimize,
+        write_listing=args.listing,
+        executable_version=args.format,
+        compress=args.compress,
+    )
+    duration = time.perf_counter() - start_time
+    for result in results:
+        if result.error is None:
+            logger.info(
+                '%s: %d lines, %d bytes in %.3f s%s',
+                result.filename, result.lines, result.size, result.duration, ' (cached)' if result.cached else '',
+            )
+        else:
+            logger.error('%s: FAILED in %.3f s', result.filename, result.duration)
+            logger.error(result.error)
+    logger.info('Total: %s', batch.get_summary(results, duration))
+    if build_cache is not None:
+        logger.info('Build cache: %s', build_cache.get_summary())
+    if any(result.error is not None for result in results):
+        sys.exit(1)
 
 
 def _set_logging(verbosity):
@@ -69,6 +134,22 @@ def _set_logging(verbosity):
             'name': 'Assembler',
             'level': levels['asm'][verbosity],
         },
+        'assembler.batch': {
+            'name': 'Assembler',
+            'level': levels['asm'][verbosity],
+        },
+        'assembler.optimizer': {
+            'name': 'Optimizer',
+            'level': levels['asm'][verbosity],
+        },
+        'assembler.linker': {
+            'name': 'Linker',
+            'level': levels['asm'][verbosity],
+        },
+        'assembler.build_cache': {
+            'name': 'BuildCache',
+            'level': levels['asm'][verbosity],
+        },
         'assembler.tokenizer': {
             'name': 'Tokenizer',
             'level': levels['tok'][verbosity],
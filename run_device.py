@@ -31,6 +31,22 @@ def main():
         type=int,
         help='IOPort number'
     )
+    parser.add_argument(
+        '--vm',
+        type=int,
+        metavar='VM_ID',
+        help='Connect to VM of a multi-VM host (run_host.py)'
+    )
+    parser.add_argument(
+        '-a', '--aldebaran-port',
+        type=int,
+        help='Port of Aldebaran (e.g. of a VM farm worker); default = {}'.format(config.aldebaran_base_port + config.device_controller_port)
+    )
+    parser.add_argument(
+        '-p', '--port',
+        type=int,
+        help='Port of device; default = device base port + IOPort number'
+    )
     parser.add_argument(
         '-v', '--verbose',
         action='count',
@@ -43,8 +59,14 @@ def main():
     ioport_number = args.ioport_number
     device_args = []  # TODO: ???
     module_name = 'devices.{device_name}.{device_name}'.format(device_name=device_name)
-    aldebaran_address = config.aldebaran_host, config.aldebaran_base_port + config.device_controller_port
-    device_address = config.device_host, config.device_base_port + ioport_number
+    if args.aldebaran_port is None:
+        aldebaran_address = config.aldebaran_host, config.aldebaran_base_port + config.device_controller_port
+    else:
+        aldebaran_address = config.aldebaran_host, args.aldebaran_port
+    if args.port is None:
+        device_address = config.device_host, config.device_base_port + ioport_number
+    else:
+        device_address = config.device_host, args.port
     try:
         device_module = importlib.import_module(module_name)
     except ImportError:
@@ -55,6 +77,7 @@ def main():
         device_descriptor=(device_module.DEVICE_TYPE, device_module.DEVICE_ID),
         aldebaran_address=aldebaran_address,
         device_address=device_address,
+        vm_id=args.vm,
     )
     device.start()
 
@@ -0,0 +1,122 @@
+'''
+Run a VM farm: worker processes hosting many VMs, controlled through a local control server
+
+Usage: python run_farm.py [<file> ...]
+'''
+
+import argparse
+import logging
+
+from hardware.farm import Supervisor
+from utils import config
+from utils import utils
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    '''
+    Entry point of script
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'files',
+        nargs='*',
+        metavar='file',
+        help='Aldebaran executable file to start at once'
+    )
+    parser.add_argument(
+        '-n', '--workers',
+        type=int,
+        default=config.farm_number_of_workers,
+        help='Number of worker processes; default = {} (number of CPUs)'.format(config.farm_number_of_workers)
+    )
+    parser.add_argument(
+        '-s', '--slice',
+        type=int,
+        default=config.host_slice_size,
+        help='Instructions per time slice; default = {}'.format(config.host_slice_size)
+    )
+    parser.add_argument(
+        '-p', '--port',
+        type=int,
+        default=config.farm_control_port,
+        help='Port of control server; default = {}'.format(config.farm_control_port)
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='count',
+        default=0,
+        help='Verbosity'
+    )
+    args = parser.parse_args()
+    _set_logging(args.verbose)
+
+    supervisor = Supervisor(
+        args.workers,
+        args.slice,
+        config.farm_control_host,
+        args.port,
+        config.aldebaran_host,
+        config.farm_device_base_port,
+    )
+    logger.info('Control server: http://%s:%d', config.farm_control_host, args.port)
+    supervisor.run(args.files)
+
+
+def _set_logging(verbosity):
+    levels = {
+        'frm': 'IIDDDD',
+        'hst': 'EIDDDD',
+        'ald': 'EEIDDD',
+        'usr': 'EIIDDD',
+        'cpu': 'EEEIDD',
+        'dct': 'EEEIDD',
+    }
+    if verbosity > 5:
+        verbosity = 5
+    utils.config_loggers({
+        '__main__': {
+            'name': 'Farm',
+            'level': levels['frm'][verbosity],
+            'color': '0;35',
+        },
+        'hardware.farm': {
+            'name': 'Farm',
+            'level': levels['frm'][verbosity],
+            'color': '0;35',
+        },
+        'hardware.host': {
+            'name': 'Host',
+            'level': levels['hst'][verbosity],
+            'color': '0;31',
+        },
+        'hardware.aldebaran': {
+            'name': 'Aldebaran',
+            'level': levels['ald'][verbosity],
+            'color': '0;31',
+        },
+        'hardware.cpu': {
+            'name': 'CPU',
+            'level': levels['cpu'][verbosity],
+            'color': '0;32',
+        },
+        'hardware.cpu-user': {
+            'name': '',
+            'level': levels['usr'][verbosity],
+            'color': '1;37',
+        },
+        'hardware.device_controller': {
+            'name': 'DevCont',
+            'level': levels['dct'][verbosity],
+        },
+        'hardware.device_controller-ioport': {
+            'name': '',
+            'level': levels['dct'][verbosity],
+        },
+    })
+
+
+if __name__ == '__main__':
+    main()
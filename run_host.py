@@ -0,0 +1,131 @@
+'''
+Run many executables as VMs in one process
+
+Usage: python run_host.py <file> [<file> ...]
+'''
+
+import argparse
+import logging
+import sys
+
+from hardware.host import Host, create_vm
+from utils import config
+from utils import utils
+from utils.errors import AldebaranError
+
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    '''
+    Entry point of script
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'files',
+        nargs='+',
+        metavar='file',
+        help='Aldebaran executable file'
+    )
+    parser.add_argument(
+        '-n', '--copies',
+        type=int,
+        default=1,
+        help='Number of VMs running each file; default = 1'
+    )
+    parser.add_argument(
+        '-w', '--weights',
+        type=int,
+        nargs='+',
+        metavar='WEIGHT',
+        help='Scheduling weight of the VMs of each file; default = 1 (round-robin)'
+    )
+    parser.add_argument(
+        '-s', '--slice',
+        type=int,
+        default=config.host_slice_size,
+        help='Instructions per time slice; default = {}'.format(config.host_slice_size)
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='count',
+        default=0,
+        help='Verbosity'
+    )
+    args = parser.parse_args()
+    _set_logging(args.verbose)
+    weights = args.weights or [1] * len(args.files)
+    if len(weights) != len(args.files):
+        logger.error('Number of weights must match number of files.')
+        return
+
+    host = Host(config.aldebaran_host, config.aldebaran_base_port + config.device_controller_port, args.slice)
+    try:
+        vm_id = 0
+        for boot_file, weight in zip(args.files, weights):
+            for _ in range(args.copies):
+                aldebaran = create_vm()
+                aldebaran.boot(boot_file)
+                host.add_vm(vm_id, aldebaran, weight)
+                logger.info('VM %d: %s (weight %d)', vm_id, boot_file, weight)
+                vm_id += 1
+    except AldebaranError as ex:
+        logger.error(ex)
+        return
+    except (KeyboardInterrupt, SystemExit):
+        return
+
+    host.run()
+
+
+def _set_logging(verbosity):
+    levels = {
+        'hst': 'IIDDDD',
+        'ald': 'EIDDDD',
+        'usr': 'IIDDDD',
+        'cpu': 'EEIDDD',
+        'dct': 'EEIDDD',
+    }
+    if verbosity > 5:
+        verbosity = 5
+    utils.config_loggers({
+        '__main__': {
+            'name': 'Host',
+            'level': levels['hst'][verbosity],
+            'color': '0;31',
+        },
+        'hardware.host': {
+            'name': 'Host',
+            'level': levels['hst'][verbosity],
+            'color': '0;31',
+        },
+        'hardware.aldebaran': {
+            'name': 'Aldebaran',
+            'level': levels['ald'][verbosity],
+            'color': '0;31',
+        },
+        'hardware.cpu': {
+            'name': 'CPU',
+            'level': levels['cpu'][verbosity],
+            'color': '0;32',
+        },
+        'hardware.cpu-user': {
+            'name': '',
+            'level': levels['usr'][verbosity],
+            'color': '1;37',
+            'stream': sys.stdout,
+        },
+        'hardware.device_controller': {
+            'name': 'DevCont',
+            'level': levels['dct'][verbosity],
+        },
+        'hardware.device_controller-ioport': {
+            'name': '',
+            'level': levels['dct'][verbosity],
+        },
+    })
+
+
+if __name__ == '__main__':
+    main()
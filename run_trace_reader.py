@@ -0,0 +1,43 @@
+'''
+Print execution trace recorded by run_aldebaran.py -t
+
+Usage: python run_trace_reader.py [-n <max lines>] <trace file>
+'''
+
+import argparse
+import itertools
+import sys
+
+from hardware.trace_recorder import read_trace, format_trace, TraceError
+from instructions.instruction_set import INSTRUCTION_SET
+
+
+def main():
+    '''
+    Entry point of script
+    '''
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        'file',
+        help='Trace file'
+    )
+    parser.add_argument(
+        '-n', '--lines',
+        type=int,
+        default=None,
+        help='Maximum number of lines to print'
+    )
+    args = parser.parse_args()
+    lines = format_trace(read_trace(args.file), INSTRUCTION_SET)
+    try:
+        for line in itertools.islice(lines, args.lines):
+            print(line)
+    except TraceError as ex:
+        print('{}: {}'.format(ex.__class__.__name__, ex), file=sys.stderr)
+        sys.exit(1)
+    except BrokenPipeError:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,9 @@
 import logging
 import unittest
 
-from assembler.assembler import Assembler, AssemblerError, Scope, ScopeError
+from assembler.assembler import Assembler, AssemblerError, Scope, ScopeError, get_labels_from_listing
 from assembler.macros import MacroError, VariableError
+from assembler.object_file import ExternalReference
 from assembler.tokenizer import Token, TokenType, Reference
 from instructions import instruction_set
 from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS, get_operand_opcode
@@ -67,6 +68,12 @@ class TestAssembler(unittest.TestCase):
         expected_opcode += [0x9A]
         self.assertListEqual(opcode, expected_opcode)
 
+    def test_label_after_non_ascii_comment(self):
+        opcode = self.assembler.assemble_code('# Straße\nloop: JMP loop')
+        expected_opcode = [0x56]
+        expected_opcode += get_operand_opcode(Token(TokenType.ADDRESS_WORD_LITERAL, 0, None))
+        self.assertListEqual(opcode, expected_opcode)
+
     def test_label_error(self):
         with self.assertRaises(AssemblerError):
             self.assembler.assemble_code('''
@@ -76,6 +83,20 @@ class TestAssembler(unittest.TestCase):
             SHUTDOWN
             ''')
 
+    def test_import_external_references(self):
+        self.assembler.assemble_code('''
+        .IMPORT 'lib.ald'
+        NOP
+        MOV AX [lib_data+0x02]
+        JMP lib_start
+        ''')
+        object_file = self.assembler.get_object()
+        self.assertListEqual(object_file.imports, ['lib.ald'])
+        self.assertListEqual(object_file.references, [
+            ExternalReference('lib_data', 1, 4),
+            ExternalReference('lib_start', 7, 9),
+        ])
+
     def test_macro_dat_and_datn(self):
         opcode = self.assembler.assemble_code('''
         MOV AX [stuff]
@@ -248,6 +269,133 @@ class TestAssembler(unittest.TestCase):
             .PARAM $p
             ''')
 
+    def test_data_ranges(self):
+        self.assembler.assemble_code('''
+        NOP
+        .DAT 0x01 0x0203
+        .DATN 0x02 0x00
+        SHUTDOWN
+        .DAT "ab"
+        ''')
+        self.assertListEqual(self.assembler.get_data_ranges(), [(1, 5), (7, 2)])
+
+    def test_macro_param_types_validated_per_type_combination(self):
+        self.assertListEqual(self.assembler.assemble_code('.DAT 0x01 0x0203'), [0x01, 0x02, 0x03])
+        self.assertListEqual(self.assembler.assemble_code('.DAT 0x04 0x0506'), [0x04, 0x05, 0x06])
+        with self.assertRaises(MacroError):
+            self.assembler.assemble_code('.DAT 0x01 AX')
+        with self.assertRaises(MacroError):
+            self.assembler.assemble_code('.DAT 0x01 AX')
+
+
+class TestIncrementalAssembler(unittest.TestCase):
+
+    def setUp(self):
+        self.instruction_set = [
+            (0x12, instruction_set.arithmetic.ADD),
+            (0x34, instruction_set.data_transfer.MOV),
+            (0x56, instruction_set.jump.JMP),
+            (0x78, instruction_set.misc.NOP),
+            (0x9A, instruction_set.misc.SHUTDOWN),
+            (0xBC, instruction_set.control_flow.ENTER),
+        ]
+        self.registers = {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        }
+        self.assembler = Assembler(self.instruction_set, self.registers, incremental=True)
+        logging.getLogger('assembler').setLevel(logging.CRITICAL)
+        self.source_code = '\n'.join([
+            'start:',
+            'MOV AX [data]',
+            'NOP',
+            'NOP',
+            'JMP start',
+            'SHUTDOWN',
+            'data: .DAT 0x1234',
+        ])
+
+    def test_same_opcode_as_full_assembly(self):
+        self.assembler.assemble_code(self.source_code)
+        edited_source_code = self.source_code.replace('NOP\nNOP', 'NOP\nADD AX AX 0x0001')
+        opcode = self.assembler.assemble_code(edited_source_code)
+        full_assembler = Assembler(self.instruction_set, self.registers)
+        self.assertListEqual(opcode, full_assembler.assemble_code(edited_source_code))
+
+    def test_unchanged_lines_not_reencoded(self):
+        self.assembler.assemble_code(self.source_code)
+        self.assembler.assemble_code(self.source_code)
+        self.assertEqual(self.assembler.cache_stats['tokenized_lines'], 0)
+        self.assertEqual(self.assembler.cache_stats['encoded_lines'], 0)
+
+    def test_only_affected_lines_reencoded(self):
+        self.assembler.assemble_code(self.source_code)
+        # the new instruction moves `data` relative to MOV and `start` relative to JMP
+        self.assembler.assemble_code(self.source_code.replace('NOP\nNOP', 'NOP\nADD AX AX 0x0001'))
+        self.assertEqual(self.assembler.cache_stats['tokenized_lines'], 1)
+        self.assertEqual(self.assembler.cache_stats['encoded_lines'], 3)
+
+    def test_variables_not_cached(self):
+        source_code = '\n'.join([
+            '.CONST $x 0x1234',
+            'MOV AX $x',
+        ])
+        self.assembler.assemble_code(source_code)
+        opcode = self.assembler.assemble_code(source_code.replace('0x1234', '0x5678'))
+        self.assertListEqual(opcode[-2:], [0x56, 0x78])
+
+    def test_cache_not_kept_without_incremental_mode(self):
+        assembler = Assembler(self.instruction_set, self.registers)
+        assembler.assemble_code(self.source_code)
+        assembler.assemble_code(self.source_code)
+        self.assertEqual(assembler.cache_stats['tokenized_lines'], 6)  # the two NOP lines are the same
+
+
+class TestLabelResolution(unittest.TestCase):
+
+    def setUp(self):
+        self.instruction_set = [
+            (0x56, instruction_set.jump.JMP),
+            (0x78, instruction_set.misc.NOP),
+        ]
+        self.registers = {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        }
+        self.assembler = Assembler(self.instruction_set, self.registers)
+        logging.getLogger('assembler').setLevel(logging.CRITICAL)
+
+    def test_one_pass_without_forward_references(self):
+        self.assembler.assemble_code('start:\nNOP\nJMP start')
+        self.assertEqual(self.assembler.pass_count, 1)
+
+    def test_two_passes_with_forward_references(self):
+        opcode = self.assembler.assemble_code('JMP end\nNOP\nend: NOP')
+        self.assertEqual(self.assembler.pass_count, 2)
+        self.assertListEqual(opcode, [0x56, 0x90, 0x00, 0x05, 0x78, 0x78])
+
+    def test_incremental_reassembly_in_one_pass(self):
+        assembler = Assembler(self.instruction_set, self.registers, incremental=True)
+        assembler.assemble_code('JMP end\nNOP\nend: NOP')
+        assembler.assemble_code('JMP end\nNOP\nend: NOP\nNOP')
+        self.assertEqual(assembler.pass_count, 1)
+
+    def test_labels_from_listing(self):
+        self.assembler.assemble_code('start:\nNOP\n  loop: next: JMP loop\nend:\n  NOP  # comment: NOP')
+        listing = self.assembler.get_listing()
+        self.assertDictEqual(get_labels_from_listing(listing), {
+            'start': 0,
+            'loop': 1,
+            'next': 1,
+            'end': 5,
+        })
+        self.assertDictEqual(get_labels_from_listing(listing + ['', '# module.ald @ 0100'] + listing), {
+            'start': 0,
+            'loop': 1,
+            'next': 1,
+            'end': 5,
+        })
+
 
 class TestScope(unittest.TestCase):
 
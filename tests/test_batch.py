@@ -0,0 +1,73 @@
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from assembler import batch
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.source_dir = tempfile.mkdtemp()
+        self.registers = {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        }
+        self._write_source_file('good.ald', 'start: NOP\nJMP start\n')
+        self._write_source_file('bad.ald', 'NOP\nJMP nowhere\n')
+        self._write_source_file('notes.txt', 'not source code')
+        logging.getLogger('assembler').setLevel(logging.CRITICAL)
+
+    def tearDown(self):
+        shutil.rmtree(self.source_dir)
+
+    def _write_source_file(self, filename, source_code):
+        with open(os.path.join(self.source_dir, filename), 'wt') as source_file:
+            source_file.write(source_code)
+
+    def test_find_source_files(self):
+        filenames = batch.find_source_files([self.source_dir, 'other.ald'])
+        self.assertListEqual(filenames, [
+            os.path.join(self.source_dir, 'bad.ald'),
+            os.path.join(self.source_dir, 'good.ald'),
+            'other.ald',
+        ])
+
+    def test_errors_collected_per_file(self):
+        results = batch.assemble_files(
+            batch.find_source_files([self.source_dir]),
+            INSTRUCTION_SET,
+            self.registers,
+        )
+        bad_result, good_result = results
+        self.assertIn('LabelError: Unknown label reference: nowhere', bad_result.error)
+        self.assertIn('line 2:', bad_result.error)
+        self.assertIsNone(good_result.error)
+        self.assertEqual(good_result.lines, 3)
+        self.assertTrue(os.path.isfile(os.path.join(self.source_dir, 'good')))
+        self.assertFalse(os.path.isfile(os.path.join(self.source_dir, 'bad')))
+
+    def test_process_pool_same_results(self):
+        filenames = batch.find_source_files([self.source_dir])
+        serial_results = batch.assemble_files(filenames, INSTRUCTION_SET, self.registers)
+        parallel_results = batch.assemble_files(filenames, INSTRUCTION_SET, self.registers, jobs=2)
+        self.assertListEqual(
+            [(result.filename, result.size, result.lines, result.error) for result in serial_results],
+            [(result.filename, result.size, result.lines, result.error) for result in parallel_results],
+        )
+
+    def test_undecodable_file(self):
+        with open(os.path.join(self.source_dir, 'latin1.ald'), 'wb') as source_file:
+            source_file.write(b'NOP ; \xe9\n')
+        results = batch.assemble_files(
+            batch.find_source_files([self.source_dir]),
+            INSTRUCTION_SET,
+            self.registers,
+        )
+        bad_result, good_result, latin1_result = results
+        self.assertIsNone(good_result.error)
+        self.assertTrue(latin1_result.error.startswith('UnicodeDecodeError: '))
@@ -1,7 +1,10 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 
 from utils import boot
+from utils import config
 from utils import executable
 
 
@@ -64,16 +67,10 @@ class TestBootLoader(unittest.TestCase):
         boot_loader = boot.BootLoader(self.ram)
         boot_loader.load_image(5, boot_image)
 
-        self.assertEqual(self.ram.write_byte.call_count, 8)
-        write_byte_calls = self.ram.write_byte.call_args_list
-        self.assertTupleEqual(write_byte_calls[0][0], (5, 0x01))
-        self.assertTupleEqual(write_byte_calls[1][0], (6, 0x23))
-        self.assertTupleEqual(write_byte_calls[2][0], (7, 0x45))
-        self.assertTupleEqual(write_byte_calls[3][0], (8, 0x67))
-        self.assertTupleEqual(write_byte_calls[4][0], (9, 0x89))
-        self.assertTupleEqual(write_byte_calls[5][0], (10, 0xAB))
-        self.assertTupleEqual(write_byte_calls[6][0], (11, 0xCD))
-        self.assertTupleEqual(write_byte_calls[7][0], (12, 0xEF))
+        self.assertEqual(self.ram.write_block.call_count, 1)
+        pos, data = self.ram.write_block.call_args[0]
+        self.assertEqual(pos, 5)
+        self.assertListEqual(list(data), [0x01, 0x23, 0x45, 0x67, 0x89, 0xAB, 0xCD, 0xEF])
 
     def test_load_executable(self):
         boot_exe = executable.Executable(
@@ -83,11 +80,65 @@ class TestBootLoader(unittest.TestCase):
         boot_loader = boot.BootLoader(self.ram)
         boot_loader.load_executable(5, boot_exe)
 
-        self.assertEqual(self.ram.write_byte.call_count, 3)
-        write_byte_calls = self.ram.write_byte.call_args_list
-        self.assertTupleEqual(write_byte_calls[0][0], (5, 0x12))
-        self.assertTupleEqual(write_byte_calls[1][0], (6, 0x34))
-        self.assertTupleEqual(write_byte_calls[2][0], (7, 0x56))
+        self.assertEqual(self.ram.write_block.call_count, 1)
+        pos, data = self.ram.write_block.call_args[0]
+        self.assertEqual(pos, 5)
+        self.assertListEqual(list(data), [0x12, 0x34, 0x56])
+
+    def test_load_executable_with_sections(self):
+        boot_exe = executable.Executable.from_sections(executable.create_sections(
+            [0x12, 0x34] + [0] * 20 + [0x56],
+        ), compress=True)
+        boot_loader = boot.BootLoader(self.ram)
+        boot_loader.load_executable(5, boot_exe)
+
+        write_block_calls = [
+            (pos, list(data))
+            for (pos, data), kwargs in self.ram.write_block.call_args_list
+        ]
+        self.assertListEqual(write_block_calls, [
+            (5, [0x12, 0x34]),
+            (7, [0] * 20),
+            (27, [0x56]),
+        ])
+
+
+class TestBootImageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        patcher = patch.multiple(config, boot_image_cache_dir=self.tmp_dir.name, _boot_image=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_get_boot_image(self):
+        boot_image = config.get_boot_image()
+        self.assertEqual(boot_image.content, bytes(config.create_boot_image().content))
+        self.assertIs(config.get_boot_image(), boot_image)
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 1)
+
+    def test_get_boot_image_from_disk(self):
+        content = config.get_boot_image().content
+        config._boot_image = None  # pylint: disable=protected-access
+        with patch('utils.config.create_boot_image') as mock_create_boot_image:
+            boot_image = config.get_boot_image()
+        mock_create_boot_image.assert_not_called()
+        self.assertEqual(boot_image.content, content)
+
+    def test_damaged_boot_image_on_disk(self):
+        content = config.get_boot_image().content
+        filename = os.path.join(self.tmp_dir.name, os.listdir(self.tmp_dir.name)[0])
+        with open(filename, 'r+b') as image_file:
+            image_file.seek(-1, os.SEEK_END)
+            image_file.write(b'\xff')
+        config._boot_image = None  # pylint: disable=protected-access
+        boot_image = config.get_boot_image()
+        self.assertEqual(boot_image.content, content)
+        config._boot_image = None  # pylint: disable=protected-access
+        with patch('utils.config.create_boot_image') as mock_create_boot_image:
+            config.get_boot_image()
+        mock_create_boot_image.assert_not_called()
 
 
 class MockFile:
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from assembler.build_cache import BuildCache, get_toolchain_hash
+from assembler.macros import MACRO_SET
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+
+
+class TestBuildCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.build_cache = BuildCache(self.cache_dir, max_size=100)
+        self.toolchain_hash = get_toolchain_hash(
+            INSTRUCTION_SET,
+            {'byte': BYTE_REGISTERS, 'word': WORD_REGISTERS},
+            MACRO_SET,
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_miss_then_hit(self):
+        key = self.build_cache.get_key('NOP', self.toolchain_hash)
+        self.assertIsNone(self.build_cache.get(key))
+        self.build_cache.put(key, b'\x01\x02', 'listing')
+        self.assertEqual(self.build_cache.get(key), (b'\x01\x02', 'listing'))
+        self.assertEqual(self.build_cache.stats['misses'], 1)
+        self.assertEqual(self.build_cache.stats['hits'], 1)
+        self.assertEqual(self.build_cache.stats['stores'], 1)
+
+    def test_key_depends_on_source_and_toolchain(self):
+        key = self.build_cache.get_key('NOP', self.toolchain_hash)
+        self.assertNotEqual(key, self.build_cache.get_key('NOP ', self.toolchain_hash))
+        other_toolchain_hash = get_toolchain_hash(
+            INSTRUCTION_SET[:-1],
+            {'byte': BYTE_REGISTERS, 'word': WORD_REGISTERS},
+            MACRO_SET,
+        )
+        self.assertNotEqual(key, self.build_cache.get_key('NOP', other_toolchain_hash))
+
+    def test_least_recently_used_evicted(self):
+        keys = [self.build_cache.get_key(str(idx), self.toolchain_hash) for idx in range(3)]
+        self.build_cache.put(keys[0], bytes(40), '')
+        os.utime(self.build_cache._get_entry_filename(keys[0]), (1, 1))
+        self.build_cache.put(keys[1], bytes(40), '')
+        os.utime(self.build_cache._get_entry_filename(keys[1]), (2, 2))
+        self.build_cache.get(keys[0])  # keys[1] is the least recently used now
+        self.build_cache.put(keys[2], bytes(40), '')
+        self.assertIsNotNone(self.build_cache.get(keys[0]))
+        self.assertIsNone(self.build_cache.get(keys[1]))
+        self.assertIsNotNone(self.build_cache.get(keys[2]))
+        self.assertEqual(self.build_cache.stats['evictions'], 1)
+        self.assertLessEqual(self.build_cache.get_size()[1], 100)
+
+    def test_corrupt_entry_is_miss(self):
+        key = self.build_cache.get_key('NOP', self.toolchain_hash)
+        with open(self.build_cache._get_entry_filename(key), 'wb') as entry_file:
+            entry_file.write(b'\x00\x00\x00\xFF\x01')
+        self.assertIsNone(self.build_cache.get(key))
+        self.assertEqual(self.build_cache.get_size(), (0, 0))
+
+    def test_undecodable_listing_is_miss(self):
+        key = self.build_cache.get_key('NOP', self.toolchain_hash)
+        with open(self.build_cache._get_entry_filename(key), 'wb') as entry_file:
+            entry_file.write(b'\x00\x00\x00\x01\x01\xFF\xFE')
+        self.assertIsNone(self.build_cache.get(key))
+        self.assertEqual(self.build_cache.stats['misses'], 1)
+        self.assertEqual(self.build_cache.get_size(), (0, 0))
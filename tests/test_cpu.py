@@ -63,12 +63,14 @@ class TestStack(unittest.TestCase):
         self.interrupt_controller = Mock()
         self.device_controller = Mock()
         self.timer = Mock()
+        self.dma_controller = Mock()
         self.debugger = None
         self.cpu.register_architecture(
             self.registers, self.stack, self.ram,
             self.interrupt_controller,
             self.device_controller,
             self.timer,
+            self.dma_controller,
             self.debugger,
         )
 
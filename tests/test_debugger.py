@@ -0,0 +1,325 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import patch, Mock
+
+from assembler.assembler import Assembler
+from hardware.clock import Clock
+from hardware.cpu import CPU, Registers, Stack
+from hardware.debugger import Debugger
+from hardware.memory import Memory, RAM, VirtualRAM
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+from utils import config
+
+
+SOURCE_CODE = '''
+    MOV AX 0x1234
+    MOV [0x0200] AX
+    PRINT AX
+    SHUTDOWN
+'''
+
+LOOP_SOURCE_CODE = '''
+    MOV AX 0x0000
+  LOOP:
+    INC AX 0x01
+    MOV [0x0200] AX
+    JNE AX 0x0064 LOOP
+  DONE:
+    SHUTDOWN
+'''
+
+
+class TestDebuggerStateChanges(unittest.TestCase):
+
+    def setUp(self):
+        opcode = Assembler(INSTRUCTION_SET, {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        }).assemble_code(SOURCE_CODE)
+        system_addresses = {
+            'entry_point': 0x0000,
+            'bottom_of_stack': 0x07FF,
+            'IVT': 0x0F00,
+        }
+        self.clock = Clock()
+        self.cpu = CPU(system_addresses, INSTRUCTION_SET, 16, 1000)
+        memory = Memory(0x0800)
+        ram = RAM(0x0800)
+        ram.write_block(0, opcode)
+        memory.register_architecture(ram, None)
+        self.debugger = Debugger('localhost', 0)
+        self.cpu.register_architecture(
+            Registers(system_addresses['bottom_of_stack']),
+            Stack(system_addresses['bottom_of_stack']),
+            memory,
+            None, None, None, None,
+            self.debugger,
+        )
+        self.debugger.register_architecture(self.cpu, self.clock, memory, None)
+
+    def tearDown(self):
+        self.debugger._server.server_close()
+
+    def _step(self):
+        self.clock.cycle_count += 1
+        self.cpu.step()
+
+    def _get(self, since, wait=0):
+        status, changes = self.debugger._handle_get('/api/state?since={}&wait={}'.format(since, wait))
+        self.assertEqual(status.value, 200)
+        return changes
+
+    def test_changes_since_seq(self):
+        changes = self._get(0)
+        self.assertEqual(changes['seq'], 1)
+        self.assertEqual(set(changes['registers']), set(WORD_REGISTERS) | {'IP'})
+        self.assertEqual(len(changes['pages']), 0x0800 // config.debugger_page_size)
+        self.assertIn('cpu', changes)
+        self.assertIn('stack', changes)
+
+        self.assertEqual(self._get(1), {
+            'seq': 1,
+            'registers': {},
+            'user_log': [],
+            'user_log_truncated': False,
+            'pages': {},
+        })
+
+        self._step()
+        changes = self._get(1)
+        self.assertEqual(changes['seq'], 2)
+        self.assertEqual(changes['registers'], {'AX': '1234', 'IP': '0005'})
+        self.assertEqual(changes['pages'], {})
+        self.assertEqual(changes['clock'], {'cycle_count': 1})
+        self.assertNotIn('stack', changes)
+
+        self._step()
+        changes = self._get(2)
+        self.assertEqual(list(changes['pages']), ['0200'])
+        self.assertEqual(changes['pages']['0200'][2 * 0x05:2 * 0x07], '1234')  # relative to IP=0005
+
+        self._step()
+        changes = self._get(3)
+        self.assertEqual(changes['user_log'], ['1234'])
+        self.assertEqual(self._get(0)['user_log'], ['1234'])
+
+    def test_user_log_truncated(self):
+        with patch.object(self.debugger, '_user_log', self.debugger._user_log.__class__(maxlen=2)):
+            for message in ['a', 'b', 'c']:
+                self.debugger.user_log(message)
+            changes = self._get(0)
+            self.assertEqual(changes['user_log'], ['b', 'c'])
+            self.assertTrue(changes['user_log_truncated'])
+            self.assertFalse(self._get(changes['seq'])['user_log_truncated'])
+
+    def test_long_polling(self):
+        seq = self._get(0)['seq']
+        timer = threading.Timer(0.1, lambda: self.debugger.user_log('hello'))
+        timer.start()
+        changes = self._get(seq, wait=5)
+        timer.join()
+        self.assertEqual(changes['user_log'], ['hello'])
+        self.assertEqual(self._get(changes['seq'], wait=0.05)['seq'], changes['seq'])
+
+
+class TestDebuggerBreaks(unittest.TestCase):
+
+    def setUp(self):
+        assembler = Assembler(INSTRUCTION_SET, {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        })
+        opcode = assembler.assemble_code(LOOP_SOURCE_CODE)
+        system_addresses = {
+            'entry_point': 0x0000,
+            'bottom_of_stack': 0x07FF,
+            'IVT': 0x0F00,
+        }
+        self.clock = Clock()
+        self.cpu = CPU(system_addresses, INSTRUCTION_SET, 16, 1000)
+        self.memory = Memory(0x0800)
+        ram = RAM(0x0800)
+        ram.write_block(0, opcode)
+        self.memory.register_architecture(ram, None)
+        with tempfile.NamedTemporaryFile('w', suffix='.lst', delete=False) as listing_file:
+            listing_file.write('\n'.join(assembler.get_listing()))
+        self.addCleanup(os.remove, listing_file.name)
+        self.debugger = Debugger('localhost', 0, listing_file.name)
+        timer = Mock()
+        timer.is_alive.return_value = True
+        self.cpu.register_architecture(
+            Registers(system_addresses['bottom_of_stack']),
+            Stack(system_addresses['bottom_of_stack']),
+            self.memory,
+            None, None, timer, timer,
+            self.debugger,
+        )
+        self.debugger.register_architecture(self.cpu, self.clock, self.memory, None)
+        self.clock.register_architecture(self.cpu)
+
+    def tearDown(self):
+        self.debugger._server.server_close()
+
+    def _post(self, path, data):
+        body = json.dumps(data).encode('utf-8')
+        return self.debugger._handle_post(path, {'Content-Length': len(body)}, io.BytesIO(body))
+
+    def test_breakpoint_by_label(self):
+        status, response = self._post('/api/breakpoints', {'label': 'DONE'})
+        self.assertEqual(status.value, 200)
+        self.assertEqual(response['breakpoints'], [{'address': '0016', 'label': 'DONE'}])
+        self.clock._run_until_break()
+        self.assertEqual(self.cpu.ip, 0x0016)
+        self.assertEqual(self.cpu.registers.get_register('AX'), 100)
+        self.assertFalse(self.debugger.running)
+        self.assertEqual(self.debugger.break_reason, {'reason': 'breakpoint', 'address': '0016'})
+        self.assertFalse(self.cpu.shutdown)
+
+        self._post('/api/breakpoints', {'label': 'DONE', 'remove': True})
+        self.clock._run_until_break()
+        self.assertEqual(self.debugger.break_reason, {'reason': 'shutdown'})
+        self.assertTrue(self.cpu.shutdown)
+
+    def test_breakpoint_by_address(self):
+        self._post('/api/breakpoints', {'address': '0005'})  # LOOP
+        self.clock._run_until_break()
+        self.assertEqual(self.cpu.registers.get_register('AX'), 0)
+        self.clock._run_until_break()
+        self.assertEqual(self.cpu.registers.get_register('AX'), 1)
+        self.assertEqual(self.debugger._get_cpu_state()[0]['break'], self.debugger.break_reason)
+
+    def test_watchpoint(self):
+        status, response = self._post('/api/watchpoints', {'first_address': '0209', 'last_address': '020A'})
+        self.assertEqual(status.value, 200)
+        self.assertEqual(len(response['watchpoints']), 1)
+        self.assertIsNotNone(self.memory.watchpoints)
+        self.clock._run_until_break()
+        self.assertEqual(self.debugger.break_reason['reason'], 'watchpoint')
+        self.assertEqual(self.debugger.break_reason['value'], '0001')
+        self.clock._run_until_break()
+        self.assertEqual(self.debugger.break_reason['value'], '0002')
+
+        self._post('/api/watchpoints', {'first_address': '0209', 'last_address': '020A', 'remove': True})
+        self.assertIsNone(self.memory.watchpoints)
+        self.clock._run_until_break()
+        self.assertEqual(self.debugger.break_reason, {'reason': 'shutdown'})
+
+    def test_invalid(self):
+        status, response = self._post('/api/breakpoints', {'label': 'nope'})
+        self.assertEqual(status.value, 400)
+        self.assertIn('nope', response['error'])
+        status, _ = self._post('/api/breakpoints', {'address': 'xyz'})
+        self.assertEqual(status.value, 400)
+        status, _ = self._post('/api/watchpoints', {'first_address': '0200', 'mode': 'x'})
+        self.assertEqual(status.value, 400)
+
+
+class TestDebuggerMemoryBinary(unittest.TestCase):
+
+    def setUp(self):
+        system_addresses = {
+            'entry_point': 0x0000,
+            'bottom_of_stack': 0x07FF,
+            'IVT': 0x0F00,
+        }
+        self.clock = Clock()
+        self.cpu = CPU(system_addresses, INSTRUCTION_SET, 16, 1000)
+        self.ram = RAM(0x0800)
+        self.ram.write_block(0x0100, b'\x12\x34')
+        virtual_ram = VirtualRAM({
+            'device_controller': {
+                'first': 0x0900,
+                'last': 0x0903,
+            },
+        })
+        device_controller = Mock()
+        device_controller.read_byte.side_effect = lambda pos, silent: pos & 0xFF
+        virtual_ram.register_architecture(device_controller)
+        self.memory = Memory(0x0800)
+        self.memory.register_architecture(self.ram, virtual_ram)
+        self.debugger = Debugger('localhost', 0)
+        self.cpu.register_architecture(
+            Registers(system_addresses['bottom_of_stack']),
+            Stack(system_addresses['bottom_of_stack']),
+            self.memory,
+            None, None, None, None,
+            self.debugger,
+        )
+        self.debugger.register_architecture(self.cpu, self.clock, self.memory, None)
+
+    def tearDown(self):
+        self.debugger._server.server_close()
+
+    def _get(self, headers):
+        return self.debugger._handle_get_binary('/api/memory.bin', headers)
+
+    def test_range(self):
+        status, headers, body = self._get({'Range': 'bytes=2046-2309'})  # 07FE-0905
+        self.assertEqual(status.value, 206)
+        self.assertEqual(headers['Content-Range'], 'bytes 2046-2309/{}'.format(config.memory_size))
+        self.assertEqual(headers['X-Memory-Length'], str(264))
+        self.assertEqual(len(body), 264 + 33)
+        content, validity = body[:264], body[264:]
+        self.assertEqual(content[-6:], bytes([0x00, 0x01, 0x02, 0x03, 0x00, 0x00]))
+        self.assertEqual(validity[0], 0xC0)  # 07FE-07FF mapped
+        self.assertEqual(validity[1:32], bytes(31))
+        self.assertEqual(validity[32], 0x3C)  # 0900-0903 mapped
+
+    def test_whole_memory(self):
+        status, headers, body = self._get({})
+        self.assertEqual(status.value, 200)
+        self.assertEqual(len(body), config.memory_size + config.memory_size // 8)
+        self.assertEqual(body[0x0100:0x0102], b'\x12\x34')
+        self.assertEqual(body[config.memory_size:config.memory_size + 0x0100], b'\xFF' * 0x0100)
+
+    def test_etag(self):
+        _, headers, _ = self._get({'Range': 'bytes=0-511'})
+        etag = headers['ETag']
+        status, headers, body = self._get({'Range': 'bytes=0-511', 'If-None-Match': etag})
+        self.assertEqual(status.value, 304)
+        self.assertEqual(body, b'')
+        _, other_headers, _ = self._get({'Range': 'bytes=512-1023', 'If-None-Match': etag})
+        self.assertNotEqual(other_headers['ETag'], etag)
+        self.memory.write_byte(0x0210, 0x56)  # another page
+        status, _, _ = self._get({'Range': 'bytes=0-511', 'If-None-Match': etag})
+        self.assertEqual(status.value, 304)
+        self.memory.write_byte(0x0110, 0x56)
+        status, headers, body = self._get({'Range': 'bytes=0-511', 'If-None-Match': etag})
+        self.assertEqual(status.value, 206)
+        self.assertNotEqual(headers['ETag'], etag)
+        self.assertEqual(body[0x0110], 0x56)
+
+    def test_invalid_range(self):
+        for range_header in ['bytes=10-5', 'bytes=70000-', 'items=0-5', 'bytes=0-1,5-6', 'bytes=x-y']:
+            status, headers, _ = self._get({'Range': range_header})
+            self.assertEqual(status.value, 416, range_header)
+        status, headers, body = self._get({'Range': 'bytes=-16'})
+        self.assertEqual(headers['Content-Range'], 'bytes {}-{}/{}'.format(config.memory_size - 16, config.memory_size - 1, config.memory_size))
+
+    def test_http(self):
+        thread = threading.Thread(target=self.debugger._server.serve_forever)
+        thread.start()
+        try:
+            url = 'http://localhost:{}/api/memory.bin'.format(self.debugger._server.server_address[1])
+            request = urllib.request.Request(url, headers={'Range': 'bytes=256-257'})
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(response.status, 206)
+                self.assertEqual(response.headers['Content-Type'], 'application/octet-stream')
+                self.assertEqual(response.read(), b'\x12\x34\xC0')
+                etag = response.headers['ETag']
+            request = urllib.request.Request(url, headers={'Range': 'bytes=256-257', 'If-None-Match': etag})
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                urllib.request.urlopen(request)
+            self.assertEqual(cm.exception.code, 304)
+            with urllib.request.urlopen(url.replace('memory.bin', 'memory?offset=0100&length=2')) as response:
+                self.assertEqual(json.loads(response.read())['content'], ['12', '34'])
+        finally:
+            self.debugger._server.shutdown()
+            thread.join()
@@ -0,0 +1,80 @@
+import unittest
+
+from hardware.device_controller.device_controller import DeviceController
+from hardware.device_controller.device_health import DeviceHealth
+
+
+class TestDeviceHealth(unittest.TestCase):
+
+    def setUp(self):
+        self.health = DeviceHealth(1, 8)
+        self.health.reset(100)
+
+    def test_schedule_backs_off_when_healthy(self):
+        self.assertFalse(self.health.is_due(100))
+        self.assertTrue(self.health.is_due(101))
+        self.health.record_success(101, 0.01)
+        self.assertEqual(self.health.period, 2)
+        self.assertFalse(self.health.is_due(102))
+        self.assertTrue(self.health.is_due(103))
+        for now in range(103, 110):
+            self.health.record_success(now, 0.01)
+        self.assertEqual(self.health.period, 8)
+
+    def test_schedule_speeds_up_when_failing(self):
+        for now in range(101, 105):
+            self.health.record_success(now, 0.01)
+        self.assertEqual(self.health.period, 8)
+        self.health.record_failure(120)
+        self.assertEqual(self.health.period, 1)
+        self.assertTrue(self.health.is_due(121))
+        self.assertEqual(self.health.seconds_since_last_seen(120.5), 16)
+
+    def test_in_flight_is_not_due(self):
+        self.assertTrue(self.health.start_check(200))
+        self.assertFalse(self.health.is_due(200))
+        self.assertFalse(self.health.start_check(200))
+        self.health.record_success(200, 0.01)
+        self.health.finish_check()
+        self.assertFalse(self.health.start_check(201))
+        self.assertTrue(self.health.start_check(202))
+
+    def test_data_transfer_counts_as_contact(self):
+        self.health.record_success(150)
+        self.assertEqual(self.health.seconds_since_last_seen(150), 0)
+        self.assertFalse(self.health.is_due(151))
+        self.assertEqual(self.health.get_stats()['ping_count'], 0)
+
+    def test_stats(self):
+        self.assertDictEqual(self.health.get_stats(), {
+            'period': 1,
+            'ping_count': 0,
+            'failure_count': 0,
+            'rtt_last': None,
+            'rtt_min': None,
+            'rtt_max': None,
+            'rtt_avg': None,
+        })
+        self.health.record_success(101, 0.010)
+        self.health.record_failure(103)
+        self.health.record_success(104, 0.030)
+        self.assertDictEqual(self.health.get_stats(), {
+            'period': 2,
+            'ping_count': 3,
+            'failure_count': 1,
+            'rtt_last': 30.0,
+            'rtt_min': 10.0,
+            'rtt_max': 30.0,
+            'rtt_avg': 20.0,
+        })
+
+
+class TestHealthChecks(unittest.TestCase):
+
+    def test_no_ioports(self):
+        device_controller = DeviceController(None, None, {
+            'device_registry_size': 0,
+            'device_status_table_size': 0,
+        }, {}, [])
+        device_controller._stop_event.set()
+        device_controller._ping_thread_run()
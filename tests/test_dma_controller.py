@@ -0,0 +1,68 @@
+import logging
+import unittest
+from unittest.mock import Mock
+
+from hardware import dma_controller
+from hardware.device_controller.ioport import IOPort
+from hardware.memory.ram import RAM, SegfaultError
+
+
+class TestDMAController(unittest.TestCase):
+
+    def setUp(self):
+        self.ram = RAM(0x100)
+        self.ioports = [IOPort(ioport_number, 0x10) for ioport_number in range(2)]
+        self.device_controller = Mock()
+        self.device_controller.ioports = self.ioports
+        for ioport in self.ioports:
+            ioport.register_architecture(self.device_controller)
+        self.interrupt_controller = Mock()
+        self.dma = dma_controller.DMAController(1000)
+        self.dma.register_architecture(self.ram, self.device_controller, self.interrupt_controller)
+        logging.getLogger('hardware.dma_controller').setLevel(logging.ERROR)
+
+    def test_input_waits_for_data(self):
+        self.dma.start_input_transfer(1, 0x10, 0x08, 0x80)
+        self.assertFalse(self.dma._process_transfers())
+        self.assertEqual(self.interrupt_controller.send.call_count, 0)
+        self.ioports[1].input_queue.put(b'ABC')
+        self.assertTrue(self.dma._process_transfers())
+        self.assertListEqual(self.ram._content[0x10:0x16], [0x00, 0x03, 0x41, 0x42, 0x43, 0x00])
+        self.assertTupleEqual(self.interrupt_controller.send.call_args_list[0][0], (0x80,))
+        self.assertListEqual(self.dma._pending_transfers, [])
+
+    def test_input_truncated(self):
+        self.ioports[0].input_queue.put(b'ABCDEF')
+        self.dma.start_input_transfer(0, 0x10, 0x05, 0x80)
+        self.assertTrue(self.dma._process_transfers())
+        self.assertListEqual(self.ram._content[0x10:0x16], [0x00, 0x03, 0x41, 0x42, 0x43, 0x00])
+
+    def test_output(self):
+        self.ioports[0].register_device('localhost', 1234)
+        self.ram.write_block(0x20, b'Hello')
+        self.dma.start_output_transfer(0, 0x20, 0x05, 0x81)
+        self.assertTrue(self.dma._process_transfers())
+        self.assertTupleEqual(
+            self.device_controller.output_queue.put.call_args_list[0][0][0],
+            (0, 'localhost', 1234, 'data', b'Hello'),
+        )
+        self.assertTupleEqual(self.interrupt_controller.send.call_args_list[0][0], (0x81,))
+
+    def test_transfers_are_independent(self):
+        self.dma.start_input_transfer(0, 0x10, 0x08, 0x80)
+        self.dma.start_input_transfer(1, 0x20, 0x08, 0x81)
+        self.ioports[1].input_queue.put(b'A')
+        self.assertTrue(self.dma._process_transfers())
+        self.assertEqual(len(self.dma._pending_transfers), 1)
+        self.assertTupleEqual(self.interrupt_controller.send.call_args_list[0][0], (0x81,))
+
+    def test_invalid_transfer(self):
+        with self.assertRaises(dma_controller.NoIOPortError):
+            self.dma.start_output_transfer(2, 0x10, 0x08, 0x80)
+        with self.assertRaises(SegfaultError):
+            self.dma.start_output_transfer(0, 0xF0, 0x20, 0x80)
+        with self.assertRaises(dma_controller.InvalidTransferLengthError):
+            self.dma.start_input_transfer(0, 0x10, 0x01, 0x80)
+        with self.assertRaises(dma_controller.InvalidTransferInterruptNumberError):
+            self.dma.start_output_transfer(0, 0x10, 0x08, 256)
+        self.assertTrue(self.dma._transfer_queue.empty())
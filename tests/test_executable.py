@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 
@@ -73,6 +75,104 @@ class TestExecutable(unittest.TestCase):
         self.assertListEqual(second_write, self.opcode)
 
 
+class TestExecutableFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'test.ald')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _write_file(self, content):
+        with open(self.filename, 'wb') as output_file:
+            output_file.write(bytes(content))
+
+    def test_load_ok(self):
+        executable.Executable(1, [0x12, 0x34], [0xAA, 0xBB, 0xCC]).save_to_file(self.filename)
+        with executable.ExecutableFile(self.filename) as exe:
+            self.assertEqual(exe.version, 1)
+            self.assertEqual(exe.entry_point, 13)
+            self.assertEqual(exe.length, 15)
+            self.assertEqual(bytes(exe.extra_header), bytes([0xAA, 0xBB, 0xCC]))
+            self.assertEqual(bytes(exe.opcode), bytes([0x12, 0x34]))
+
+    def test_load_sections(self):
+        sections = executable.create_sections([0x12] + [0] * 20 + [0x34])
+        executable.Executable.from_sections(sections, compress=True).save_to_file(self.filename)
+        with executable.ExecutableFile(self.filename) as exe:
+            self.assertEqual(exe.version, 2)
+            self.assertListEqual(executable.get_sections(exe), sections)
+
+    def test_load_invalid_signature(self):
+        self._write_file([0, 0, 0, 0, 0, 0, 0, 1, 0, 10, 0x12])
+        with self.assertRaisesRegex(executable.CorruptFileError, 'Signature not valid'):
+            executable.ExecutableFile(self.filename)
+
+    def test_load_empty_file(self):
+        self._write_file([])
+        with self.assertRaisesRegex(executable.CorruptFileError, 'Signature not valid'):
+            executable.ExecutableFile(self.filename)
+
+    def test_load_truncated_header(self):
+        self._write_file(executable.ALDEBARAN_EXECUTABLE_SIGNATURE + [1])
+        with self.assertRaisesRegex(executable.CorruptFileError, 'Header not valid'):
+            executable.ExecutableFile(self.filename)
+
+    def test_load_invalid_entry_point(self):
+        self._write_file(executable.ALDEBARAN_EXECUTABLE_SIGNATURE + [1, 0, 20, 0x12])
+        with self.assertRaisesRegex(executable.CorruptFileError, 'Entry point not valid'):
+            executable.ExecutableFile(self.filename)
+
+
+class TestSections(unittest.TestCase):
+
+    def setUp(self):
+        self.opcode = [0x12, 0x34] + [0] * 20 + [0x56, 0x00, 0x78]
+        self.data_ranges = [(23, 2)]
+
+    def test_create_sections(self):
+        sections = executable.create_sections(self.opcode, self.data_ranges)
+        self.assertListEqual(sections, [
+            executable.Section(executable.SECTION_TYPE_CODE, 0, 2, bytes([0x12, 0x34])),
+            executable.Section(executable.SECTION_TYPE_BSS, 2, 20, None),
+            executable.Section(executable.SECTION_TYPE_CODE, 22, 1, bytes([0x56])),
+            executable.Section(executable.SECTION_TYPE_DATA, 23, 2, bytes([0x00, 0x78])),
+        ])
+
+    def test_short_zero_run_is_not_bss(self):
+        sections = executable.create_sections([0x12] + [0] * 15 + [0x34])
+        self.assertListEqual(sections, [
+            executable.Section(executable.SECTION_TYPE_CODE, 0, 17, bytes([0x12] + [0] * 15 + [0x34])),
+        ])
+
+    def test_from_sections_and_get_sections(self):
+        sections = executable.create_sections(self.opcode, self.data_ranges)
+        exe = executable.Executable.from_sections(sections)
+        self.assertEqual(exe.version, 2)
+        self.assertEqual(exe.entry_point, 10 + 2 + 4 * 8)
+        self.assertListEqual(exe.opcode, [0x12, 0x34, 0x56, 0x00, 0x78])
+        self.assertListEqual(executable.get_sections(exe), sections)
+
+    def test_compressed_sections(self):
+        sections = [
+            executable.Section(executable.SECTION_TYPE_DATA, 0, 100, bytes(range(10)) * 10),
+            executable.Section(executable.SECTION_TYPE_CODE, 100, 1, bytes([0x12])),
+        ]
+        exe = executable.Executable.from_sections(sections, compress=True)
+        self.assertLess(len(exe.opcode), 101)
+        self.assertListEqual(executable.get_sections(exe), sections)
+
+    def test_corrupt_section_table(self):
+        exe = executable.Executable.from_sections(executable.create_sections(self.opcode))
+        exe.opcode = exe.opcode[:-1]
+        with self.assertRaises(executable.CorruptFileError):
+            executable.get_sections(exe)
+        exe.extra_header = exe.extra_header[:-1]
+        with self.assertRaises(executable.CorruptFileError):
+            executable.get_sections(exe)
+
+
 class MockFile:
 
     def __init__(self, content):
@@ -0,0 +1,160 @@
+from http import HTTPStatus
+from io import BytesIO
+import logging
+import time
+import unittest
+from unittest.mock import patch
+
+from assembler.assembler import Assembler
+from hardware.aldebaran import UnsupportedSnapshotVersionError, InvalidSnapshotError
+from hardware.farm import Supervisor, CommandFailedError, WorkerError
+from hardware.host import NoSuchVMError, create_vm
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+from utils import config
+
+
+LOOP_SOURCE_CODE = '''
+    MOV AX 0x0000
+  LOOP:
+    INC AX 0x01
+    MOV [0x0300] AX
+    JMP LOOP
+'''
+
+
+def _get_loop_snapshot(cycles):
+    assembler = Assembler(INSTRUCTION_SET, {
+        'byte': BYTE_REGISTERS,
+        'word': WORD_REGISTERS,
+    })
+    aldebaran = create_vm()
+    aldebaran.ram.write_block(config.system_addresses['entry_point'], assembler.assemble_code(LOOP_SOURCE_CODE))
+    aldebaran.run_slice(cycles, time.time())
+    return aldebaran.get_snapshot()
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        logging.getLogger('hardware.aldebaran').setLevel(logging.ERROR)
+
+    def test_snapshot(self):
+        snapshot = _get_loop_snapshot(100)
+        self.assertEqual(snapshot['cycle_count'], 100)
+        aldebaran = create_vm()
+        aldebaran.load_snapshot(snapshot)
+        self.assertEqual(aldebaran.cpu.registers.get_register('AX'), 33)
+        self.assertEqual(aldebaran.ram.read_block(0, aldebaran.ram.size), bytes.fromhex(snapshot['ram']))
+        aldebaran.run_slice(30, time.time())
+        self.assertEqual(aldebaran.clock.cycle_count, 130)
+        self.assertEqual(aldebaran.cpu.registers.get_register('AX'), 43)
+        self.assertEqual(aldebaran.get_snapshot(), _get_loop_snapshot(130))
+
+    def test_unsupported_version(self):
+        snapshot = dict(_get_loop_snapshot(10), version=99)
+        with self.assertRaises(UnsupportedSnapshotVersionError):
+            create_vm().load_snapshot(snapshot)
+
+    def test_invalid_snapshot(self):
+        snapshot = _get_loop_snapshot(10)
+        no_ip = dict(snapshot)
+        del no_ip['ip']
+        for invalid_snapshot in [
+            [],
+            no_ip,
+            dict(snapshot, halt=None),
+            dict(snapshot, registers={'AX': 1}),
+            dict(snapshot, registers=dict(snapshot['registers'], AX=0x10000)),
+            dict(snapshot, ram='xyz'),
+            dict(snapshot, ram=snapshot['ram'][:-2]),
+        ]:
+            aldebaran = create_vm()
+            with self.assertRaises(InvalidSnapshotError):
+                aldebaran.load_snapshot(invalid_snapshot)
+            self.assertEqual(aldebaran.clock.cycle_count, 0)
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        for logger_name in ['hardware.farm', 'hardware.host', 'hardware.aldebaran']:
+            logging.getLogger(logger_name).setLevel(logging.CRITICAL)
+        self.snapshot = _get_loop_snapshot(100)
+        # no device servers (device host is None) and control server on a free port
+        self.supervisor = Supervisor(2, 100, 'localhost', 0, None, 36000)
+        self.supervisor.start()
+
+    def tearDown(self):
+        self.supervisor.stop()
+
+    def test_load_balancing(self):
+        self.assertEqual(self.supervisor.start_vm(snapshot=self.snapshot, weight=3)['worker'], 0)
+        self.assertEqual(self.supervisor.start_vm(snapshot=self.snapshot)['worker'], 1)
+        self.assertEqual(self.supervisor.start_vm(snapshot=self.snapshot)['worker'], 1)
+        self.assertEqual(self.supervisor.start_vm(snapshot=self.snapshot, weight=2)['worker'], 1)
+        vm_info = self.supervisor.start_vm(snapshot=self.snapshot)
+        self.assertEqual(vm_info, {
+            'vm_id': 4,
+            'worker': 0,
+            'device_port': 36000,
+        })
+        status = self.supervisor.get_status()
+        self.assertEqual([worker['load'] for worker in status['workers']], [4, 4])
+        self.assertEqual(sorted(status['vms']), [0, 1, 2, 3, 4])
+        self.assertEqual(status['total']['running_vm_count'], 5)
+        for vm_metrics in status['vms'].values():
+            self.assertEqual(vm_metrics['status'], 'running')
+            self.assertGreaterEqual(vm_metrics['cycle_count'], 0)
+            self.assertEqual(vm_metrics['halted_ratio'], 0)
+
+    def test_stop_and_snapshot(self):
+        self.supervisor.start_vm(snapshot=self.snapshot)
+        self.supervisor.start_vm(snapshot=self.snapshot)
+        time.sleep(0.1)
+        snapshot = self.supervisor.get_snapshot(1)
+        self.assertGreater(snapshot['cycle_count'], 100)
+        self.supervisor.stop_vm(1)
+        snapshot = self.supervisor.get_snapshot(1)
+        time.sleep(0.1)
+        self.assertEqual(self.supervisor.get_snapshot(1), snapshot)
+        self.assertEqual(self.supervisor.get_status()['vms'][1]['status'], 'stopped')
+        self.assertEqual(self.supervisor.get_status()['vms'][0]['status'], 'running')
+        with self.assertRaises(NoSuchVMError):
+            self.supervisor.stop_vm(5)
+
+    def test_failed_start(self):
+        with self.assertRaises(CommandFailedError):
+            self.supervisor.start_vm(boot_file='/nonexistent/file')
+        with self.assertRaises(CommandFailedError):
+            self.supervisor.start_vm(snapshot={'version': 1})
+        with self.assertRaises(CommandFailedError):
+            self.supervisor.start_vm(snapshot=[])
+        # workers survive, ids of failed VMs are not reused
+        self.assertEqual(self.supervisor.start_vm(snapshot=self.snapshot)['vm_id'], 3)
+        status = self.supervisor.get_status()
+        self.assertTrue(all(worker['alive'] for worker in status['workers']))
+        self.assertEqual(list(status['vms']), [3])
+
+    def test_start_timeout(self):
+        with patch.object(self.supervisor, '_get_least_loaded_worker', return_value=0):
+            with patch.object(config, 'farm_command_timeout', 0):
+                with self.assertRaises(WorkerError):
+                    self.supervisor.start_vm(snapshot=self.snapshot)
+        # the VM started late is stopped at once
+        time.sleep(0.1)
+        self.assertEqual(self.supervisor.get_status()['vms'][0]['status'], 'stopped')
+        self.assertEqual(self.supervisor.start_vm(snapshot=self.snapshot)['vm_id'], 1)
+
+    def test_control_requests(self):
+        status, response = self.supervisor._handle_post('/vms', {'Content-Length': 0}, BytesIO(b''))
+        self.assertEqual(status, HTTPStatus.BAD_REQUEST)
+        status, response = self.supervisor._handle_post('/vms/3/stop', {'Content-Length': 0}, BytesIO(b''))
+        self.assertEqual(status, HTTPStatus.NOT_FOUND)
+        status, response = self.supervisor._handle_post('/vms', {'Content-Length': 1}, BytesIO(b'{'))
+        self.assertEqual(status, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(response['error'], 'Could not parse data.')
+        status, response = self.supervisor._handle_get('/status')
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertEqual(response['total']['vm_count'], 0)
+        self.assertTrue(all(worker['alive'] for worker in response['workers']))
@@ -0,0 +1,172 @@
+from http import HTTPStatus
+from io import BytesIO
+import logging
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from assembler.assembler import Assembler
+from hardware import (
+    Aldebaran,
+    Clock,
+    Registers, Stack, CPU,
+    Memory, RAM, VirtualRAM,
+    InterruptController,
+    IOPort, DeviceController,
+    Timer,
+    DMAController,
+)
+from hardware.host import Host, DuplicateVMError, InvalidWeightError
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+from utils import config
+
+
+LOOP_SOURCE_CODE = '''
+    MOV AX 0x0000
+  LOOP:
+    INC AX 0x01
+    JMP LOOP
+'''
+
+HALT_SOURCE_CODE = '''
+    HLT
+'''
+
+SHUTDOWN_SOURCE_CODE = '''
+    MOV AX 0x0000
+    SHUTDOWN
+'''
+
+SYSTEM_ADDRESSES = {
+    'entry_point': 0x0000,
+    'bottom_of_stack': 0x0DFF,
+    'IVT': 0x0E00,
+    'device_registry_address': 0x0F00,
+    'device_registry_size': 0x08,
+    'device_status_table_address': 0x0F80,
+    'device_status_table_size': 0x02,
+}
+
+
+class TestHost(unittest.TestCase):
+
+    def setUp(self):
+        self.assembler = Assembler(INSTRUCTION_SET, {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        })
+        self.host = Host(None, None, 10)
+        for logger_name in ['hardware.cpu', 'hardware.host', 'hardware.timer']:
+            logging.getLogger(logger_name).setLevel(logging.CRITICAL)
+
+    def _create_vm(self, source_code):
+        ram = RAM(0x1000)
+        ram.write_block(SYSTEM_ADDRESSES['entry_point'], self.assembler.assemble_code(source_code))
+        aldebaran = Aldebaran({
+            'clock': Clock(),
+            'registers': Registers(SYSTEM_ADDRESSES['bottom_of_stack']),
+            'stack': Stack(SYSTEM_ADDRESSES['bottom_of_stack']),
+            'cpu': CPU(SYSTEM_ADDRESSES, INSTRUCTION_SET, 16, 1000),
+            'memory': Memory(0x1000),
+            'ram': ram,
+            'virtual_ram': VirtualRAM({}),
+            'interrupt_controller': InterruptController(),
+            'device_controller': DeviceController(
+                None, None,
+                SYSTEM_ADDRESSES, {'device_registered': 0x01, 'device_unregistered': 0x02},
+                [IOPort(0, 0x10), IOPort(1, 0x10)],
+            ),
+            'timer': Timer(1000, 1),
+            'dma_controller': DMAController(1000),
+            'debugger': None,
+        })
+        return aldebaran
+
+    def test_round_robin(self):
+        vms = [self._create_vm(LOOP_SOURCE_CODE) for _ in range(3)]
+        for vm_id, aldebaran in enumerate(vms):
+            self.host.add_vm(vm_id, aldebaran)
+        for _ in range(5):
+            self.assertEqual(self.host.run_round(), 30)
+        for vm_id, aldebaran in enumerate(vms):
+            self.assertEqual(self.host.stats[vm_id].cycle_count, 50)
+            self.assertEqual(self.host.stats[vm_id].slice_count, 5)
+            self.assertEqual(aldebaran.clock.cycle_count, 50)
+            self.assertEqual(aldebaran.cpu.registers.get_register('AX'), 25)
+
+    def test_weights(self):
+        self.host.add_vm('light', self._create_vm(LOOP_SOURCE_CODE))
+        self.host.add_vm('heavy', self._create_vm(LOOP_SOURCE_CODE), weight=3)
+        self.host.run_round()
+        self.host.run_round()
+        self.assertEqual(self.host.stats['light'].cycle_count, 20)
+        self.assertEqual(self.host.stats['heavy'].cycle_count, 60)
+        with self.assertRaises(InvalidWeightError):
+            self.host.add_vm('zero', self._create_vm(LOOP_SOURCE_CODE), weight=0)
+        with self.assertRaises(DuplicateVMError):
+            self.host.add_vm('light', self._create_vm(LOOP_SOURCE_CODE))
+
+    def test_halted_vm_yields_slice(self):
+        self.host.add_vm(0, self._create_vm(HALT_SOURCE_CODE))
+        self.host.add_vm(1, self._create_vm(LOOP_SOURCE_CODE))
+        self.assertEqual(self.host.run_round(), 11)
+        self.assertEqual(self.host.run_round(), 10)
+        self.assertEqual(self.host.stats[0].status, 'running')
+        self.assertEqual(self.host.stats[0].cycle_count, 1)
+
+    def test_shutdown_and_crash(self):
+        self.host.add_vm(0, self._create_vm(SHUTDOWN_SOURCE_CODE))
+        crashing_vm = self._create_vm(LOOP_SOURCE_CODE)
+        crashing_vm.ram.write_byte(0x0000, 0xFF)  # unknown opcode
+        self.host.add_vm(1, crashing_vm)
+        self.host.add_vm(2, self._create_vm(LOOP_SOURCE_CODE))
+        self.host.run_round()
+        self.host.run_round()
+        self.assertEqual(self.host.stats[0].status, 'shutdown')
+        self.assertEqual(self.host.stats[0].cycle_count, 2)
+        self.assertEqual(self.host.stats[1].status, 'crashed')
+        self.assertIsNotNone(self.host.stats[1].error)
+        self.assertEqual(self.host.stats[2].status, 'running')
+        self.assertEqual(self.host.stats[2].cycle_count, 20)
+
+    def test_dispatch_device_requests(self):
+        self.host.add_vm(0, self._create_vm(LOOP_SOURCE_CODE))
+        self.host.add_vm(1, self._create_vm(LOOP_SOURCE_CODE))
+        status, _ = self.host._handle_incoming_request('/1/0/ping', {'Content-Length': 0}, BytesIO(b''))
+        self.assertEqual(status, HTTPStatus.OK)
+        status, _ = self.host._handle_incoming_request('/1/5/ping', {'Content-Length': 0}, BytesIO(b''))
+        self.assertEqual(status, HTTPStatus.BAD_REQUEST)
+        status, _ = self.host._handle_incoming_request('/7/0/ping', {'Content-Length': 0}, BytesIO(b''))
+        self.assertEqual(status, HTTPStatus.NOT_FOUND)
+        status, _ = self.host._handle_incoming_request('/x/0/ping', {'Content-Length': 0}, BytesIO(b''))
+        self.assertEqual(status, HTTPStatus.NOT_FOUND)
+
+    def test_stalled_device_does_not_block_other_vms(self):
+        stalled_vm = self._create_vm(LOOP_SOURCE_CODE)
+        other_vm = self._create_vm(LOOP_SOURCE_CODE)
+        self.host.add_vm(0, stalled_vm)
+        self.host.add_vm(1, other_vm)
+        release = threading.Event()
+        sent = threading.Event()
+        response = Mock(status_code=200, json=Mock(return_value={'message': 'OK'}))
+
+        def stall(*args, **kwargs):
+            release.wait(5)
+            return response
+
+        def send(*args, **kwargs):
+            sent.set()
+            return response
+
+        stalled_vm.device_controller.output_queue.put((0, 'localhost', 1, 'data', b'a'))
+        other_vm.device_controller.output_queue.put((0, 'localhost', 2, 'data', b'b'))
+        with patch.object(stalled_vm.device_controller, '_send_request', side_effect=stall):
+            with patch.object(other_vm.device_controller, '_send_request', side_effect=send) as send_mock:
+                self.host.start()
+                try:
+                    self.assertTrue(sent.wait(1))
+                    self.assertEqual(send_mock.call_args[1]['timeout'], config.host_output_timeout)
+                finally:
+                    release.set()
+                    self.host.stop()
@@ -2,8 +2,9 @@ import unittest
 from unittest.mock import Mock
 
 from instructions.instruction_set.data_transfer import MOV
+from instructions.instruction_set.jump import JE, JG, JA, JLE
 from instructions.operands import get_operand_opcode, InvalidWriteOperationError
-from assembler.tokenizer import Token, TokenType
+from assembler.tokenizer import Token, TokenType, Reference
 
 
 class TestGetOperand(unittest.TestCase):
@@ -136,3 +137,65 @@ class TestDo(unittest.TestCase):
         inst = MOV(self.cpu, opcode)
         with self.assertRaises(InvalidWriteOperationError):
             inst.do()
+
+
+class TestConditionalJump(unittest.TestCase):
+
+    def setUp(self):
+        self.cpu = Mock()
+        self.cpu.ip = 0x1234
+
+    def _get_opcode(self, *tokens):
+        opcode = []
+        for token in tokens:
+            opcode += get_operand_opcode(token)
+        return opcode
+
+    def test_register_literal(self):
+        opcode = self._get_opcode(
+            Token(TokenType.WORD_REGISTER, 'AX', 0),
+            Token(TokenType.WORD_LITERAL, 0x0005, 0),
+            Token(TokenType.ADDRESS_WORD_LITERAL, -0x0010, 0),
+        )
+        self.cpu.registers.get_register.return_value = 0x0005
+        self.assertEqual(JE(self.cpu, opcode).run(), 0x1224)
+        self.cpu.registers.get_register.return_value = 0x0006
+        inst = JE(self.cpu, opcode)
+        self.assertIsNone(inst.do())
+        self.assertEqual(inst.run(), 0x1234 + inst.opcode_length)
+
+    def test_signed(self):
+        opcode = self._get_opcode(
+            Token(TokenType.WORD_REGISTER, 'AX', 0),
+            Token(TokenType.WORD_LITERAL, 0xFFFE, 0),
+            Token(TokenType.ADDRESS_WORD_LITERAL, 0x0010, 0),
+        )
+        self.cpu.registers.get_register.return_value = 0xFFFF
+        self.assertEqual(JG(self.cpu, opcode).do(), 0x1244)
+        self.cpu.registers.get_register.return_value = 0x0001
+        self.assertEqual(JG(self.cpu, opcode).do(), 0x1244)
+        self.assertIsNone(JA(self.cpu, opcode).do())
+
+    def test_memory_literal(self):
+        opcode = self._get_opcode(
+            Token(TokenType.REL_REF_WORD, Reference(0x0100, None, 'B'), 0),
+            Token(TokenType.BYTE_LITERAL, 0x80, 0),
+            Token(TokenType.ADDRESS_WORD_LITERAL, 0x0020, 0),
+        )
+        self.cpu.memory.read_byte.return_value = 0x7F
+        self.assertIsNone(JLE(self.cpu, opcode).do())
+        self.assertEqual(self.cpu.memory.read_byte.call_args[0][0], 0x1334)
+        self.cpu.memory.read_byte.return_value = 0x80
+        self.assertEqual(JLE(self.cpu, opcode).do(), 0x1254)
+
+    def test_target_not_evaluated_if_not_taken(self):
+        opcode = self._get_opcode(
+            Token(TokenType.WORD_REGISTER, 'AX', 0),
+            Token(TokenType.WORD_REGISTER, 'BX', 0),
+            Token(TokenType.WORD_REGISTER, 'CX', 0),
+        )
+        self.cpu.registers.get_register.side_effect = lambda register_name: {'AX': 1, 'BX': 2, 'CX': 0x4321}[register_name]
+        self.assertIsNone(JE(self.cpu, opcode).do())
+        self.assertNotIn('CX', [call[0][0] for call in self.cpu.registers.get_register.call_args_list])
+        self.assertEqual(JA(self.cpu, opcode).do(), None)
+        self.assertEqual(JLE(self.cpu, opcode).do(), 0x4321)
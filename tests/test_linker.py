@@ -0,0 +1,64 @@
+import unittest
+
+from assembler.linker import link, UnresolvedReferenceError, AmbiguousReferenceError
+from assembler.object_file import ObjectFile, ExternalReference, CorruptObjectFileError
+
+
+class TestObjectFile(unittest.TestCase):
+
+    def test_to_bytes_and_back(self):
+        object_file = ObjectFile(
+            opcode=[0x56, 0x90, 0x00, 0x00],
+            labels={'start': 0},
+            references=[ExternalReference('sub', 0, 2)],
+            imports=['lib.ald'],
+        )
+        loaded_object_file = ObjectFile.from_bytes(object_file.to_bytes())
+        self.assertListEqual(loaded_object_file.opcode, object_file.opcode)
+        self.assertDictEqual(loaded_object_file.labels, object_file.labels)
+        self.assertListEqual(loaded_object_file.references, object_file.references)
+        self.assertListEqual(loaded_object_file.imports, object_file.imports)
+
+    def test_corrupt(self):
+        with self.assertRaises(CorruptObjectFileError):
+            ObjectFile.from_bytes(b'ALDEXE\x01\x00\x00\x00\x00')
+
+
+class TestLinker(unittest.TestCase):
+
+    def test_references_patched(self):
+        main = ObjectFile(
+            opcode=[0x78, 0x56, 0x90, 0x00, 0x00],  # NOP, JMP sub
+            labels={'start': 0},
+            references=[ExternalReference('sub', 1, 3)],
+        )
+        lib = ObjectFile(
+            opcode=[0x78, 0x56, 0x90, 0x00, 0x00],  # sub: NOP, JMP start
+            labels={'sub': 0},
+            references=[ExternalReference('start', 1, 3)],
+        )
+        opcode = link([('main', main), ('lib', lib)])
+        self.assertListEqual(opcode, [
+            0x78, 0x56, 0x90, 0x00, 0x04,
+            0x78, 0x56, 0x90, 0xFF, 0xFA,
+        ])
+
+    def test_unresolved_reference(self):
+        main = ObjectFile(
+            opcode=[0x56, 0x90, 0x00, 0x00],
+            references=[ExternalReference('sub', 0, 2)],
+        )
+        with self.assertRaises(UnresolvedReferenceError):
+            link([('main', main), ('lib', ObjectFile(opcode=[0x78], labels={'other': 0}))])
+
+    def test_ambiguous_reference(self):
+        main = ObjectFile(
+            opcode=[0x56, 0x90, 0x00, 0x00],
+            references=[ExternalReference('sub', 0, 2)],
+        )
+        with self.assertRaises(AmbiguousReferenceError):
+            link([
+                ('main', main),
+                ('lib1', ObjectFile(opcode=[0x78], labels={'sub': 0})),
+                ('lib2', ObjectFile(opcode=[0x78], labels={'sub': 0})),
+            ])
@@ -5,6 +5,7 @@ from instructions.operands import (
     Operand, OpLen, OpType,
     get_operand_opcode, parse_operand_buffer,
     get_operand_value, set_operand_value,
+    to_signed, from_signed,
     _get_reference_address, _get_opbyte,
     _get_register_code_by_name, _get_register_name_by_code,
     InvalidRegisterNameError, InvalidRegisterCodeError,
@@ -12,6 +13,7 @@ from instructions.operands import (
     InvalidOperandError, InvalidWriteOperationError, InsufficientOperandBufferError,
 )
 from assembler.tokenizer import Token, Reference, TokenType
+from utils import utils
 from utils.utils import WordOutOfRangeError, ByteOutOfRangeError
 
 
@@ -539,6 +541,41 @@ class TestGetReferenceAddress(unittest.TestCase):
         ), 0xA1D3)
 
 
+class TestSignConversion(unittest.TestCase):
+
+    def test_to_signed(self):
+        self.assertEqual(to_signed(0x00, OpLen.BYTE), 0)
+        self.assertEqual(to_signed(0x7F, OpLen.BYTE), 127)
+        self.assertEqual(to_signed(0x80, OpLen.BYTE), -128)
+        self.assertEqual(to_signed(0xFF, OpLen.BYTE), -1)
+        self.assertEqual(to_signed(0x7FFF, OpLen.WORD), 32767)
+        self.assertEqual(to_signed(0x8000, OpLen.WORD), -32768)
+        self.assertEqual(to_signed(0xFFFF, OpLen.WORD), -1)
+        with self.assertRaises(ByteOutOfRangeError):
+            to_signed(0x100, OpLen.BYTE)
+        with self.assertRaises(WordOutOfRangeError):
+            to_signed(-1, OpLen.WORD)
+
+    def test_from_signed(self):
+        self.assertEqual(from_signed(-1, OpLen.BYTE), 0xFF)
+        self.assertEqual(from_signed(-128, OpLen.BYTE), 0x80)
+        self.assertEqual(from_signed(127, OpLen.BYTE), 0x7F)
+        self.assertEqual(from_signed(-32768, OpLen.WORD), 0x8000)
+        self.assertEqual(from_signed(32767, OpLen.WORD), 0x7FFF)
+        with self.assertRaises(ByteOutOfRangeError):
+            from_signed(128, OpLen.BYTE)
+        with self.assertRaises(WordOutOfRangeError):
+            from_signed(-32769, OpLen.WORD)
+
+    def test_same_as_binary_conversion(self):
+        for value in range(0x100):
+            self.assertEqual(to_signed(value, OpLen.BYTE), utils.binary_to_number([value], signed=True))
+        for value in range(0, 0x10000, 0x7F):
+            self.assertEqual(to_signed(value, OpLen.WORD), utils.binary_to_number(utils.word_to_binary(value), signed=True))
+        for value in range(-0x8000, 0x8000, 0x7F):
+            self.assertEqual(from_signed(value, OpLen.WORD), utils.binary_to_number(utils.word_to_binary(value, signed=True)))
+
+
 class TestGetOpbyte(unittest.TestCase):
 
     def test(self):
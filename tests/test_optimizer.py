@@ -0,0 +1,75 @@
+import logging
+import unittest
+
+from assembler.assembler import Assembler
+from instructions import instruction_set
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+
+
+class TestOptimizer(unittest.TestCase):
+
+    def setUp(self):
+        self.instruction_set = [
+            (0x12, instruction_set.arithmetic.ADD),
+            (0x13, instruction_set.arithmetic.SUB),
+            (0x14, instruction_set.arithmetic.INC),
+            (0x15, instruction_set.arithmetic.DEC),
+            (0x34, instruction_set.data_transfer.MOV),
+            (0x56, instruction_set.jump.JMP),
+            (0x57, instruction_set.jump.JE),
+            (0x78, instruction_set.misc.NOP),
+            (0x9A, instruction_set.misc.SHUTDOWN),
+        ]
+        self.registers = {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        }
+        self.assembler = Assembler(self.instruction_set, self.registers, optimize=True)
+        self.plain_assembler = Assembler(self.instruction_set, self.registers)
+        logging.getLogger('assembler').setLevel(logging.CRITICAL)
+
+    def assert_optimized(self, source_code, expected_source_code, rule_names):
+        opcode = self.assembler.assemble_code(source_code)
+        self.assertListEqual(opcode, self.plain_assembler.assemble_code(expected_source_code))
+        self.assertListEqual(sorted(rewrite.rule_name for rewrite in self.assembler.rewrites), sorted(rule_names))
+        unoptimized_length = len(self.plain_assembler.assemble_code(source_code))
+        self.assertEqual(sum(rewrite.bytes_saved for rewrite in self.assembler.rewrites), unoptimized_length - len(opcode))
+
+    def test_redundant_mov(self):
+        self.assert_optimized(
+            'MOV AX AX\nMOV AL AL\nMOV AX BX\nSHUTDOWN',
+            'MOV AX BX\nSHUTDOWN',
+            ['remove_redundant_mov', 'remove_redundant_mov'],
+        )
+
+    def test_add_and_sub_to_inc_and_dec(self):
+        self.assert_optimized(
+            'ADD AX AX 0x0001\nSUB [data] [data] 0x0002\nADD AX BX 0x0001\ndata: .DAT 0x0000',
+            'INC AX 0x0001\nDEC [data] 0x0002\nADD AX BX 0x0001\ndata: .DAT 0x0000',
+            ['add_to_inc', 'sub_to_dec'],
+        )
+
+    def test_jump_to_next(self):
+        self.assert_optimized(
+            'JMP next\n\nnext:\nNOP\nJMP start\nstart: SHUTDOWN',
+            'next: NOP\nstart: SHUTDOWN',
+            ['remove_jump_to_next', 'remove_jump_to_next'],
+        )
+
+    def test_jump_chain(self):
+        self.assert_optimized(
+            'start: JE AX 0x0000 hop1\nNOP\nhop1: JMP hop2\nNOP\nhop2: JMP start',
+            'start: JE AX 0x0000 start\nNOP\nhop1: JMP start\nNOP\nhop2: JMP start',
+            ['collapse_jump_chain', 'collapse_jump_chain'],
+        )
+
+    def test_jump_loop_not_collapsed_forever(self):
+        self.assert_optimized(
+            'loop1: JMP loop2\nloop2: JMP loop1',
+            'loop1: JMP loop1\nloop2: JMP loop1',
+            ['collapse_jump_chain'],
+        )
+
+    def test_cycles_saved(self):
+        self.assembler.assemble_code('JE AX 0x0000 hop1\nhop1: JMP hop2\nNOP\nhop2: SHUTDOWN')
+        self.assertEqual(sum(rewrite.cycles_saved for rewrite in self.assembler.rewrites), 1)
@@ -59,3 +59,29 @@ class TestRAM(unittest.TestCase):
             ram.write_word(-1, 0x1234)
         with self.assertRaises(SegfaultError):
             ram.write_word(3, 0x1234)
+
+    def test_read_block_ok(self):
+        ram = RAM(4)
+        ram._content = [0x12, 0x34, 0x56, 0x78]
+        self.assertEqual(ram.read_block(1, 3), bytes([0x34, 0x56, 0x78]))
+        self.assertEqual(ram.read_block(2, 0), b'')
+
+    def test_read_block_segfault(self):
+        ram = RAM(4)
+        with self.assertRaises(SegfaultError):
+            ram.read_block(-1, 2)
+        with self.assertRaises(SegfaultError):
+            ram.read_block(2, 3)
+
+    def test_write_block_ok(self):
+        ram = RAM(4)
+        ram.write_block(1, bytes([0x12, 0x34]))
+        self.assertListEqual(ram._content, [0, 0x12, 0x34, 0])
+
+    def test_write_block_segfault(self):
+        ram = RAM(4)
+        with self.assertRaises(SegfaultError):
+            ram.write_block(-1, bytes([0x12]))
+        with self.assertRaises(SegfaultError):
+            ram.write_block(3, bytes([0x12, 0x34]))
+        self.assertListEqual(ram._content, [0, 0, 0, 0])
@@ -1,10 +1,14 @@
 import unittest
 from unittest.mock import Mock
 
+from hardware.cpu.registers import Registers
 from hardware.cpu.stack import (
-    Stack,
+    Stack, FastStack,
     StackOverflowError, StackUnderflowError,
 )
+from hardware.memory.memory import Memory, SegfaultError
+from hardware.memory.ram import RAM
+from utils.errors import ArchitectureError
 
 
 class TestStack(unittest.TestCase):
@@ -131,3 +135,68 @@ class TestStack(unittest.TestCase):
             self.registers.set_register.call_args_list[0][0],
             ('SP', sp + 2),
         )
+
+
+class TestFastStack(unittest.TestCase):
+
+    def setUp(self):
+        self.bottom_of_stack = 0x00FF
+        self.stacks = []
+        for stack_class in [Stack, FastStack]:
+            registers = Registers(self.bottom_of_stack)
+            ram = RAM(0x0200)
+            memory = Memory(0x0200)
+            memory.register_architecture(ram, None)
+            stack = stack_class(self.bottom_of_stack)
+            stack.register_architecture(registers, memory)
+            self.stacks.append((stack, registers, ram))
+
+    def _assert_same_state(self):
+        (_, registers, ram), (_, fast_registers, fast_ram) = self.stacks
+        self.assertEqual(fast_registers.get_word_registers(), registers.get_word_registers())
+        self.assertEqual(fast_registers.get_flag('interrupt'), registers.get_flag('interrupt'))
+        self.assertEqual(fast_ram.read_block(0, 0x0200), ram.read_block(0, 0x0200))
+
+    def test_same_as_stack(self):
+        for stack, _, _ in self.stacks:
+            stack.push_word(0x1234)
+            stack.push_byte(0x56)
+            stack.push_flags()
+        self._assert_same_state()
+        for stack, registers, _ in self.stacks:
+            registers.set_flag('interrupt', 0)
+            stack.pop_flags()
+            self.assertEqual(registers.get_flag('interrupt'), 1)
+            self.assertEqual(stack.pop_byte(), 0x56)
+            self.assertEqual(stack.pop_word(), 0x1234)
+        self._assert_same_state()
+
+    def test_errors(self):
+        for stack, registers, _ in self.stacks:
+            with self.assertRaises(StackUnderflowError):
+                stack.pop_byte()
+            with self.assertRaises(StackUnderflowError):
+                stack.pop_word()
+            registers.set_register('SP', 0x0001)
+            with self.assertRaises(StackOverflowError):
+                stack.push_word(0x1234)
+            stack.push_byte(0x12)
+            with self.assertRaises(StackOverflowError):
+                stack.push_byte(0x12)
+            registers.set_register('SP', 0x0200)
+            with self.assertRaises(SegfaultError):
+                stack.push_word(0x1234)
+        self._assert_same_state()
+
+    def test_flag_word(self):
+        stack, registers, ram = self.stacks[1]
+        registers.set_flag('interrupt', 0)
+        stack.push_flags()
+        self.assertEqual(ram.read_word(self.bottom_of_stack - 1), 0x0000)
+        registers.set_flag('interrupt', 1)
+        stack.push_flags()
+        self.assertEqual(ram.read_word(self.bottom_of_stack - 3), 0x0001)
+
+    def test_memory_must_be_registered(self):
+        with self.assertRaises(ArchitectureError):
+            FastStack(self.bottom_of_stack).register_architecture(Registers(self.bottom_of_stack), Memory(0x0200))
@@ -0,0 +1,161 @@
+import unittest
+from unittest.mock import Mock
+
+from assembler.assembler import Assembler
+from hardware.cpu import CPU, Registers, Stack, InstructionFuser
+from hardware.memory import Memory, RAM
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+
+
+SOURCE_CODE = '''
+    MOV AX 0x0000
+loop:
+    INC AX 0x0001
+    MOV [data] AX
+    JLE AX 0x0040 loop
+    SHUTDOWN
+data: .DAT 0x0000
+'''
+
+
+class TestInstructionFuser(unittest.TestCase):
+
+    def setUp(self):
+        self.assembler = Assembler(INSTRUCTION_SET, {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        })
+
+    def _get_cpu(self, opcode, instruction_fuser, debugger=None, interrupt_controller=None):
+        system_addresses = {
+            'entry_point': 0x0000,
+            'bottom_of_stack': 0x0FFF,
+            'IVT': 0x0F00,
+        }
+        cpu = CPU(system_addresses, INSTRUCTION_SET, 16, 1000)
+        memory = Memory(0x1000)
+        ram = RAM(0x1000)
+        ram.write_block(0, opcode)
+        memory.register_architecture(ram, None)
+        cpu.register_architecture(
+            Registers(system_addresses['bottom_of_stack']),
+            Stack(system_addresses['bottom_of_stack']),
+            memory,
+            interrupt_controller, None, None, None, debugger,
+            instruction_fuser=instruction_fuser,
+        )
+        return cpu, ram
+
+    def _run(self, cpu):
+        steps = 0
+        while not cpu.shutdown:
+            cpu.step()
+            steps += 1
+        return steps
+
+    def test_same_result_in_fewer_cycles(self):
+        opcode = self.assembler.assemble_code(SOURCE_CODE)
+        cpu, ram = self._get_cpu(opcode, None)
+        steps = self._run(cpu)
+        instruction_fuser = InstructionFuser(4)
+        fused_cpu, fused_ram = self._get_cpu(opcode, instruction_fuser)
+        fused_steps = self._run(fused_cpu)
+        self.assertEqual(fused_cpu.registers.get_word_registers(), cpu.registers.get_word_registers())
+        self.assertEqual(fused_ram.read_block(0, len(opcode)), ram.read_block(0, len(opcode)))
+        self.assertEqual(fused_cpu.registers.get_register('AX'), 0x0041)
+        self.assertEqual(set(instruction_fuser.stats), {'INC+MOV', 'MOV+JLE'})
+        self.assertEqual(instruction_fuser.stats['INC+MOV'].sites, 1)
+        self.assertEqual(instruction_fuser.stats['INC+MOV'].executions, 0x41 - 4)
+        saved_cycles = sum(stats.executions for stats in instruction_fuser.stats.values())
+        self.assertEqual(fused_steps, steps - saved_cycles)
+        report = instruction_fuser.get_report()
+        self.assertEqual(len(report), 2)
+        self.assertTrue(report[0].startswith('INC+MOV'))
+
+    def test_not_fused_with_debugger(self):
+        opcode = self.assembler.assemble_code(SOURCE_CODE)
+        cpu, _ = self._get_cpu(opcode, None)
+        steps = self._run(cpu)
+        instruction_fuser = InstructionFuser(4)
+        debugged_cpu, _ = self._get_cpu(opcode, instruction_fuser, Mock())
+        self.assertIsNone(debugged_cpu.instruction_fuser)
+        self.assertEqual(self._run(debugged_cpu), steps)
+        self.assertEqual(instruction_fuser.stats, {})
+
+    def test_unfused_if_code_changes(self):
+        opcode = self.assembler.assemble_code('''
+        loop:
+            INC AX 0x0001
+            MOV BX AX
+            JMP loop
+        ''')
+        new_opcode = self.assembler.assemble_code('''
+            INC AX 0x0001
+            PUSH BX
+            NOP
+        ''')
+        self.assertEqual(len(new_opcode), len(opcode) - 4)
+        instruction_fuser = InstructionFuser(2)
+        cpu, ram = self._get_cpu(opcode, instruction_fuser)
+        for _ in range(12):
+            cpu.step()
+        self.assertEqual(instruction_fuser.stats['INC+MOV'].sites, 1)
+        self.assertGreater(instruction_fuser.stats['INC+MOV'].executions, 0)
+        ram.write_block(0, new_opcode)
+        ax = cpu.registers.get_register('AX')
+        for _ in range(3):
+            cpu.step()
+        self.assertEqual(instruction_fuser.stats['INC+MOV'].sites, 0)
+        self.assertEqual(cpu.registers.get_register('AX'), ax + 1)
+
+    def test_fused_pair_not_decoded_again(self):
+        opcode = self.assembler.assemble_code(SOURCE_CODE)
+        instruction_fuser = InstructionFuser(4)
+        cpu, _ = self._get_cpu(opcode, instruction_fuser)
+        for _ in range(16):
+            cpu.step()
+        self.assertEqual(instruction_fuser.stats['INC+MOV'].sites, 1)
+        loop_ip = len(self.assembler.assemble_code('MOV AX 0x0000'))
+        while cpu.ip != loop_ip:
+            cpu.step()
+        cpu.parse_instruction = Mock(side_effect=cpu.parse_instruction)
+        ax = cpu.registers.get_register('AX')
+        for _ in range(20):
+            cpu.step()
+        # INC+MOV runs as a superinstruction in one step, only JLE is parsed
+        # (MOV+JLE is fused too, but its MOV is run by INC+MOV)
+        self.assertEqual(cpu.registers.get_register('AX'), ax + 10)
+        self.assertEqual(cpu.parse_instruction.call_count, 10)
+        self.assertEqual(set(instruction_fuser.stats), {'INC+MOV', 'MOV+JLE'})
+        self.assertEqual(len(instruction_fuser.get_report()), 2)
+        self.assertIsInstance(instruction_fuser.get_saved_time('INC+MOV'), float)
+
+    def test_interrupt_between_fused_instructions(self):
+        opcode = self.assembler.assemble_code('''
+        loop:
+            INC AX 0x0001
+            MOV BX AX
+            JMP loop
+        ''')
+        interrupt_controller = Mock()
+        interrupt_controller.check.return_value = None
+        instruction_fuser = InstructionFuser(2)
+        cpu, ram = self._get_cpu(opcode, instruction_fuser, interrupt_controller=interrupt_controller)
+        ram.write_word(0x0F00 + 2 * 0x05, 0x0800)
+        cpu.enable_interrupts()
+        for _ in range(10):
+            cpu.step()
+        while cpu.ip != 0:
+            cpu.step()
+        self.assertEqual(instruction_fuser.stats['INC+MOV'].sites, 1)
+        ax = cpu.registers.get_register('AX')
+        bx = cpu.registers.get_register('BX')
+        # no interrupt before the pair, interrupt 5 after INC
+        interrupt_controller.check.side_effect = [None, 0x05]
+        cpu.step()
+        self.assertEqual(cpu.ip, 0x0800)
+        self.assertEqual(cpu.registers.get_register('AX'), ax + 1)
+        self.assertEqual(cpu.registers.get_register('BX'), bx)
+        # return address is the IP of MOV
+        self.assertEqual(cpu.stack.pop_word(), len(self.assembler.assemble_code('INC AX 0x0001')))
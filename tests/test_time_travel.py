@@ -0,0 +1,159 @@
+import logging
+import unittest
+from unittest.mock import Mock
+
+from assembler.assembler import Assembler
+from hardware.clock import Clock
+from hardware.cpu import CPU, Registers, Stack
+from hardware.debugger.time_travel import TimeTravel
+from hardware.device_controller.ioport import IOPort
+from hardware.interrupt_controller import InterruptController
+from hardware.memory import Memory, RAM
+from instructions.instruction_set import INSTRUCTION_SET
+from instructions.operands import WORD_REGISTERS, BYTE_REGISTERS
+
+
+SOURCE_CODE = '''
+    MOV AX 0x0000
+  LOOP:
+    INC AX 0x01
+    MOV [0x0300] AX
+    IN 0x00 0x0310
+    JMP LOOP
+'''
+
+INTERRUPT_HANDLER = '''
+    INC BX 0x01
+    IRET
+'''
+
+
+class TestTimeTravel(unittest.TestCase):
+
+    def setUp(self):
+        assembler = Assembler(INSTRUCTION_SET, {
+            'byte': BYTE_REGISTERS,
+            'word': WORD_REGISTERS,
+        })
+        system_addresses = {
+            'entry_point': 0x0000,
+            'bottom_of_stack': 0x0DFF,
+            'IVT': 0x0E00,
+        }
+        self.ram = RAM(0x1000)
+        self.ram.write_block(0x0000, assembler.assemble_code(SOURCE_CODE))
+        self.ram.write_block(0x0400, assembler.assemble_code(INTERRUPT_HANDLER))
+        self.ram.write_word(system_addresses['IVT'] + 2 * 0x05, 0x0400)
+        memory = Memory(0x1000)
+        memory.register_architecture(self.ram, None)
+        self.ioports = [IOPort(0, 0x10)]
+        device_controller = Mock()
+        device_controller.ioports = self.ioports
+        self.interrupt_controller = InterruptController()
+        self.clock = Clock()
+        self.cpu = CPU(system_addresses, INSTRUCTION_SET, 16, 1000)
+        self.cpu.register_architecture(
+            Registers(system_addresses['bottom_of_stack']),
+            Stack(system_addresses['bottom_of_stack']),
+            memory,
+            self.interrupt_controller, device_controller, Mock(), None,
+            None,
+        )
+        self.clock.register_architecture(self.cpu)
+        self.time_travel = TimeTravel(10, 0x10000, 0x100)
+        self.time_travel.register_architecture(self.cpu, self.clock, self.ram, self.interrupt_controller, device_controller, None)
+        self.states = {}
+        for logger_name in ['hardware.cpu', 'hardware.interrupt_controller', 'hardware.device_controller-ioport']:
+            logging.getLogger(logger_name).setLevel(logging.ERROR)
+
+    def _get_state(self):
+        return (
+            self.cpu.ip,
+            self.cpu.registers.get_word_registers(),
+            self.cpu.registers.get_flag_word(),
+            self.ram.read_block(0, self.ram.size),
+        )
+
+    def _run(self, cycles, inputs=None):
+        inputs = inputs or {}
+        self.states[self.clock.cycle_count] = self._get_state()
+        for _ in range(cycles):
+            self.time_travel.before_cycle()
+            self.clock.cycle_count += 1
+            if self.clock.cycle_count in inputs:
+                input_type, value = inputs[self.clock.cycle_count]
+                if input_type == 'interrupt':
+                    self.interrupt_controller.send(value)
+                else:
+                    self.ioports[0].input_queue.put(value)
+            self.cpu.step()
+            self.states[self.clock.cycle_count] = self._get_state()
+
+    def _assert_state(self, cycle):
+        self.assertEqual(self.clock.cycle_count, cycle)
+        self.assertEqual(self._get_state(), self.states[cycle])
+
+    def test_goto(self):
+        self._run(100)
+        for cycle in [55, 0, 99, 10, 11, 9, 100, 37]:
+            self.time_travel.goto(cycle)
+            self._assert_state(cycle)
+        self.assertTrue(self.time_travel.replaying)
+        self.time_travel.goto(200)  # limited to the last recorded cycle
+        self._assert_state(100)
+        self.assertFalse(self.time_travel.replaying)
+        self.assertEqual(self.time_travel.get_state()['checkpoints'], 10)
+
+    def test_replay_inputs(self):
+        self._run(100, {
+            12: ('interrupt', 0x05),
+            20: ('input', b'AB'),
+            45: ('interrupt', 0x05),
+            46: ('input', b'XYZ'),
+        })
+        self.assertEqual(self.cpu.registers.get_register('BX'), 2)
+        self.time_travel.goto(15)
+        self._assert_state(15)
+        self.assertTrue(self.time_travel.replaying)
+        self.assertEqual(self.cpu.registers.get_register('BX'), 1)
+        # live inputs are not used while replaying
+        self.interrupt_controller.send(0x05)
+        self.ioports[0].input_queue.put(b'CD')
+        self._run(50)
+        self._assert_state(65)
+        self.assertTrue(self.time_travel.replaying)
+        self.assertEqual(self.cpu.registers.get_register('BX'), 2)
+        self.time_travel.goto(100)
+        self._assert_state(100)
+        self.assertFalse(self.time_travel.replaying)
+        # back to live inputs
+        self._run(20)
+        self.assertEqual(self.cpu.registers.get_register('BX'), 3)
+        self.assertEqual(self.ram.read_block(0x0310, 2), b'CD')
+
+    def test_step_back_over_interrupt(self):
+        self._run(30, {
+            13: ('interrupt', 0x05),
+        })
+        for cycle in range(29, 0, -1):
+            self.time_travel.goto(cycle)
+            self._assert_state(cycle)
+
+    def test_eviction(self):
+        time_travel = TimeTravel(10, 0x1000 + 0x200, 0x100)
+        time_travel.register_architecture(self.cpu, self.clock, self.ram, self.interrupt_controller, self.cpu.device_controller, None)
+        self.time_travel = time_travel
+        self._run(100, {
+            55: ('interrupt', 0x05),
+            83: ('interrupt', 0x05),
+        })
+        state = time_travel.get_state()
+        self.assertLessEqual(state['size'], 0x1200)
+        self.assertEqual(state['first_cycle'], 80)
+        self.assertEqual(state['last_cycle'], 100)
+        time_travel.goto(50)  # limited to the oldest checkpoint
+        self._assert_state(80)
+        time_travel.goto(90)
+        self._assert_state(90)
+        self.assertEqual(self.cpu.registers.get_register('BX'), 2)
+        self.assertEqual(min(time_travel._inputs), 83)
@@ -82,6 +82,17 @@ class TestTimer(unittest.TestCase):
             else:
                 self.assertIsNone(int_call)
 
+    def test_run_due_beats(self):
+        self.tmr._architecture_registered = True
+        self.tmr.set_subtimer(0, 2, 2, 0, self.int_num)
+        self.tmr.run_due_beats(100.0)
+        self.assertEqual(self.tmr._step_count, 1)
+        self.tmr.run_due_beats(100.05)  # period is 0.1 sec
+        self.assertEqual(self.tmr._step_count, 1)
+        self.tmr.run_due_beats(100.45)
+        self.assertEqual(self.tmr._step_count, 5)
+        self.assertEqual(self.tmr._interrupt_controller.send.call_count, 3)
+
     def _run_timer(self):
         modes = []
         int_calls = []
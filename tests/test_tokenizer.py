@@ -108,3 +108,52 @@ class TestTokenizer(unittest.TestCase):
     def test_error_unknown_macro(self):
         with self.assertRaises(UnknownMacroError):
             self.tokenizer.tokenize('label: .mac x')
+
+    def test_multiple_lines(self):
+        tokenized_lines = self.tokenizer.tokenize_lines([
+            'label: mov ax 0x0100',
+            '',
+            '  jmp label  # comment',
+        ])
+        self.assertListEqual(tokenized_lines, [
+            [
+                Token(TokenType.LABEL, 'label', 0),
+                Token(TokenType.INSTRUCTION, 'MOV', 7),
+                Token(TokenType.WORD_REGISTER, 'AX', 11),
+                Token(TokenType.WORD_LITERAL, 256, 14),
+            ],
+            [],
+            [
+                Token(TokenType.INSTRUCTION, 'JMP', 2),
+                Token(TokenType.IDENTIFIER, 'label', 6),
+                Token(TokenType.COMMENT, ' comment', 13),
+            ],
+        ])
+
+    def test_non_ascii_before_label(self):
+        # upper-casing 'ß' makes it longer, positions must still refer to the original code
+        tokenized_lines = self.tokenizer.tokenize_lines([
+            '# Straße',
+            '.dat "ßß" 0x01',
+            'loop: JMP loop',
+        ])
+        self.assertListEqual(tokenized_lines, [
+            [
+                Token(TokenType.COMMENT, ' Straße', 0),
+            ],
+            [
+                Token(TokenType.MACRO, 'DAT', 0),
+                Token(TokenType.STRING_LITERAL, 'ßß', 5),
+                Token(TokenType.BYTE_LITERAL, 1, 10),
+            ],
+            [
+                Token(TokenType.LABEL, 'loop', 0),
+                Token(TokenType.INSTRUCTION, 'JMP', 6),
+                Token(TokenType.IDENTIFIER, 'loop', 10),
+            ],
+        ])
+
+    def test_string_literal_not_across_lines(self):
+        with self.assertRaises(UnexpectedCharacterError) as cm:
+            self.tokenizer.tokenize_lines(['.dat "hello', 'world"'])
+        self.assertEqual(cm.exception.line_index, 0)
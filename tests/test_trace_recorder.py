@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from hardware import trace_recorder
+from instructions import instruction_set
+
+
+class TestTraceRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'trace')
+        self.clock = Mock()
+        self.clock.cycle_count = 1
+        self.registers = Mock()
+        self.register_values = {
+            'AX': 0x0000,
+            'SP': 0xFFFF,
+        }
+        self.registers.get_word_registers.side_effect = lambda: dict(self.register_values)
+        self.recorder = trace_recorder.TraceRecorder(self.filename, block_size=2)
+        self.recorder.register_architecture(self.clock, self.registers)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_record_and_read(self):
+        self.recorder.start()
+        self.recorder.record_instruction(0x0010, 0x12, [0xA0, 0x80, 0x12, 0x34])
+        self.register_values['AX'] = 0x1234
+        self.recorder.record_registers()
+        self.clock.cycle_count = 2
+        self.recorder.record_interrupt(0x20)
+        self.recorder.record_memory_write(0xFFFF, 1, 0xAB)
+        self.recorder.record_memory_write(0xFFFD, 2, 0x0013)
+        self.register_values['SP'] = 0xFFFC
+        self.recorder.record_registers()
+        self.recorder.record_registers()
+        self.recorder.stop()
+        records = list(trace_recorder.read_trace(self.filename))
+        self.assertEqual(self.recorder.record_count, 8)
+        self.assertListEqual(records, [
+            (trace_recorder.RECORD_REGISTER, 0, 0x0000),
+            (trace_recorder.RECORD_REGISTER, 5, 0xFFFF),
+            (trace_recorder.RECORD_INSTRUCTION, 1, 0x0010, 0x12, bytes([0xA0, 0x80, 0x12, 0x34] + [0] * 12)),
+            (trace_recorder.RECORD_REGISTER, 0, 0x1234),
+            (trace_recorder.RECORD_INTERRUPT, 2, 0x20),
+            (trace_recorder.RECORD_MEMORY_WRITE, 0xFFFF, 1, 0xAB),
+            (trace_recorder.RECORD_MEMORY_WRITE, 0xFFFD, 2, 0x0013),
+            (trace_recorder.RECORD_REGISTER, 5, 0xFFFC),
+        ])
+
+    def test_format_trace(self):
+        lines = list(trace_recorder.format_trace([
+            (trace_recorder.RECORD_REGISTER, 0, 0x0000),
+            (trace_recorder.RECORD_INSTRUCTION, 1, 0x0010, 0x12, bytes([0xA0, 0x80, 0x12, 0x34] + [0] * 12)),
+            (trace_recorder.RECORD_REGISTER, 0, 0x1234),
+            (trace_recorder.RECORD_INSTRUCTION, 2, 0x0014, 0x99, bytes(16)),
+            (trace_recorder.RECORD_INTERRUPT, 3, 0x20),
+            (trace_recorder.RECORD_MEMORY_WRITE, 0xFFFF, 1, 0xAB),
+        ], [(0x12, instruction_set.data_transfer.MOV)]))
+        self.assertListEqual([line.rstrip() for line in lines], [
+            '{:<40} | AX=0000'.format(''),
+            '{:<40} | AX=1234'.format('       1 0010  MOV AX 1234'),
+            '       2 0014  ?? 99',
+            '{:<40} | [FFFF]=AB'.format('       3 INT  20'),
+        ])
+
+    def test_read_corrupt_trace(self):
+        with open(self.filename, 'wb') as trace_file:
+            trace_file.write(b'NOTRACE')
+        with self.assertRaises(trace_recorder.CorruptTraceError):
+            list(trace_recorder.read_trace(self.filename))
@@ -0,0 +1,63 @@
+import unittest
+
+from hardware.memory.memory import Memory
+from hardware.memory.ram import RAM
+from hardware.memory.watchpoints import Watchpoints, InvalidWatchpointError
+
+
+class TestWatchpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.watchpoints = Watchpoints(0x1000, 0x100)
+        self.memory = Memory(0x1000)
+        self.memory.register_architecture(RAM(0x1000), None)
+        self.memory.watchpoints = self.watchpoints
+
+    def test_write(self):
+        self.watchpoints.add(0x0210, 0x0211, 'w')
+        self.memory.write_byte(0x020F, 0x12)
+        self.memory.read_byte(0x0210)
+        self.assertIsNone(self.watchpoints.hit)
+        self.memory.write_word(0x020F, 0x1234)
+        self.assertDictEqual(self.watchpoints.hit, {
+            'watchpoint': {
+                'first_address': '0210',
+                'last_address': '0211',
+                'mode': 'w',
+            },
+            'address': '020F',
+            'access': 'write',
+            'value': '1234',
+        })
+        self.memory.write_byte(0x0211, 0x56)
+        self.assertEqual(self.watchpoints.hit['address'], '020F')
+        self.watchpoints.clear_hit()
+        self.memory.write_byte(0x0211, 0x56)
+        self.assertEqual(self.watchpoints.hit['value'], '56')
+
+    def test_read(self):
+        self.watchpoints.add(0x02FF, 0x02FF, 'r')
+        self.memory.write_byte(0x02FF, 0x12)
+        self.memory.read_byte(0x02FF, silent=True)
+        self.assertIsNone(self.watchpoints.hit)
+        self.memory.read_word(0x02FE)  # crosses page boundary
+        self.assertEqual(self.watchpoints.hit['access'], 'read')
+        self.assertEqual(self.watchpoints.hit['value'], '0012')
+
+    def test_remove(self):
+        self.watchpoints.add(0x0210, 0x0220, 'rw')
+        self.assertEqual(len(self.watchpoints), 1)
+        self.watchpoints.remove(0x0210, 0x0220, 'rw')
+        self.assertEqual(len(self.watchpoints), 0)
+        self.memory.write_byte(0x0215, 0x12)
+        self.assertIsNone(self.watchpoints.hit)
+        with self.assertRaises(InvalidWatchpointError):
+            self.watchpoints.remove(0x0210, 0x0220, 'rw')
+
+    def test_invalid(self):
+        with self.assertRaises(InvalidWatchpointError):
+            self.watchpoints.add(0x0210, 0x0220, 'x')
+        with self.assertRaises(InvalidWatchpointError):
+            self.watchpoints.add(0x0220, 0x0210, 'r')
+        with self.assertRaises(InvalidWatchpointError):
+            self.watchpoints.add(0x0210, 0x1000, 'r')
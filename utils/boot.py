@@ -2,6 +2,7 @@
 Boot related stuff: BootImage, BootLoader
 '''
 
+from . import executable
 from . import utils
 
 
@@ -55,12 +56,17 @@ class BootLoader:
         '''
         Load image into RAM at position `pos`
         '''
-        for idx in range(image.size):
-            self._ram.write_byte(pos + idx, image.content[idx], silent=True)
+        self._ram.write_block(pos, image.content, silent=True)
 
     def load_executable(self, pos, exe):
         '''
-        Load executable into RAM at position `pos`
+        Load executable (Executable or ExecutableFile) into RAM at position `pos`
         '''
-        for idx, opbyte in enumerate(exe.opcode):
-            self._ram.write_byte(pos + idx, opbyte, silent=True)
+        if exe.version == 1:
+            self._ram.write_block(pos, exe.opcode, silent=True)
+            return
+        for section in executable.get_sections(exe):
+            if section.type == executable.SECTION_TYPE_BSS:
+                self._ram.write_block(pos + section.address, bytes(section.size), silent=True)
+            else:
+                self._ram.write_block(pos + section.address, section.content, silent=True)
@@ -2,6 +2,9 @@
 System config
 '''
 
+import hashlib
+import os
+
 from . import boot
 
 
@@ -16,6 +19,42 @@ device_base_port = 35016
 
 debugger_host = 'localhost'
 debugger_port = 8000
+debugger_user_log_size = 10000  # lines
+debugger_page_size = 0x100  # bytes
+debugger_max_wait = 30  # sec (long-polling)
+debugger_wait_period = 1  # sec (checking changes not signalled by the CPU, e.g. DMA)
+checkpoint_interval = 10000  # cycles (time travel in record mode)
+checkpoint_max_size = 0x1000000  # 16 MB (RAM pages of checkpoints, the oldest ones are evicted above it)
+
+
+# Multi-VM host config
+
+host_slice_size = 1000  # instructions (multiplied by the weight of the VM)
+host_network_period = 0.05  # sec (sending output and pinging devices of every VM)
+host_output_timeout = 2  # sec (sending output to a device)
+
+
+# VM farm config
+
+farm_control_host = 'localhost'
+farm_control_port = 35100
+farm_device_base_port = 35200  # + worker number
+farm_number_of_workers = os.cpu_count() or 1
+farm_command_timeout = 10  # sec (waiting for the response of a worker)
+
+
+# Assembler config
+
+build_cache_dir = '.aldcache'
+build_cache_max_size = 0x1000000  # 16 MB
+
+
+# Aldebaran config
+
+boot_image_cache_dir = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'aldebaran',
+)
 
 
 # Virtual config
@@ -29,7 +68,13 @@ number_of_interrupts = 256
 number_of_subtimers = 16
 operand_buffer_size = 16
 timer_freq = 10  # Hz
+dma_freq = 1000  # Hz
 cpu_halt_freq = 1000  # Hz
+device_ping_timeout = 0.5  # sec
+device_ping_min_period = 0.25  # sec
+device_ping_max_period = 8  # sec
+trace_block_size = 0x10000  # records (1.5 MB)
+superinstruction_threshold = 1000  # executions of an instruction pair before it's fused
 
 # physical ram:
 IVT_size = number_of_interrupts * 2
@@ -70,14 +115,9 @@ def create_boot_image():
     '''
     boot_image = boot.BootImage(ram_size)
     # default interrupt handler
-    from instructions.instruction_set import INSTRUCTION_SET
-    instruction_mapping = {
-        inst.__name__: (opcode, inst)
-        for opcode, inst in INSTRUCTION_SET
-    }
     boot_image.write_byte(
         system_addresses['default_interrupt_handler'],
-        instruction_mapping['IRET'][0],
+        _get_iret_opcode(),
     )
     # IVT
     for int_num in range(number_of_interrupts):
@@ -86,3 +126,67 @@ def create_boot_image():
             system_addresses['default_interrupt_handler'],
         )
     return boot_image
+
+
+_boot_image = None
+_DIGEST_SIZE = hashlib.sha256().digest_size
+
+
+def get_boot_image():
+    '''
+    Return boot image with read-only (bytes) content
+
+    It is created only once: it's cached in-process and on disk in `boot_image_cache_dir`
+    (the filename contains the hash of the config it depends on, the file starts with the digest of the image,
+    and it's created again if they don't match).
+    '''
+    global _boot_image  # pylint: disable=global-statement
+    if _boot_image is not None:
+        return _boot_image
+    boot_image_hash = hashlib.sha256(repr((
+        ram_size,
+        number_of_interrupts,
+        sorted(system_addresses.items()),
+        _get_iret_opcode(),
+    )).encode('utf-8')).hexdigest()
+    filename = os.path.join(boot_image_cache_dir, 'boot-{}.img'.format(boot_image_hash[:16]))
+    content = _load_cached_boot_image(filename)
+    if content is None:
+        content = bytes(create_boot_image().content)
+        try:
+            os.makedirs(boot_image_cache_dir, exist_ok=True)
+            tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+            with open(tmp_filename, 'wb') as image_file:
+                image_file.write(hashlib.sha256(content).digest() + content)
+            os.replace(tmp_filename, filename)
+        except OSError:
+            pass  # not cached on disk, it will be created again next time
+    boot_image = boot.BootImage()
+    # shared by every boot of the process, so it must not change
+    boot_image.content = content
+    boot_image.size = len(content)
+    _boot_image = boot_image
+    return _boot_image
+
+
+def _load_cached_boot_image(filename):
+    '''
+    Return content of cached boot image, or None if it's missing or damaged
+    '''
+    try:
+        with open(filename, 'rb') as image_file:
+            data = image_file.read()
+    except OSError:
+        return None
+    digest, content = data[:_DIGEST_SIZE], data[_DIGEST_SIZE:]
+    if len(content) != ram_size or hashlib.sha256(content).digest() != digest:
+        return None
+    return content
+
+
+def _get_iret_opcode():
+    from instructions.instruction_set import INSTRUCTION_SET
+    for opcode, inst in INSTRUCTION_SET:
+        if inst.__name__ == 'IRET':
+            return opcode
+    raise KeyError('IRET')
@@ -6,8 +6,24 @@ Module defining the Aldebaran executable format(s)
 - bytes 8-9: entry point (offset from beginning of file to opcode)
 - optional extra header
 - opcode
+
+Version 1 has no extra header, the opcode is the program as it is loaded into RAM.
+
+Version 2 stores the program in sections:
+- extra header: number of sections (word), then a section table entry (8 bytes) for every section:
+  type (byte), flags (byte), address (word, relative to the load position), size in RAM (word), stored length (word)
+- opcode: stored content of the sections after each other
+
+BSS sections are zero-filled areas with no stored content, other sections may be zlib-compressed.
 '''
 
+from collections import namedtuple
+from itertools import groupby
+import mmap
+import re
+import struct
+import zlib
+
 from utils import utils
 from utils.errors import AldebaranError
 
@@ -22,6 +38,29 @@ ALDEBARAN_EXECUTABLE_SIGNATURE = [
     ord('N'),  # 0x4E
 ]
 
+EXECUTABLE_HEADER = struct.Struct('>7sBH')  # signature, version, entry point
+SECTION_COUNT = struct.Struct('>H')
+SECTION_TABLE_ENTRY = struct.Struct('>BBHHH')  # type, flags, address, size, stored length
+
+SUPPORTED_VERSIONS = {1, 2}
+
+SECTION_TYPE_CODE = 1
+SECTION_TYPE_DATA = 2
+SECTION_TYPE_BSS = 3
+
+SECTION_FLAG_COMPRESSED = 0x01
+
+# shorter runs of zeros are not worth a section table entry
+MIN_BSS_LENGTH = 16
+
+
+Section = namedtuple('Section', [
+    'type',  # SECTION_TYPE_*
+    'address',  # integer (relative to the load position)
+    'size',  # integer (bytes in RAM)
+    'content',  # bytes-like (None for BSS)
+])
+
 
 class Executable:
     '''
@@ -45,7 +84,7 @@ class Executable:
         '''
         Get length of executable
         '''
-        return len(self._get_header()) + len(self.opcode)
+        return self.entry_point + len(self.opcode)
 
     def save_to_file(self, filename):
         '''
@@ -55,28 +94,47 @@ class Executable:
             output_file.write(bytes(self._get_header()))
             output_file.write(bytes(self.opcode))
 
+    def to_bytes(self):
+        '''
+        Return executable as bytes
+        '''
+        return bytes(self._get_header() + self.opcode)
+
     def load_from_file(self, filename):
         '''
-        Load executable from file
+        Load executable from file (as lists, for a fast read-only loader see ExecutableFile)
         '''
         with open(filename, 'rb') as input_file:
-            signature = input_file.read(len(ALDEBARAN_EXECUTABLE_SIGNATURE))
-            if signature != bytes(ALDEBARAN_EXECUTABLE_SIGNATURE):
-                raise CorruptFileError('Signature not valid')
-            try:
-                self.version = input_file.read(1)[0]
-            except Exception:
-                raise CorruptFileError('Version not valid')
-            try:
-                self.entry_point = utils.binary_to_number(list(input_file.read(2)))
-            except Exception:
-                raise CorruptFileError('Entry point not valid')
-            extra_header_length = self.entry_point - len(ALDEBARAN_EXECUTABLE_SIGNATURE) - 3
-            try:
-                self.extra_header = list(input_file.read(extra_header_length))
-            except Exception:
-                raise CorruptFileError('Extra header not valid')
-            self.opcode = list(input_file.read())
+            content = input_file.read()
+            version, entry_point = parse_header(content)
+            self.version = version
+            self.entry_point = entry_point
+            self.extra_header = list(content[EXECUTABLE_HEADER.size:entry_point])
+            self.opcode = list(content[entry_point:])
+
+    @classmethod
+    def from_sections(cls, sections, compress=False):
+        '''
+        Create version 2 executable from list of Section
+
+        With `compress` set, sections are stored zlib-compressed if that makes them shorter.
+        '''
+        section_table = SECTION_COUNT.pack(len(sections))
+        stored_content = []
+        for section in sections:
+            flags = 0
+            if section.type == SECTION_TYPE_BSS:
+                content = b''
+            else:
+                content = bytes(section.content)
+                if compress:
+                    compressed_content = zlib.compress(content, 9)
+                    if len(compressed_content) < len(content):
+                        content = compressed_content
+                        flags |= SECTION_FLAG_COMPRESSED
+            section_table += SECTION_TABLE_ENTRY.pack(section.type, flags, section.address, section.size, len(content))
+            stored_content.append(content)
+        return cls(2, list(b''.join(stored_content)), list(section_table))
 
     def _get_entry_point(self):
         return len(ALDEBARAN_EXECUTABLE_SIGNATURE) + 3 + len(self.extra_header)
@@ -90,6 +148,129 @@ class Executable:
         )
 
 
+class ExecutableFile:
+    '''
+    Read-only executable memory-mapped from file
+
+    Extra header and opcode are memoryviews of the file, so they can be written into RAM without copying.
+    Use it as a context manager (or call `close`) to unmap the file.
+    '''
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as input_file:
+            try:
+                self._mmap = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise CorruptFileError('Signature not valid')  # empty file
+        try:
+            self.version, self.entry_point = parse_header(self._mmap)
+        except CorruptFileError:
+            self._mmap.close()
+            raise
+        self._content = memoryview(self._mmap)
+        self.extra_header = self._content[EXECUTABLE_HEADER.size:self.entry_point]
+        self.opcode = self._content[self.entry_point:]
+
+    @property
+    def length(self):
+        '''
+        Get length of executable
+        '''
+        return len(self._content)
+
+    def close(self):
+        '''
+        Release memoryviews and unmap file
+        '''
+        self.extra_header.release()
+        self.opcode.release()
+        self._content.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def create_sections(opcode, data_ranges=None):
+    '''
+    Split opcode into sections: zero runs of at least MIN_BSS_LENGTH bytes are BSS,
+    bytes in `data_ranges` (list of (address, length)) are data, the rest is code
+    '''
+    section_types = bytearray([SECTION_TYPE_CODE]) * len(opcode)
+    for address, length in data_ranges or []:
+        section_types[address:address + length] = bytes([SECTION_TYPE_DATA]) * length
+    for match in re.finditer(b'\\x00{%d,}' % MIN_BSS_LENGTH, bytes(opcode)):
+        section_types[match.start():match.end()] = bytes([SECTION_TYPE_BSS]) * (match.end() - match.start())
+    sections = []
+    address = 0
+    for section_type, section_bytes in groupby(section_types):
+        size = len(list(section_bytes))
+        if section_type == SECTION_TYPE_BSS:
+            content = None
+        else:
+            content = bytes(opcode[address:address + size])
+        sections.append(Section(section_type, address, size, content))
+        address += size
+    return sections
+
+
+def get_sections(exe):
+    '''
+    Return list of Section of a version 2 executable (Executable or ExecutableFile)
+
+    Content of uncompressed sections of an ExecutableFile are memoryviews of the file.
+    '''
+    if isinstance(exe.opcode, memoryview):
+        stored_content = exe.opcode
+    else:
+        stored_content = bytes(exe.opcode)
+    extra_header = bytes(exe.extra_header)
+    sections = []
+    try:
+        section_count, = SECTION_COUNT.unpack_from(extra_header)
+        offset = 0
+        for idx in range(section_count):
+            section_type, flags, address, size, stored_length = SECTION_TABLE_ENTRY.unpack_from(
+                extra_header,
+                SECTION_COUNT.size + idx * SECTION_TABLE_ENTRY.size,
+            )
+            if section_type == SECTION_TYPE_BSS:
+                content = None
+            else:
+                content = stored_content[offset:offset + stored_length]
+                if flags & SECTION_FLAG_COMPRESSED:
+                    content = zlib.decompress(content)
+                if len(content) != size:
+                    raise CorruptFileError('Section {} not valid'.format(idx))
+            offset += stored_length
+            sections.append(Section(section_type, address, size, content))
+    except (struct.error, zlib.error):
+        raise CorruptFileError('Section table not valid')
+    if offset != len(stored_content):
+        raise CorruptFileError('Section table not valid')
+    return sections
+
+
+def parse_header(content):
+    '''
+    Validate header of executable (bytes-like), return version and entry point
+    '''
+    try:
+        signature, version, entry_point = EXECUTABLE_HEADER.unpack_from(content)
+    except struct.error:
+        signature, version, entry_point = bytes(content[:len(ALDEBARAN_EXECUTABLE_SIGNATURE)]), None, None
+    if signature != bytes(ALDEBARAN_EXECUTABLE_SIGNATURE):
+        raise CorruptFileError('Signature not valid')
+    if version is None:
+        raise CorruptFileError('Header not valid')
+    if entry_point < EXECUTABLE_HEADER.size or entry_point > len(content):
+        raise CorruptFileError('Entry point not valid')
+    return version, entry_point
+
+
 # pylint: disable=missing-docstring
 
 class ExecutableError(AldebaranError):